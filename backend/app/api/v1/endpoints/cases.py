@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
 import logging
 from app.services.case_service import case_service
 from app.services.case_permission_service import case_permission_service
 from app.services.users.user_service_simple import user_service_simple
+from app.services.token_service import LimitExceededException
+from app.services.page_cursor import InvalidCursorError
 from app.schemas.case import (
-    Case, CaseWithPermissions, CasePermission,
+    Case, CaseWithPermissions, CasePermission, CaseListPage,
     ShareCaseRequest, RevokeCasePermissionRequest, CaseUpdate
 )
 
@@ -43,13 +46,17 @@ async def generate_case(session_id: str, owner_id: str, colegio_id: str):
 @router.get("/", response_model=List[Case])
 async def get_cases(
     user_id: str = Query(..., description="ID del usuario que solicita los casos"),
-    colegio_id: str = Query(..., description="ID del colegio")
+    colegio_id: str = Query(..., description="ID del colegio"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Máximo de casos (sin límite si se omite)"),
+    cursor: Optional[str] = Query(None, description="ID del último caso de la página anterior")
 ):
     """
     Obtiene todos los casos accesibles para un usuario (propios + compartidos).
     """
     try:
-        return case_service.get_cases_for_user(user_id, colegio_id)
+        return case_service.get_cases_for_user(user_id, colegio_id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Error fetching cases")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -68,6 +75,61 @@ async def get_all_cases_by_school(
         logger.exception("Error fetching school cases")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.get("/list", response_model=CaseListPage)
+async def list_cases(
+    user_id: str = Query(..., description="ID del usuario que solicita los casos"),
+    colegio_id: str = Query(..., description="ID del colegio"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    status: Optional[str] = Query(None),
+    case_type: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="Desde (sobre sort_by)"),
+    date_to: Optional[datetime] = Query(None, description="Hasta (sobre sort_by)"),
+    sort_by: Literal["created_at", "updated_at"] = Query("created_at"),
+    order: Literal["desc", "asc"] = Query("desc")
+):
+    """
+    Listado paginado de casos accesibles para un usuario (solo campos de tarjeta).
+    El caso completo se obtiene con GET /cases/{case_id}.
+    """
+    try:
+        return case_service.list_cases_for_user(
+            user_id, colegio_id, limit=limit, cursor=cursor, status=status, case_type=case_type,
+            date_from=date_from, date_to=date_to, sort_by=sort_by, descending=order == "desc"
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error listing cases")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/school/{colegio_id}/list", response_model=CaseListPage)
+async def list_school_cases(
+    colegio_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    status: Optional[str] = Query(None),
+    case_type: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="Desde (sobre sort_by)"),
+    date_to: Optional[datetime] = Query(None, description="Hasta (sobre sort_by)"),
+    sort_by: Literal["created_at", "updated_at"] = Query("created_at"),
+    order: Literal["desc", "asc"] = Query("desc")
+):
+    """
+    Listado paginado de los casos de un colegio (Directivos), solo campos de tarjeta.
+    Filtro, orden y paginación se resuelven en Firestore.
+    """
+    try:
+        return case_service.list_school_cases(
+            colegio_id, limit=limit, cursor=cursor, status=status, case_type=case_type,
+            date_from=date_from, date_to=date_to, sort_by=sort_by, descending=order == "desc"
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error listing school cases")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @router.post("/create", response_model=Case)
 async def create_case(case_data: dict):
     """
@@ -355,6 +417,8 @@ async def generate_case_summary_endpoint(
         result = await case_service.generate_case_summary(case_id, user_id=user_id)
         return result
 
+    except LimitExceededException as e:
+        raise HTTPException(status_code=429, detail=e.message)
     except ValueError as e:
          raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -520,9 +584,10 @@ async def share_case(
                 raise HTTPException(status_code=400, detail="Usuario no tiene colegio asociado")
             colegio_id = user.colegios[0]
 
-        # Verificar que todos los usuarios pertenezcan al mismo colegio
+        # Verificar que todos los usuarios pertenezcan al mismo colegio (una lectura por lotes)
+        users_by_id = user_service_simple.get_users_by_ids(share_request.user_ids)
         for user_id in share_request.user_ids:
-            user = user_service_simple.get_user_by_id(user_id)
+            user = users_by_id.get(user_id)
             if not user:
                 raise HTTPException(status_code=404, detail=f"Usuario {user_id} no encontrado")
             if colegio_id not in user.colegios:
@@ -534,7 +599,7 @@ async def share_case(
         # Otorgar permisos
         granted_permissions = []
         for user_id in share_request.user_ids:
-            user = user_service_simple.get_user_by_id(user_id)
+            user = users_by_id.get(user_id)
             permission = case_permission_service.grant_permission(
                 case_id=case_id,
                 owner_id=owner_id,
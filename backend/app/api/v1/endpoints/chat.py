@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
@@ -20,6 +20,7 @@ settings = get_settings()
 from app.services.chat.history_service import history_service
 from app.services.case_service import case_service
 from app.services.school_service import school_service
+from app.services.page_cursor import InvalidCursorError
 
 class ChatRequestModel(BaseModel):
     message: str
@@ -305,10 +306,19 @@ async def update_session_title(request: UpdateTitleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sessions")
-async def get_sessions(user_id: Optional[str] = None):
-    """Obtiene la lista de sesiones de chat recientes"""
+async def get_sessions(
+    user_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Obtiene la lista de sesiones de chat recientes.
+    Con `limit` devuelve una página {sessions, next_cursor}; `cursor` es el next_cursor anterior.
+    """
     try:
-        return await history_service.list_sessions(user_id)
+        return await history_service.list_sessions(user_id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -343,8 +353,19 @@ async def get_session_metadata(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/history/{session_id}")
-async def get_session_history(session_id: str, user_id: Optional[str] = None):
-    """Obtiene el historial de una sesión específica con timestamps"""
+async def get_session_history(
+    session_id: str,
+    user_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Mensajes por página (más recientes primero)"),
+    before: Optional[int] = Query(None, ge=0, description="Cursor: devolver mensajes con order menor a este valor")
+):
+    """
+    Obtiene el historial de una sesión específica con timestamps.
+
+    Sin `limit` ni `before` devuelve la lista completa (comportamiento original).
+    Con paginación devuelve {messages, next_before, has_more}: los `limit` mensajes
+    más recientes anteriores a `before`, en orden cronológico.
+    """
     try:
         logger.info(f"🔍 [ENDPOINT] get_session_history called for {session_id} with user_id: {user_id}")
         
@@ -363,6 +384,9 @@ async def get_session_history(session_id: str, user_id: Optional[str] = None):
             except Exception as e:
                 logger.warning(f"⚠️ [ENDPOINT] Error resolving school bucket for history retrieval {user_id}: {e}")
 
+        if limit is not None or before is not None:
+            return await history_service.load_history_page(session_id, limit or 50, before, bucket_name)
+
         # Cargar historial usando el nuevo método con timestamps
         logger.info(f"📖 [ENDPOINT] Loading history with timestamps from bucket: {bucket_name or 'default'}")
         history = await history_service.load_history_with_timestamps(session_id, bucket_name)
@@ -763,6 +787,13 @@ async def upload_file(request: Request):
             safe_filename = unicodedata.normalize('NFC', file.filename)
             blob_name = f"{session_id}/{safe_filename}"
             blob = bucket.blob(blob_name)  # Reuse bucket from outer scope
+
+            # Páginas del PDF como metadata: la estimación de tokens previa al análisis la usa
+            if file.content_type == "application/pdf":
+                from app.services.token_estimator import token_estimator
+                page_count = await asyncio.to_thread(token_estimator.count_pdf_pages, content)
+                if page_count:
+                    blob.metadata = {"page_count": str(page_count)}
             
             # Upload to GCS in thread pool (non-blocking)
             upload_start = time.time()
@@ -11,3 +11,21 @@ async def health():
 @router.get("/")
 async def health_root():
     return {"status": "ok", "message": "Health endpoint is working"}
+
+@router.get("/health/llm")
+async def health_llm():
+    """Estadísticas de los clientes LLM compartidos (un registro por perfil)"""
+    from app.services.llm_registry import llm_registry
+    return {"status": "ok", "profiles": llm_registry.get_stats()}
+
+@router.get("/health/history-cache")
+async def health_history_cache():
+    """Ocupación y aciertos de la caché LRU de historiales de chat"""
+    from app.services.chat.history_service import history_service
+    return {"status": "ok", "cache": history_service.cache.get_stats()}
+
+@router.get("/health/intent-cache")
+async def health_intent_cache():
+    """Aciertos (exactos y casi-duplicados) y fallos de la caché de intenciones"""
+    from app.services.chat.intent_router import intent_router
+    return {"status": "ok", "cache": intent_router.cache.get_stats()}
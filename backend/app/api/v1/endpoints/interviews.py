@@ -5,6 +5,7 @@ from app.api.dependencies import get_current_user
 from app.schemas.user import Usuario
 from app.schemas.interview import Interview, InterviewCreate, InterviewUpdate
 from app.services.interview_service import interview_service
+from app.services.token_service import LimitExceededException
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +58,10 @@ async def get_summary(
     if school_id not in current_user.colegios:
         raise HTTPException(status_code=403, detail="User not authorized for this school")
     
-    summary = await interview_service.generate_global_summary(school_id, course)
+    try:
+        summary = await interview_service.generate_global_summary(school_id, course, user_id=current_user.id)
+    except LimitExceededException as e:
+        raise HTTPException(status_code=429, detail=e.message)
     return {"summary": summary}
     
 @router.post("/{interview_id}/audio", response_model=Interview)
@@ -151,6 +155,8 @@ async def generate_interview_summary_endpoint(interview_id: str):
     try:
         summary = await interview_service.generate_interview_summary(interview_id)
         return {"summary": summary}
+    except LimitExceededException as e:
+        raise HTTPException(status_code=429, detail=e.message)
     except ValueError as e:
          raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Query, File, UploadFile, Form
 from typing import List, Dict, Any, Optional
 from app.services.student_service import student_service
@@ -70,20 +71,9 @@ async def get_student_stats(student_id: str):
     Get aggregated stats for a student
     """
     try:
-        from app.services.case_service import CaseService
-        case_service = CaseService()
-        
-        # Get base stats from cases
-        stats = case_service.get_student_stats(student_id)
-        
-        # Get real commitment count
-        from app.services.commitment_service import commitment_service
-        commitments = commitment_service.get_commitments_by_student(student_id)
-        active_commitments = sum(1 for c in commitments if c.status == "vigente" or c.status == "proximo_a_vencer")
-        
-        stats["compromisosActivos"] = active_commitments
-        
-        return stats
+        # Cases, interviews and commitments counted with aggregation queries
+        from app.services.stats_service import stats_service
+        return await asyncio.to_thread(stats_service.get_student_stats, student_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
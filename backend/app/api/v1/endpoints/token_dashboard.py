@@ -5,8 +5,9 @@ from firebase_admin import firestore
 
 from app.services.users.user_service import user_service
 from app.services.school_service import school_service
+from app.services.token_service import token_service
 from app.api import dependencies # Assuming dependencies module handles auth
-from app.schemas.user import Usuario, Colegio, UsuarioUpdate, ColegioUpdate
+from app.schemas.user import Usuario, Colegio, UsuarioUpdate, ColegioUpdate, RoleName
 
 router = APIRouter()
 
@@ -27,29 +28,34 @@ async def get_global_stats(
     Solo administradores (si se implementara rol de admin global, por ahora abierto a roles con permiso dashboard).
     """
     # TODO: Validar permisos de admin si es necesario.
-    
-    # Calcular sumando todos los usuarios (fuente de verdad más granular), incluyendo inactivos
-    users = user_service.get_all_users(include_inactive=True)
-    colegios = school_service.get_all_colegios()
-    
-    total_input = 0
-    total_output = 0
-    total_tokens = 0
-    
-    for user in users:
-        if user.token_usage:
-            total_input += user.token_usage.input_tokens
-            total_output += user.token_usage.output_tokens
-            total_tokens += user.token_usage.total_tokens
-            
+    import asyncio
+    from app.services.usage_counter_service import usage_counter_service
+
+    # Totales desde los contadores sharded (N lecturas) y conteos con agregación count()
+    totals, seeded = usage_counter_service.get_totals()
+    if not seeded and current_user.rol == RoleName.ADMIN.value:
+        # Primera vez: inicializar contadores sumando todos los usuarios (incluyendo inactivos).
+        # Hasta entonces los shards solo tienen el consumo posterior al despliegue.
+        loop = asyncio.get_running_loop()
+        totals = await loop.run_in_executor(None, lambda: usage_counter_service.rebuild_from_users(only_if_unseeded=True))
+
     return {
-        "total_input_tokens": total_input,
-        "total_output_tokens": total_output,
-        "total_tokens": total_tokens,
-        "school_count": len(colegios),
-        "user_count": len(users)
+        **totals,
+        "school_count": usage_counter_service.count_documents(school_service.collection_name),
+        "user_count": usage_counter_service.count_documents(user_service.collection_name)
     }
 
+@router.post("/counters/rebuild")
+async def rebuild_global_counters(
+    current_user: Usuario = Depends(dependencies.require_admin)
+):
+    """Recalcula los contadores globales de tokens desde el consumo de cada usuario."""
+    import asyncio
+    from app.services.usage_counter_service import usage_counter_service
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, usage_counter_service.rebuild_from_users)
+
 @router.get("/stats/schools")
 async def get_schools_stats(
     current_user: Usuario = Depends(dependencies.require_active_user)
@@ -87,6 +93,7 @@ async def update_limits(
         updated = user_service.update_user(request.id, update_data)
         if not updated:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        token_service.invalidate("user", request.id)
         return updated
         
     elif request.type == "school":
@@ -99,6 +106,7 @@ async def update_limits(
         updated = school_service.update_colegio(request.id, update_data)
         if not updated:
             raise HTTPException(status_code=404, detail="Colegio no encontrado")
+        token_service.invalidate("school", request.id)
         return updated
         
     else:
@@ -119,7 +127,6 @@ async def get_token_history(
     Filtros opcionales: user_id, school_id
     """
     from datetime import datetime, timedelta, timezone
-    from app.services.users.user_service import user_service
     
     # Determinacion de fechas
     now = datetime.now(timezone.utc)
@@ -149,72 +156,45 @@ async def get_token_history(
         days_back = 30 if period == "30d" else 7
         query_start_date = now - timedelta(days=days_back)
     
-    # Calculate days for initialization
-    delta = query_end_date - query_start_date
-    total_days = delta.days + 1
-    
     try:
-        daily_stats = {}
-        
-        # Initialize dictionary
-        for i in range(total_days):
-            date_key = (query_start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-            daily_stats[date_key] = {
-                "date": date_key,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "total_tokens": 0,
-                "count": 0
-            }
-
-        if user_id:
-            # Case 1: Filter by specific User
-            logs_stream = user_service.db.collection("usuarios").document(user_id)\
-                .collection("usage_logs")\
-                .where("timestamp", ">=", query_start_date)\
-                .where("timestamp", "<=", query_end_date)\
-                .order_by("timestamp")\
-                .stream()
-
-        elif school_id:
-            # Case 2: Filter by School
-            # Query the school-specific logs (renamed to avoid collection_group collision)
-            logs_stream = user_service.db.collection("colegios").document(school_id)\
-                .collection("school_usage_logs")\
-                .where("timestamp", ">=", query_start_date)\
-                .where("timestamp", "<=", query_end_date)\
-                .order_by("timestamp")\
-                .stream()
-        
-        else:
-            # Case 3: Global
-            # Query ONLY "usage_logs" from collection group (which are User logs)
-            # This avoids double counting if we had used same name for school logs
-            # Case 3: Global
-            logs_stream = user_service.db.collection_group("usage_logs")\
-                .where("timestamp", ">=", query_start_date)\
-                .where("timestamp", "<=", query_end_date)\
-                .order_by("timestamp")\
-                .stream()
-            
-        for doc in logs_stream:
-            data = doc.to_dict()
-            ts = data.get("timestamp")
-            if ts:
-                # Handle Firestore datetime or standard datetime
-                date_str = ts.strftime("%Y-%m-%d")
-                if date_str in daily_stats:
-                    daily_stats[date_str]["input_tokens"] += data.get("input_tokens", 0)
-                    daily_stats[date_str]["output_tokens"] += data.get("output_tokens", 0)
-                    daily_stats[date_str]["total_tokens"] += data.get("total_tokens", 0)
-                    daily_stats[date_str]["count"] += 1
-                    
-        return sorted(daily_stats.values(), key=lambda x: x["date"])
+        # Lee un documento de rollup por día (usuario, colegio o global) en vez de cada log
+        from app.services.usage_rollup_service import usage_rollup_service
+        return usage_rollup_service.get_daily_history(
+            query_start_date,
+            query_end_date,
+            user_id=user_id,
+            school_id=school_id
+        )
         
     except Exception as e:
         print(f"Error fetching history: {e}")
         # Return empty list on error to not break UI
         return []
+
+@router.post("/rollups/backfill")
+async def backfill_token_rollups(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: Usuario = Depends(dependencies.require_admin)
+):
+    """
+    Reconstruye los rollups diarios desde usage_logs / school_usage_logs (solo Admin).
+    Fechas opcionales en formato YYYY-MM-DD (sin fechas = todo el historial).
+    También disponible como CLI: python -m app.services.usage_rollup_service
+    """
+    import asyncio
+    from datetime import datetime
+    from app.services.usage_rollup_service import usage_rollup_service
+
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido (YYYY-MM-DD)")
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, usage_rollup_service.backfill, start, end)
+
 @router.get("/stats/logs")
 async def get_token_logs(
     start_date: Optional[str] = None,
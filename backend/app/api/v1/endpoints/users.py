@@ -18,10 +18,14 @@ async def get_all_users(include_inactive: bool = Query(False)):
     try:
         users = user_service_simple.get_all_users(include_inactive=include_inactive)
 
+        # Colegios de todos los usuarios en una sola lectura por lotes
+        all_colegio_ids = [colegio_id for user in users for colegio_id in (user.colegios or [])]
+        colegios_by_id = {colegio.id: colegio for colegio in school_service.get_colegios_by_ids(all_colegio_ids)}
+
         # Para cada usuario, obtener la información de sus colegios
         users_with_colegios = []
         for user in users:
-            colegios_info = school_service.get_colegios_by_ids(user.colegios)
+            colegios_info = [colegios_by_id[cid] for cid in (user.colegios or []) if cid in colegios_by_id]
             users_with_colegios.append(
                 UsuarioWithColegios(
                     **user.model_dump(),
@@ -46,6 +46,44 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE_MB: int = 500  # Increased for Chunked Uploads
     MAX_TOTAL_SIZE_MB: int = 1000  # Total upload size limit
 
+    # Token usage ledger (escrituras agrupadas a Firestore)
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 5.0
+    USAGE_FLUSH_MAX_EVENTS: int = 50
+    USAGE_COUNTER_SHARDS: int = 10  # Shards del contador global de tokens
+
+    # Caché de cuotas de tokens (TokenService.check_limits)
+    QUOTA_CACHE_TTL_SECONDS: float = 30.0
+    QUOTA_REFRESH_RATIO: float = 0.9  # Sobre este % del límite se relee desde Firestore en cada verificación
+
+    # Estimación local de tokens (pre-flight antes de llamar al modelo)
+    TOKEN_ESTIMATE_CHARS_PER_TOKEN: float = 3.5  # Valor inicial para español; se calibra con el uso real
+    MAX_REQUEST_INPUT_TOKENS: int = 900000  # Margen bajo la ventana de contexto de Gemini
+
+    # Historial de chat con ventana (últimos N turnos + resumen acumulado en chat_sessions)
+    HISTORY_WINDOW_TURNS: int = 10  # 0 = historial completo
+    HISTORY_SUMMARY_EVERY_TURNS: int = 5  # Cada cuántos turnos se actualiza el resumen
+    HISTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Caché LRU de historiales en memoria (0 = deshabilitada)
+    HISTORY_PAGED_STORAGE: bool = False  # Guardar mensajes en páginas (message_pages) y migrar sesiones antiguas
+    HISTORY_PAGE_SIZE: int = 50  # Máximo de mensajes por página
+    HISTORY_PAGE_MAX_BYTES: int = 800 * 1024  # Máximo estimado por página (límite de Firestore: 1 MiB por documento)
+    HISTORY_GCS_FALLBACK: bool = True  # Leer sesiones legacy desde GCS; desactivar tras gcs_session_migration
+
+    # Listado de casos desde el índice case_access/{user_id}; activar tras case_access_service backfill
+    CASE_ACCESS_INDEX: bool = False
+
+    # Lecturas especulativas en paralelo con la clasificación de intención (stream_chat)
+    CHAT_SPECULATIVE_PREFETCH: bool = True
+
+    # Clasificador local de intención (app/services/chat/models/intent_classifier.json)
+    # Activar solo con un modelo entrenado y evaluado sobre decisiones registradas (no solo la semilla)
+    INTENT_LOCAL_CLASSIFIER: bool = False
+    INTENT_LOCAL_THRESHOLD: float = 0.85  # Bajo esta probabilidad decide el LLM
+    INTENT_DECISION_LOGGING: bool = False  # Registrar decisiones del LLM (mensaje redactado) en intent_decisions
+    INTENT_DECISION_RETENTION_DAYS: int = 30  # expires_at de cada decisión (política TTL + purge del CLI)
+    INTENT_CACHE_MAX_ENTRIES: int = 5000  # Caché de clasificaciones por mensaje normalizado (0 = deshabilitada)
+    INTENT_CACHE_TTL_SECONDS: float = 3600.0
+    INTENT_CACHE_SIMILARITY: float = 0.8  # Jaccard estimada (MinHash) mínima para casi-duplicados
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -89,6 +89,21 @@ async def startup_event():
     logger.info(f"🚀 Application startup complete - listening on port {port}")
     logger.info(f"📍 Environment: {'Cloud Run' if os.getenv('K_SERVICE') else 'Local'}")
 
+    # Pre-construir clientes LLM compartidos fuera del event loop
+    import asyncio
+    from app.services.llm_registry import llm_registry
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, llm_registry.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persiste el consumo de tokens pendiente antes de apagar la instancia"""
+    import asyncio
+    from app.services.usage_ledger import usage_ledger
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, usage_ledger.stop)
+    logger.info("🛑 Application shutdown complete - usage ledger flushed")
+
 @app.get("/")
 async def root():
     """Root endpoint - basic health check"""
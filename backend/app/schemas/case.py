@@ -100,6 +100,29 @@ class Case(BaseModel):
     class Config:
         from_attributes = True
 
+class CaseListItem(BaseModel):
+    """Caso en listados (solo los campos de la tarjeta; el modelo completo en GET /cases/{case_id})"""
+    id: str
+    title: Optional[str] = None
+    status: str = "active"
+    case_type: Optional[str] = None
+    counter_case: Optional[str] = None
+    protocol: Optional[str] = None
+    student_id: Optional[str] = None
+    owner_id: Optional[str] = None
+    owner_name: Optional[str] = None
+    colegio_id: Optional[str] = None
+    is_shared: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    involved_names: List[str] = []  # Nombres de los involucrados (búsqueda en la tarjeta)
+    next_step: Optional[dict] = None  # Primer paso pendiente con plazo: {index, deadline, estimated_time}
+
+class CaseListPage(BaseModel):
+    """Página de un listado de casos"""
+    items: List[CaseListItem]
+    next_cursor: Optional[str] = None  # Cursor opaco (orden + ID del último caso); None si no hay más
+
 class CaseWithPermissions(Case):
     """Caso con información de permisos compartidos"""
     permissions: List[CasePermission] = []
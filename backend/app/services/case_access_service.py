@@ -0,0 +1,202 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+from google.cloud import firestore
+from google.cloud.firestore import FieldFilter
+from app.core.config import get_settings
+from app.services.page_cursor import InvalidCursorError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+OWNER_ROLE = "owner"
+# Campos del caso copiados en cada entrada del índice
+CASE_ACCESS_FIELDS = ["colegio_id", "created_at", "title", "status"]
+BATCH_LIMIT = 500  # Máximo de operaciones por batch en Firestore
+
+
+class CaseAccessService:
+    """
+    Índice materializado de acceso a casos por usuario.
+
+    case_access/{user_id}/cases/{case_id} = {case_id, colegio_id, role, created_at, title, status}
+    con role "owner", "view" o "edit". Se mantiene al crear, compartir, revocar, editar
+    (título/estado) y eliminar casos, de modo que listar los casos de un usuario es una
+    sola query indexada (colegio_id + created_at) sobre su propia subcolección.
+
+    Las escrituras del índice no hacen fallar la operación principal: si alguna falla
+    se registra y `backfill` la corrige.
+    """
+
+    def __init__(self):
+        self.collection_name = "case_access"
+        self.entries_collection_name = "cases"
+        self.cases_collection_name = "cases"
+        self.permissions_collection_name = "case_permissions"
+
+    @property
+    def db(self):
+        from app.services.case_service import case_service
+        return case_service.db
+
+    def _entries_ref(self, user_id: str):
+        return self.db.collection(self.collection_name).document(user_id).collection(self.entries_collection_name)
+
+    @staticmethod
+    def build_entry(case_id: str, case_data: dict, role: str) -> dict:
+        """Entrada del índice a partir de los datos del caso."""
+        entry = {field: case_data.get(field) for field in CASE_ACCESS_FIELDS}
+        entry.update({"case_id": case_id, "role": role})
+        return entry
+
+    def _load_case_fields(self, case_id: str) -> Optional[dict]:
+        doc = (self.db.collection(self.cases_collection_name).document(case_id)
+               .get(field_paths=CASE_ACCESS_FIELDS + ["owner_id"]))
+        return doc.to_dict() if doc.exists else None
+
+    # ---------- Mantenimiento ----------
+
+    def add_entry(self, user_id: str, case_id: str, role: str, case_data: Optional[dict] = None):
+        """Agrega (o reemplaza) la entrada de un usuario. Lee el caso si no se entregan sus datos."""
+        if not user_id:
+            return
+        try:
+            if case_data is None:
+                case_data = self._load_case_fields(case_id)
+                if case_data is None:
+                    logger.warning(f"⚠️ [CASE_ACCESS] Case {case_id} not found, entry for {user_id} not written")
+                    return
+            self._entries_ref(user_id).document(case_id).set(self.build_entry(case_id, case_data, role))
+        except Exception as e:
+            logger.error(f"❌ [CASE_ACCESS] Error writing entry {user_id}/{case_id}: {e}")
+
+    def set_role(self, user_id: str, case_id: str, role: str):
+        try:
+            self._entries_ref(user_id).document(case_id).set({"role": role}, merge=True)
+        except Exception as e:
+            logger.error(f"❌ [CASE_ACCESS] Error updating role {user_id}/{case_id}: {e}")
+
+    def remove_entry(self, user_id: str, case_id: str):
+        try:
+            self._entries_ref(user_id).document(case_id).delete()
+        except Exception as e:
+            logger.error(f"❌ [CASE_ACCESS] Error removing entry {user_id}/{case_id}: {e}")
+
+    def update_case_fields(self, case_id: str, user_ids: Iterable[str], fields: dict):
+        """Propaga cambios de título/estado del caso a las entradas de sus usuarios."""
+        updates = {k: v for k, v in fields.items() if k in CASE_ACCESS_FIELDS}
+        if not updates:
+            return
+        try:
+            batch = self.db.batch()
+            for user_id in {u for u in user_ids if u}:
+                batch.set(self._entries_ref(user_id).document(case_id), updates, merge=True)
+            batch.commit()
+        except Exception as e:
+            logger.error(f"❌ [CASE_ACCESS] Error updating entries for case {case_id}: {e}")
+
+    def remove_case(self, case_id: str, user_ids: Iterable[str]):
+        """Elimina las entradas de un caso borrado."""
+        try:
+            batch = self.db.batch()
+            for user_id in {u for u in user_ids if u}:
+                batch.delete(self._entries_ref(user_id).document(case_id))
+            batch.commit()
+        except Exception as e:
+            logger.error(f"❌ [CASE_ACCESS] Error removing entries for case {case_id}: {e}")
+
+    # ---------- Lectura ----------
+
+    def list_entries(self, user_id: str, colegio_id: str, limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> List[dict]:
+        """
+        Entradas del usuario en un colegio, más recientes primero.
+
+        Args:
+            user_id: ID del usuario
+            colegio_id: ID del colegio
+            limit: Máximo de entradas (None = todas)
+            cursor: case_id de la última entrada de la página anterior
+
+        Returns:
+            Lista de entradas del índice
+
+        Raises:
+            InvalidCursorError: si la entrada del cursor ya no existe
+        """
+        entries_ref = self._entries_ref(user_id)
+        query = (entries_ref
+                 .where(filter=FieldFilter("colegio_id", "==", colegio_id))
+                 .order_by("created_at", direction=firestore.Query.DESCENDING))
+        if cursor:
+            cursor_doc = entries_ref.document(cursor).get()
+            if not cursor_doc.exists:
+                raise InvalidCursorError(cursor)
+            query = query.start_after(cursor_doc)
+        if limit:
+            query = query.limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+    # ---------- Backfill ----------
+
+    def backfill(self, limit: Optional[int] = None) -> dict:
+        """
+        Reconstruye el índice desde cases (owner) y case_permissions (compartidos).
+        Es idempotente: cada entrada se escribe completa con set().
+        """
+        stats = {"cases": 0, "owner_entries": 0, "shared_entries": 0, "skipped_permissions": 0}
+        case_fields: Dict[str, dict] = {}
+        operations = []
+
+        def flush():
+            batch = self.db.batch()
+            for user_id, case_id, entry in operations:
+                batch.set(self._entries_ref(user_id).document(case_id), entry)
+            batch.commit()
+            operations.clear()
+
+        cases_query = self.db.collection(self.cases_collection_name).select(CASE_ACCESS_FIELDS + ["owner_id"])
+        for doc in cases_query.stream():
+            if limit is not None and stats["cases"] >= limit:
+                break
+            stats["cases"] += 1
+            data = doc.to_dict() or {}
+            case_fields[doc.id] = data
+            if data.get("owner_id"):
+                operations.append((data["owner_id"], doc.id, self.build_entry(doc.id, data, OWNER_ROLE)))
+                stats["owner_entries"] += 1
+            if len(operations) >= BATCH_LIMIT:
+                flush()
+
+        permissions_query = (self.db.collection(self.permissions_collection_name)
+                             .select(["case_id", "user_id", "permission_type"]))
+        for doc in permissions_query.stream():
+            data = doc.to_dict() or {}
+            case_data = case_fields.get(data.get("case_id"))
+            if case_data is None or not data.get("user_id"):
+                # Caso inexistente (o fuera del límite de esta ejecución)
+                stats["skipped_permissions"] += 1
+                continue
+            operations.append((data["user_id"], data["case_id"],
+                               self.build_entry(data["case_id"], case_data, data.get("permission_type"))))
+            stats["shared_entries"] += 1
+            if len(operations) >= BATCH_LIMIT:
+                flush()
+
+        if operations:
+            flush()
+        logger.info(f"✅ [CASE_ACCESS] Backfill finished: {stats}")
+        return stats
+
+
+# Instancia singleton
+case_access_service = CaseAccessService()
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.case_access_service backfill [límite de casos]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        print(case_access_service.backfill(int(sys.argv[2]) if len(sys.argv) > 2 else None))
+    else:
+        print("Uso: python -m app.services.case_access_service backfill [límite de casos]")
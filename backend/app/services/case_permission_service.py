@@ -5,6 +5,7 @@ from typing import List, Optional
 from google.cloud import firestore
 from app.core.config import get_settings
 from app.schemas.case import CasePermission, CasePermissionCreate, PermissionType
+from app.services.case_access_service import case_access_service
 
 
 logger = logging.getLogger(__name__)
@@ -68,6 +69,7 @@ class CasePermissionService:
 
         doc_ref = self.db.collection(self.collection_name).document(permission_id)
         doc_ref.set(permission_dict)
+        case_access_service.add_entry(user_id, case_id, permission_type.value)
 
         logger.info(f" Permiso {permission_type.value} otorgado a usuario {user_id} para caso {case_id}")
 
@@ -103,6 +105,7 @@ class CasePermissionService:
         doc = docs[0]
         doc_ref = self.db.collection(self.collection_name).document(doc.id)
         doc_ref.update({"permission_type": permission_type.value})
+        case_access_service.set_role(user_id, case_id, permission_type.value)
 
         logger.info(f" Permiso actualizado a {permission_type.value} para usuario {user_id} en caso {case_id}")
 
@@ -142,6 +145,7 @@ class CasePermissionService:
 
         # Eliminar el permiso
         doc.reference.delete()
+        case_access_service.remove_entry(user_id, case_id)
         logger.info(f" Permiso revocado para usuario {user_id} en caso {case_id}")
 
         return True
@@ -259,6 +263,7 @@ class CasePermissionService:
         count = 0
         for doc in docs:
             doc.reference.delete()
+            case_access_service.remove_entry(doc.to_dict().get("user_id"), case_id)
             count += 1
 
         logger.info(f" {count} permisos eliminados para caso {case_id}")
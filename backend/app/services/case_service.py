@@ -1,25 +1,43 @@
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 from google.cloud import firestore
 from google.cloud import storage
 from google.cloud.firestore import FieldFilter
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_vertexai import ChatVertexAI
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 from app.schemas.case import Case, CaseCreate, InvolvedPerson
+from app.services.case_access_service import case_access_service, OWNER_ROLE, CASE_ACCESS_FIELDS
+from app.services.firestore_batch import get_documents
+from app.services.page_cursor import InvalidCursorError, decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+NO_OWNER_COUNTER_ID = "sin_owner"  # Contador de casos sin owner_id (legacy)
+
+# Campos de la tarjeta de un caso en listados (CaseListItem)
+CASE_LIST_FIELDS = [
+    "id", "title", "status", "case_type", "counter_case", "protocol", "student_id",
+    "owner_id", "owner_name", "colegio_id", "is_shared", "created_at", "updated_at"
+]
+# Campos leídos para armar la tarjeta: además de los anteriores, los que se resumen
+# en involved_names y next_step
+CASE_LIST_SOURCE_FIELDS = CASE_LIST_FIELDS + ["involved", "pasosProtocolo"]
+CASE_LIST_SORT_FIELDS = ("created_at", "updated_at")
+# Estados de un paso de protocolo que ya no tiene plazo pendiente
+PROTOCOL_STEP_DONE_STATUSES = {"completed", "completado", "skipped"}
+
 class CaseService:
     def __init__(self):
         self._db = None
         self.collection_name = "cases"
         self.protocol_collection_name = "case_protocols"
         self.documents_collection_name = "case_documents"
+        self.counter_collection_name = "case_counters"
         self._llm = None
         self._storage_client = None
 
@@ -30,43 +48,9 @@ class CaseService:
         return self._db
 
     def get_student_stats(self, student_id: str) -> dict:
-        """Obtiene estadísticas de un estudiante"""
-        try:
-            # Query cases by student_id
-            cases_ref = self.db.collection(self.collection_name).where(filter=FieldFilter("student_id", "==", student_id))
-            cases = list(cases_ref.stream())
-
-            casos_activos = 0
-            casos_cerrados = 0
-            
-            # Simple aggregation
-            for doc in cases:
-                data = doc.to_dict()
-                status = data.get("status", "active")
-                if status == "active" or status == "abierto" or status == "pendiente":
-                    casos_activos += 1
-                else:
-                    casos_cerrados += 1
-
-            # Mocking other metrics for now until we have dedicated collections/links
-            # In V2 we should introspect protocols or dedicated Interview/Commitment collections
-            entrevistas = 0 # Placeholder for now, or count case documents of type interview?
-            compromisos_activos = 0 # Placeholder
-            
-            return {
-                "casosActivos": casos_activos,
-                "casosCerrados": casos_cerrados,
-                "entrevistas": entrevistas,
-                "compromisosActivos": compromisos_activos
-            }
-        except Exception as e:
-            logger.error(f"Error getting student stats: {e}")
-            return {
-                "casosActivos": 0,
-                "casosCerrados": 0,
-                "entrevistas": 0,
-                "compromisosActivos": 0
-            }
+        """Obtiene estadísticas de un estudiante (agregaciones count(), ver StatsService)"""
+        from app.services.stats_service import stats_service
+        return stats_service.get_student_stats(student_id)
 
 
     def get_cases_by_student(self, student_id: str) -> List[dict]:
@@ -85,11 +69,9 @@ class CaseService:
             model_name = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL_REASON or settings.VERTEX_MODEL
             
             logger.info(f"🤖 [CASE_SERVICE] Initializing LLM with model: {model_name}")
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
                 temperature=0.1, # Low temperature for extraction
-                project=settings.PROJECT_ID,
-                location=settings.VERTEX_LOCATION or "us-central1",
             )
         return self._llm
 
@@ -534,7 +516,10 @@ IMPORTANTE: Responde SOLO con el JSON, sin texto adicional antes o después."""
     async def generate_case_summary(self, case_id: str, user_id: str = None) -> dict:
         """
         Genera un resumen inteligente del caso usando IA.
+        Lanza LimitExceededException si la estimación previa excede la cuota del usuario.
         """
+        from app.services.token_service import token_service, LimitExceededException
+
         try:
             # 1. Obtener caso
             case = self.get_case_by_id(case_id)
@@ -623,6 +608,18 @@ RESPONDE SOLO CON JSON VÁLIDO:
             
             logger.info(f"Adding {docs_added} documents to summary analysis")
 
+            # Pre-flight: recortar documentos que no caben y verificar cuota con la estimación local
+            import asyncio
+            from app.services.token_estimator import token_estimator
+            content, estimated_tokens, dropped = await asyncio.to_thread(
+                token_estimator.fit_parts, content, token_estimator.max_request_tokens
+            )
+            if dropped:
+                logger.warning(f"Dropped {dropped} documents from summary of case {case_id} to fit the context window")
+            if user_id:
+                token_service.check_limits(user_id, input_tokens_cost=estimated_tokens)
+            logger.info(f"Estimated summary input: ~{estimated_tokens} tokens")
+
             # 5. Invocar LLM
             messages = [HumanMessage(content=content)]
             logger.debug("Invoking AI to generate summary with documents...")
@@ -711,6 +708,8 @@ RESPONDE SOLO CON JSON VÁLIDO:
             
             return parsed_data
 
+        except LimitExceededException:
+            raise
         except Exception as e:
             import traceback
             logger.exception("Error generating summary")
@@ -849,31 +848,8 @@ RESPONDE SOLO CON JSON VÁLIDO:
             ID del documento creado o None si hubo error
         """
         try:
-            doc_id = str(uuid.uuid4())
-            now = datetime.utcnow()
-
-            # Formatear tamaño del archivo
-            size_bytes = file_data.get("size", 0)
-            if size_bytes < 1024:
-                size_str = f"{size_bytes} B"
-            elif size_bytes < 1024 * 1024:
-                size_str = f"{size_bytes / 1024:.1f} KB"
-            else:
-                size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
-
-            document_data = {
-                "id": doc_id,
-                "case_id": case_id,
-                "name": file_data["name"],
-                "gcs_uri": file_data["gcs_uri"],
-                "size": size_str,
-                "size_bytes": size_bytes,
-                "content_type": file_data["content_type"],
-                "source": source,
-                "session_id": file_data.get("session_id"),
-                "created_at": now,
-                "uploaded_at": now
-            }
+            document_data = self._build_document_data(case_id, file_data, source)
+            doc_id = document_data["id"]
 
             # Guardar en Firestore
             doc_ref = self.db.collection(self.documents_collection_name).document(doc_id)
@@ -885,6 +861,62 @@ RESPONDE SOLO CON JSON VÁLIDO:
             logger.error(f"Error saving single document: {e}")
             return None
 
+    def save_documents(self, case_id: Optional[str], files: List[dict], source: str = "chat") -> List[str]:
+        """
+        Guarda varios documentos de un caso en un solo batch.
+
+        Args:
+            case_id: ID del caso
+            files: Lista de file_data (ver save_single_document)
+            source: Fuente de los documentos
+
+        Returns:
+            IDs de los documentos creados (vacía si hubo error)
+        """
+        if not files:
+            return []
+        try:
+            batch = self.db.batch()
+            doc_ids = []
+            for file_data in files:
+                document_data = self._build_document_data(case_id, file_data, source)
+                batch.set(self.db.collection(self.documents_collection_name).document(document_data["id"]), document_data)
+                doc_ids.append(document_data["id"])
+            batch.commit()
+            logger.info(f"{len(doc_ids)} documents saved to case {case_id}: {[f['name'] for f in files]}")
+            return doc_ids
+
+        except Exception as e:
+            logger.error(f"Error saving documents to case {case_id}: {e}")
+            return []
+
+    def _build_document_data(self, case_id: Optional[str], file_data: dict, source: str) -> dict:
+        doc_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+
+        # Formatear tamaño del archivo
+        size_bytes = file_data.get("size", 0)
+        if size_bytes < 1024:
+            size_str = f"{size_bytes} B"
+        elif size_bytes < 1024 * 1024:
+            size_str = f"{size_bytes / 1024:.1f} KB"
+        else:
+            size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
+
+        return {
+            "id": doc_id,
+            "case_id": case_id,
+            "name": file_data["name"],
+            "gcs_uri": file_data["gcs_uri"],
+            "size": size_str,
+            "size_bytes": size_bytes,
+            "content_type": file_data["content_type"],
+            "source": source,
+            "session_id": file_data.get("session_id"),
+            "created_at": now,
+            "uploaded_at": now
+        }
+
     def get_case_documents(self, case_id: str) -> List[dict]:
         """
         Obtiene todos los documentos de un caso.
@@ -1051,62 +1083,49 @@ RESPONDE SOLO CON JSON VÁLIDO:
     def _generate_next_counter_case(self, user_id: str) -> str:
         """
         Genera el siguiente ID legible para el usuario.
+
+        Usa un contador por owner (case_counters/{user_id}) incrementado en una transacción,
+        así dos creaciones simultáneas no reciben el mismo número. La primera vez el
+        contador se inicializa con el mayor C-NNN existente del usuario.
         """
         try:
-            # Buscar casos del usuario
-            # Nota: No usamos order_by aquí para evitar requerir un índice compuesto
-            docs = (self.db.collection(self.collection_name)
-                   .where(filter=FieldFilter("owner_id", "==", user_id))
-                   .stream())
-            
-            # Convertir a lista y ordenar en memoria
-            cases_data = []
-            for doc in docs:
-                cases_data.append(doc.to_dict())
-            
-            # Ordenar por fecha creación descendente
-            cases_data.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-            
-            last_counter = 0
-            
-            for data in cases_data:
-                c_case = data.get("counter_case")
-                if c_case and c_case.startswith("C-"):
-                    try:
-                        # Extraer número: "C-005" -> 5
-                        num_part = int(c_case.split("-")[1])
-                        if num_part > last_counter:
-                            last_counter = num_part
-                            # No hacemos break aquí porque queremos encontrar el MAXIMO, 
-                            # y aunque ordenamos por fecha, es más seguro revisar todos 
-                            # o confiar en el sort. Si confiamos en el sort (desc), 
-                            # el primero que encontremos debería ser el más alto SI 
-                            # la fecha correlaciona con el ID. 
-                            # Para estar 100% seguros de encontrar el ID más alto usado 
-                            # (por si hubo borrados o fechas raras), iteramos todo o usamos max()
-                    except:
-                        continue
-            
-            # Mejor enfoque: encontrar el maximo numero usado independientemente de la fecha
-            # Re-iteramos para asegurar el maximo absoluto
-            max_val = 0
-            for data in cases_data:
-                 c_case = data.get("counter_case")
-                 if c_case and c_case.startswith("C-"):
-                     try:
-                         val = int(c_case.split("-")[1])
-                         if val > max_val:
-                             max_val = val
-                     except:
-                         pass
-            
-            next_counter = max_val + 1
+            counter_ref = self.db.collection(self.counter_collection_name).document(user_id or NO_OWNER_COUNTER_ID)
+
+            @firestore.transactional
+            def next_in_transaction(transaction):
+                snapshot = counter_ref.get(transaction=transaction)
+                last_counter = (snapshot.to_dict() or {}).get("last_counter") if snapshot.exists else None
+                if last_counter is None:
+                    last_counter = self._seed_counter_case(user_id)
+                next_counter = last_counter + 1
+                transaction.set(counter_ref, {"last_counter": next_counter, "updated_at": datetime.utcnow()}, merge=True)
+                return next_counter
+
+            next_counter = next_in_transaction(self.db.transaction())
             return f"C-{next_counter:03d}"
             
         except Exception as e:
             logger.info(f"Error generating counter_case: {e}")
             return "C-001" # Fallback
 
+    def _seed_counter_case(self, user_id: str) -> int:
+        """Mayor número C-NNN entre los casos existentes del usuario (0 si no hay)."""
+        docs = (self.db.collection(self.collection_name)
+               .where(filter=FieldFilter("owner_id", "==", user_id))
+               .select(["counter_case"])
+               .stream())
+        max_val = 0
+        for doc in docs:
+            c_case = (doc.to_dict() or {}).get("counter_case")
+            if c_case and c_case.startswith("C-"):
+                try:
+                    # Extraer número: "C-005" -> 5
+                    max_val = max(max_val, int(c_case.split("-")[1]))
+                except ValueError:
+                    continue
+        logger.info(f"🔢 Counter for owner {user_id} seeded at {max_val}")
+        return max_val
+
     async def _generate_ai_summary_with_llm(
         self, 
         case_data: CaseCreate,
@@ -1316,6 +1335,7 @@ Genera el análisis estructurado:"""
                 case_dict["protocol"] = ext["protocolo_aplicable"]
 
         self.db.collection(self.collection_name).document(case_id).set(case_dict)
+        case_access_service.add_entry(case_dict.get("owner_id"), case_id, OWNER_ROLE, case_dict)
         logger.info(f"✅ Caso {case_id} creado (async)")
         return Case(**case_dict)
 
@@ -1337,6 +1357,7 @@ Genera el análisis estructurado:"""
             case_dict["ai_summary"] = ai_summary
 
         self.db.collection(self.collection_name).document(case_id).set(case_dict)
+        case_access_service.add_entry(case_dict.get("owner_id"), case_id, OWNER_ROLE, case_dict)
         logger.info(f"✅ Caso {case_id} creado (sync)")
         return Case(**case_dict)
 
@@ -1373,20 +1394,90 @@ Genera el análisis estructurado:"""
             cases.append(Case(**doc.to_dict()))
         return cases
 
-    def get_cases_for_user(self, user_id: str, colegio_id: str) -> List[Case]:
+    def get_cases_for_user(self, user_id: str, colegio_id: str, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[Case]:
         """
         Obtiene todos los casos accesibles para un usuario:
         - Casos donde el usuario es owner
         - Casos compartidos con el usuario
         - Filtrados por colegio
 
+        Con CASE_ACCESS_INDEX se lee el índice case_access/{user_id} (una query indexada
+        por página); si no, se usa el cálculo anterior (owner + compartidos + legacy).
+
         Args:
             user_id: ID del usuario
             colegio_id: ID del colegio
+            limit: Máximo de casos a retornar (None = todos)
+            cursor: ID del último caso de la página anterior
 
         Returns:
             Lista de casos accesibles
+
+        Raises:
+            InvalidCursorError: si el caso del cursor ya no está en el listado
         """
+        if settings.CASE_ACCESS_INDEX:
+            try:
+                return self._get_cases_from_access_index(user_id, colegio_id, limit, cursor)
+            except InvalidCursorError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ [CASE_ACCESS] Index query failed, using legacy listing: {e}")
+
+        cases = self._get_cases_for_user_legacy(user_id, colegio_id)
+        if cursor:
+            ids = [case.id for case in cases]
+            if cursor not in ids:
+                raise InvalidCursorError(cursor)
+            cases = cases[ids.index(cursor) + 1:]
+        return cases[:limit] if limit else cases
+
+    def _get_cases_from_access_index(self, user_id: str, colegio_id: str, limit: Optional[int] = None,
+                                     cursor: Optional[str] = None) -> List[Case]:
+        """Casos del usuario desde case_access, en el orden del índice (created_at DESC)."""
+        cases, stale_ids, index_empty = [], [], True
+        while True:
+            entries = case_access_service.list_entries(user_id, colegio_id, limit, cursor)
+            index_empty = index_empty and not entries
+            case_docs = get_documents(self.db, self.collection_name, [entry["case_id"] for entry in entries])
+            stale_ids.extend(entry["case_id"] for entry in entries if entry["case_id"] not in case_docs)
+            cases_by_id = self._parse_cases(case_docs)
+            cases.extend(cases_by_id[entry["case_id"]] for entry in entries if entry["case_id"] in cases_by_id)
+            if not limit or len(entries) < limit or len(cases) >= limit:
+                break
+            # Página incompleta por entradas huérfanas: se sigue leyendo el índice para llenarla
+            cursor = entries[-1]["case_id"]
+
+        for case_id in stale_ids:
+            # Entrada huérfana (caso borrado sin actualizar el índice): se elimina para no ocupar la página.
+            # Se borra al final porque la última entrada leída puede ser el cursor de la siguiente lectura.
+            logger.warning(f"⚠️ [CASE_ACCESS] Stale entry {user_id}/{case_id}, removing")
+            case_access_service.remove_entry(user_id, case_id)
+
+        if index_empty and not cursor:
+            # Casos antiguos sin owner_id (no están en el índice), solo del mismo colegio
+            cases = self._get_legacy_cases_by_school(colegio_id)
+        return cases[:limit] if limit else cases
+
+    def _get_legacy_cases_by_school(self, colegio_id: str) -> List[Case]:
+        legacy_cases = []
+        try:
+            query = self.db.collection(self.collection_name).where(filter=FieldFilter("colegio_id", "==", colegio_id))
+            for doc in query.stream():
+                case_dict = doc.to_dict()
+                if case_dict.get("owner_id"):
+                    continue
+                try:
+                    legacy_cases.append(Case(**case_dict))
+                except Exception as e:
+                    logger.warning(f" Error parseando caso legacy {doc.id}: {e}")
+        except Exception as e:
+            logger.error(f" Error obteniendo casos legacy: {e}")
+        return sorted(legacy_cases, key=lambda c: c.created_at, reverse=True)
+
+    def _get_cases_for_user_legacy(self, user_id: str, colegio_id: str) -> List[Case]:
+        """Listado anterior al índice case_access (owner + compartidos + legacy)."""
         from app.services.case_permission_service import case_permission_service
 
         owner_cases = []
@@ -1428,15 +1519,12 @@ Genera el análisis estructurado:"""
 
         shared_cases = []
         if shared_case_ids:
-            # Obtener los casos compartidos que pertenezcan al mismo colegio
-            for case_id in shared_case_ids:
-                try:
-                    case = self.get_case_by_id(case_id)
-                    if case and case.colegio_id == colegio_id:
-                        shared_cases.append(case)
-                except Exception as e:
-                    logger.warning(f" Error obteniendo caso compartido {case_id}: {e}")
-                    continue
+            # Obtener los casos compartidos que pertenezcan al mismo colegio (una lectura por lotes)
+            try:
+                shared_cases = [case for case in self.get_cases_by_ids(shared_case_ids).values()
+                                if case.colegio_id == colegio_id]
+            except Exception as e:
+                logger.warning(f" Error obteniendo casos compartidos: {e}")
 
         # 3. TEMPORAL: Si no hay casos con owner, mostrar todos los casos como fallback
         # Esto permite ver casos antiguos antes de la migración
@@ -1498,6 +1586,188 @@ Genera el análisis estructurado:"""
 
         return cases
 
+    # ---------- Listados (CaseListItem) ----------
+
+    def _case_list_item(self, doc_id: str, data: dict) -> dict:
+        item = {field: data.get(field) for field in CASE_LIST_FIELDS}
+        item["id"] = doc_id
+        item["status"] = item["status"] or "active"
+        item["is_shared"] = bool(item["is_shared"])
+        item["involved_names"] = [person.get("name") for person in data.get("involved") or []
+                                  if isinstance(person, dict) and person.get("name")]
+        item["next_step"] = self._next_protocol_step(data.get("pasosProtocolo"))
+        return item
+
+    @staticmethod
+    def _next_protocol_step(steps: Optional[List[dict]]) -> Optional[dict]:
+        """Primer paso pendiente del protocolo, si tiene plazo (deadline o estimated_time)."""
+        for index, step in enumerate(steps or []):
+            if not isinstance(step, dict) or step.get("status") in PROTOCOL_STEP_DONE_STATUSES:
+                continue
+            if step.get("deadline") or step.get("estimated_time"):
+                return {"index": index, "deadline": step.get("deadline"), "estimated_time": step.get("estimated_time")}
+            return None
+        return None
+
+    def list_school_cases(
+        self,
+        colegio_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        case_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        sort_by: str = "created_at",
+        descending: bool = True
+    ) -> dict:
+        """
+        Página de casos de un colegio con solo los campos de la tarjeta (select).
+        Filtro, orden y paginación se resuelven en Firestore (firestore.indexes.json tiene un
+        índice para cada combinación de filtros, sort_by y orden); si el índice aún no
+        existe se hace en memoria sobre la misma proyección.
+
+        Args:
+            colegio_id: ID del colegio
+            limit: Casos por página
+            cursor: next_cursor de la página anterior (valor de sort_by + ID del último caso)
+            status / case_type: Filtros de igualdad opcionales
+            date_from / date_to: Rango sobre el campo de orden (sort_by)
+            sort_by: created_at o updated_at
+            descending: Orden descendente (más recientes primero)
+
+        Returns:
+            {"items": [CaseListItem], "next_cursor": str | None}
+
+        Raises:
+            InvalidCursorError: si el cursor no se puede leer
+        """
+        collection = self.db.collection(self.collection_name)
+        cursor_position = decode_cursor(cursor) if cursor else None
+        try:
+            query = collection.where(filter=FieldFilter("colegio_id", "==", colegio_id))
+            if status:
+                query = query.where(filter=FieldFilter("status", "==", status))
+            if case_type:
+                query = query.where(filter=FieldFilter("case_type", "==", case_type))
+            if date_from:
+                query = query.where(filter=FieldFilter(sort_by, ">=", date_from))
+            if date_to:
+                query = query.where(filter=FieldFilter(sort_by, "<=", date_to))
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = (query.order_by(sort_by, direction=direction)
+                     .order_by("__name__", direction=direction)
+                     .select(CASE_LIST_SOURCE_FIELDS))
+            if cursor_position:
+                # Por valor: sigue funcionando aunque el último caso de la página se haya borrado
+                sort_value, cursor_id = cursor_position
+                query = query.start_after({sort_by: sort_value, "__name__": collection.document(cursor_id)})
+
+            docs = list(query.limit(limit + 1).stream())
+            items = [self._case_list_item(doc.id, doc.to_dict() or {}) for doc in docs[:limit]]
+            return {"items": items, "next_cursor": self._case_list_cursor(items[-1], sort_by) if len(docs) > limit else None}
+
+        except Exception as e:
+            logger.warning(f"⚠️ Indexed case list failed for school {colegio_id} (missing index?), paging in memory: {e}")
+            query = collection.where(filter=FieldFilter("colegio_id", "==", colegio_id)).select(CASE_LIST_SOURCE_FIELDS)
+            items = [self._case_list_item(doc.id, doc.to_dict() or {}) for doc in query.stream()]
+            return self._page_case_items(items, limit, cursor, status, case_type, date_from, date_to, sort_by, descending)
+
+    def list_cases_for_user(
+        self,
+        user_id: str,
+        colegio_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        case_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        sort_by: str = "created_at",
+        descending: bool = True
+    ) -> dict:
+        """
+        Página de casos accesibles para un usuario (propios + compartidos), como
+        list_school_cases. Los casos se leen proyectados (select / get_all con máscara)
+        y se filtran y ordenan aquí: el volumen por usuario es acotado.
+        """
+        items = []
+        case_ids = None
+        if settings.CASE_ACCESS_INDEX:
+            try:
+                case_ids = [entry["case_id"] for entry in case_access_service.list_entries(user_id, colegio_id)]
+            except Exception as e:
+                logger.warning(f"⚠️ [CASE_ACCESS] Index query failed, using owner/permission lookups: {e}")
+
+        if case_ids is None:
+            from app.services.case_permission_service import case_permission_service
+            try:
+                owner_query = (self.db.collection(self.collection_name)
+                               .where(filter=FieldFilter("owner_id", "==", user_id))
+                               .where(filter=FieldFilter("colegio_id", "==", colegio_id))
+                               .select(CASE_LIST_SOURCE_FIELDS))
+                items = [self._case_list_item(doc.id, doc.to_dict() or {}) for doc in owner_query.stream()]
+            except Exception as e:
+                logger.warning(f"⚠️ Error en query de casos por owner: {e}")
+            owned_ids = {item["id"] for item in items}
+            case_ids = [case_id for case_id in case_permission_service.get_cases_shared_with_user(user_id)
+                        if case_id not in owned_ids]
+
+        for case_id, data in get_documents(self.db, self.collection_name, case_ids, field_paths=CASE_LIST_SOURCE_FIELDS).items():
+            if data.get("colegio_id") == colegio_id:
+                items.append(self._case_list_item(case_id, data))
+
+        if not items:
+            # Casos antiguos sin owner_id del mismo colegio (ver get_cases_for_user)
+            query = (self.db.collection(self.collection_name)
+                     .where(filter=FieldFilter("colegio_id", "==", colegio_id))
+                     .select(CASE_LIST_SOURCE_FIELDS))
+            for doc in query.stream():
+                data = doc.to_dict() or {}
+                if not data.get("owner_id"):
+                    items.append(self._case_list_item(doc.id, data))
+
+        return self._page_case_items(items, limit, cursor, status, case_type, date_from, date_to, sort_by, descending)
+
+    @staticmethod
+    def _case_list_cursor(item: dict, sort_by: str) -> str:
+        return encode_cursor(item.get(sort_by), item["id"])
+
+    @staticmethod
+    def _page_case_items(items: List[dict], limit: int, cursor: Optional[str], status: Optional[str],
+                         case_type: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime],
+                         sort_by: str, descending: bool) -> dict:
+        """Filtro, orden y paginación en memoria con la misma semántica que la query indexada."""
+        def naive(value):
+            return value.replace(tzinfo=None) if isinstance(value, datetime) else None
+
+        date_from, date_to = naive(date_from), naive(date_to)
+        selected = []
+        for item in items:
+            value = naive(item.get(sort_by))
+            if status and item["status"] != status:
+                continue
+            if case_type and item["case_type"] != case_type:
+                continue
+            if (date_from and (value is None or value < date_from)) or (date_to and (value is None or value > date_to)):
+                continue
+            selected.append(item)
+
+        def sort_key(item):
+            return naive(item.get(sort_by)) or datetime.min, item["id"]
+
+        selected.sort(key=sort_key, reverse=descending)
+        if cursor:
+            # Posición (valor, ID) del cursor, exista o no todavía ese caso
+            cursor_value, cursor_id = decode_cursor(cursor)
+            cursor_key = sort_key({sort_by: cursor_value, "id": cursor_id})
+            if descending:
+                selected = [item for item in selected if sort_key(item) < cursor_key]
+            else:
+                selected = [item for item in selected if sort_key(item) > cursor_key]
+        page = selected[:limit]
+        return {"items": page, "next_cursor": CaseService._case_list_cursor(page[-1], sort_by) if len(selected) > limit else None}
+
     def get_case_by_id(self, case_id: str) -> Optional[Case]:
         doc_ref = self.db.collection(self.collection_name).document(case_id)
         doc = doc_ref.get()
@@ -1511,6 +1781,20 @@ Genera el análisis estructurado:"""
             return Case(**data)
         return None
 
+    def get_cases_by_ids(self, case_ids: List[str]) -> Dict[str, Case]:
+        """Obtiene varios casos por ID con get_all (omite inexistentes e inválidos)."""
+        return self._parse_cases(get_documents(self.db, self.collection_name, case_ids))
+
+    @staticmethod
+    def _parse_cases(case_docs: Dict[str, dict]) -> Dict[str, Case]:
+        cases = {}
+        for case_id, case_dict in case_docs.items():
+            try:
+                cases[case_id] = Case(**case_dict)
+            except Exception as e:
+                logger.warning(f" Error parseando caso {case_id}: {e}")
+        return cases
+
     def get_case_by_session_id(self, session_id: str) -> Optional[Case]:
         """
         Obtiene el caso asociado a una sesión de chat.
@@ -1586,6 +1870,7 @@ Genera el análisis estructurado:"""
             doc_ref = self.db.collection(self.collection_name).document(case_id)
             doc_ref.update(filtered_data)
             logger.info(f" Caso {case_id} actualizado por usuario {user_id}: {filtered_data}")
+            self._sync_case_access(case, filtered_data)
 
             # Retornar el caso actualizado
             return self.get_case_by_id(case_id)
@@ -1627,9 +1912,12 @@ Genera el análisis estructurado:"""
                 filter=FieldFilter("case_id", "==", case_id)
             )
             permissions = permissions_ref.stream()
+            access_user_ids = [case.owner_id]
             for perm in permissions:
+                access_user_ids.append((perm.to_dict() or {}).get("user_id"))
                 perm.reference.delete()
                 logger.info(f"🗑️ Deleted permission {perm.id} from case {case_id}")
+            case_access_service.remove_case(case_id, access_user_ids)
 
             # Eliminar protocolos asociados
             protocols_ref = self.db.collection(self.protocol_collection_name).where(
@@ -1654,6 +1942,14 @@ Genera el análisis estructurado:"""
             logger.error(f"Error deleting case {case_id}: {e}")
             raise ValueError(f"Error eliminando caso: {str(e)}")
 
+    def _sync_case_access(self, case: Case, updated_fields: dict):
+        """Propaga título/estado al índice case_access del owner y de los usuarios compartidos."""
+        if not any(field in updated_fields for field in CASE_ACCESS_FIELDS):
+            return
+        from app.services.case_permission_service import case_permission_service
+        user_ids = [case.owner_id] + case_permission_service.get_shared_users(case.id)
+        case_access_service.update_case_fields(case.id, user_ids, updated_fields)
+
     def check_user_can_edit(self, case_id: str, user_id: str) -> bool:
         """
         Verifica si un usuario puede editar un caso
@@ -1714,6 +2010,7 @@ Genera el análisis estructurado:"""
             doc_ref = self.db.collection(self.collection_name).document(case_id)
             doc_ref.update(filtered_data)
             logger.info(f"💾 [SYSTEM UPDATE] Case {case_id} updated: {list(filtered_data.keys())}")
+            self._sync_case_access(case, filtered_data)
 
             # Retornar el caso actualizado
             return self.get_case_by_id(case_id)
@@ -13,6 +13,8 @@ Casos de uso:
 import logging
 from typing import Dict, List
 from app.core.config import get_settings
+from app.services.chat import keyword_matcher as keywords
+from app.services.chat.keyword_matcher import match_message
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -108,7 +110,7 @@ class AmbiguityHandler:
             Lista de opciones para el usuario
         """
         options = []
-        message_lower = message.lower()
+        matches = match_message(message)
         
         # Opción 1: Si hay archivos, ofrecer análisis
         if has_files:
@@ -119,18 +121,15 @@ class AmbiguityHandler:
             options.append("Consultar información sobre el caso activo")
         
         # Opción 3: Si menciona protocolo/normativa, ofrecer QA
-        protocol_keywords = ["protocolo", "rice", "normativa", "reglamento", "ley", "procedimiento"]
-        if any(kw in message_lower for kw in protocol_keywords):
+        if keywords.AMBIGUITY_PROTOCOL in matches:
             options.append("Obtener información general sobre protocolos o normativas")
         
         # Opción 4: Si menciona email/correo, ofrecer redacción
-        email_keywords = ["correo", "email", "enviar", "redactar", "escribir", "escribe", "notificación", "notificar"]
-        if any(kw in message_lower for kw in email_keywords):
+        if keywords.AMBIGUITY_EMAIL in matches:
             options.append("Redactar un correo electrónico")
         
         # Opción 5: Si menciona calendario/agenda, ofrecer evento
-        calendar_keywords = ["calendario", "agenda", "cita", "reunión", "evento"]
-        if any(kw in message_lower for kw in calendar_keywords):
+        if keywords.AMBIGUITY_CALENDAR in matches:
             options.append("Agendar un evento en el calendario")
         
         # Si no hay opciones específicas, ofrecer opciones genéricas
@@ -7,9 +7,9 @@ Usa conversación guiada para recopilar información necesaria.
 
 import logging
 from typing import List
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 from app.services.storage_service import storage_service
 
 logger = logging.getLogger(__name__)
@@ -39,11 +39,9 @@ class CaseCreationService:
             model_name = settings.VERTEX_MODEL_FLASH or "gemini-2.5-flash-lite"
             logger.info(f"🤖 [CASE_CREATION] Initializing Flash LLM: {model_name}")
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.4,  # Moderada - empatía + precisión
-                project=settings.PROJECT_ID,
-                location=self.model_location
+                temperature=0.4  # Moderada - empatía + precisión
             )
         return self._llm
     
@@ -11,11 +11,12 @@ Casos de uso:
 - "¿Cuál es el estado del caso?"
 """
 
+import asyncio
 import logging
 from typing import Optional, Dict
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -43,11 +44,9 @@ class CaseQueryService:
             model_name = settings.VERTEX_MODEL_FLASH or "gemini-2.5-flash-lite"
             logger.info(f"🤖 [CASE_QUERY] Initializing Flash LLM: {model_name}")
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.3,  # Baja - respuestas factuales consistentes
-                project=settings.PROJECT_ID,
-                location=self.model_location
+                temperature=0.3  # Baja - respuestas factuales consistentes
             )
         return self._llm
     
@@ -55,7 +54,8 @@ class CaseQueryService:
         self,
         message: str,
         case_id: str,
-        school_name: str
+        school_name: str,
+        case_data: Optional[Dict] = None
     ) -> str:
         """
         Responde una pregunta sobre el caso activo.
@@ -64,6 +64,7 @@ class CaseQueryService:
             message: Pregunta del usuario sobre el caso
             case_id: ID del caso activo
             school_name: Nombre del colegio
+            case_data: Datos del caso ya cargados (prefetch); si no vienen se leen de Firestore
             
         Returns:
             Respuesta directa basada en datos del caso
@@ -72,7 +73,8 @@ class CaseQueryService:
         
         try:
             # 1. Cargar datos del caso desde Firestore
-            case_data = await self._load_case_data(case_id)
+            if case_data is None:
+                case_data = await self.load_case_data(case_id)
             
             if not case_data:
                 return ("No pude encontrar información sobre este caso. "
@@ -99,7 +101,12 @@ class CaseQueryService:
             return ("Lo siento, tuve un problema al consultar la información del caso. "
                    "¿Podrías ser más específico sobre qué información necesitas?")
     
-    async def _load_case_data(self, case_id: str) -> Optional[Dict]:
+    async def load_case_data(self, case_id: str) -> Optional[Dict]:
+        """Carga datos del caso fuera del event loop (ver _load_case_data_sync)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load_case_data_sync, case_id)
+
+    def _load_case_data_sync(self, case_id: str) -> Optional[Dict]:
         """
         Carga datos del caso desde Firestore.
         
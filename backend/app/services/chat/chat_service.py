@@ -2,13 +2,13 @@ from typing import List, Optional, AsyncGenerator
 import logging
 import time
 import asyncio
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.prebuilt import create_react_agent
 from google.cloud import firestore
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 from app.services.tools.google_tools import google_tools
 from app.services.chat.history_service import history_service
 from app.services.chat.search_service import search_service
@@ -24,8 +24,10 @@ from app.services.protocols.protocol_execution_service import protocol_execution
 from app.services.protocols.protocol_agent import protocol_agent
 from app.services.case_service import case_service
 from app.services.case_service import case_service
-from app.services.storage_service import storage_service
-from app.services.token_service import token_service, LimitExceededException
+from app.services.chat.request_context import request_context_builder
+from app.services.chat.speculative_prefetch import SpeculativePrefetch
+from app.services.chat import keyword_matcher as keywords
+from app.services.chat.keyword_matcher import match_message
 
 
 logger = logging.getLogger(__name__)
@@ -122,16 +124,12 @@ class GeneralChatAgent:
             model_name = settings.VERTEX_MODEL_REASON or settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL
 
             logger.info(f"🤖 [CHAT_AGENT] Initializing with model: {model_name}")
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
                 temperature=0.5,
-                project=self.project_id,
-                location=self.model_location,
                 streaming=True,
                 max_retries=2,
-                model_kwargs={
-                    "request_timeout": 300  # Timeout para procesar múltiples archivos
-                }
+                request_timeout=300  # Timeout para procesar múltiples archivos
             )
         return self._llm
 
@@ -146,6 +144,13 @@ class GeneralChatAgent:
 
 
     async def _load_case_context(self, case_id: str) -> Optional[dict]:
+        """Carga el contexto del caso fuera del event loop (ver _load_case_context_sync)."""
+        if not case_id:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load_case_context_sync, case_id)
+
+    def _load_case_context_sync(self, case_id: str) -> Optional[dict]:
         """
         Carga datos del caso desde Firestore y los formatea para el contexto del agente
         
@@ -248,63 +253,62 @@ INSTRUCCIONES IMPORTANTES:
             return None
 
 
+    def _preload_case_files_sync(self, case_id: str) -> List[str]:
+        """URIs gs:// de los documentos analizables (PDF/TXT) del caso, máximo 10."""
+        try:
+            case_docs = case_service.get_case_documents(case_id)
+            if not case_docs:
+                logger.info(f"📭 [PRE-LOAD] No documents registered for case")
+                return []
+
+            case_files = []
+            for doc in case_docs:
+                gcs_uri = doc.get("gcs_uri", "")
+                content_type = doc.get("content_type", "")
+                name = doc.get("name", "").lower()
+
+                # Solo PDFs y TXTs son analizables
+                if gcs_uri.startswith("gs://"):
+                    is_analyzable = (
+                        content_type == "application/pdf" or
+                        content_type.startswith("text/") or
+                        name.endswith(".pdf") or
+                        name.endswith(".txt")
+                    )
+                    if is_analyzable:
+                        case_files.append(gcs_uri)
+
+            MAX_AUTO_LOAD_DOCS = 10
+            if len(case_files) > MAX_AUTO_LOAD_DOCS:
+                case_files = case_files[:MAX_AUTO_LOAD_DOCS]
+
+            if case_files:
+                logger.info(f"✅ [PRE-LOAD] Loaded {len(case_files)} case documents: {[f.split('/')[-1] for f in case_files]}")
+            else:
+                logger.info(f"📭 [PRE-LOAD] No analyzable PDF/TXT files found")
+            return case_files
+        except Exception as e:
+            logger.error(f"❌ [PRE-LOAD] Error loading case files: {e}")
+            return []
+
     def _detect_protocol_intent(self, message: str, case_id: str = None) -> bool:
         """Detecta si el mensaje requiere explícitamente activar un protocolo o ver pasos."""
-        import unicodedata
-        def normalize(text):
-            return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn').lower()
+        # Patrones en keyword_matcher (PROTOCOL_*), comparados sin tildes
+        matches = match_message(message)
 
-        message_norm = normalize(message)
-        
-        # EXCLUSION PATTERNS: Informational queries (NOT activation)
-        exclusion_patterns = [
-            # Questions about what/which protocols
-            "que es un protocolo", "que es el protocolo", "que son los protocolos",
-            "cual es el protocolo", "cuales son los protocolos",
-            
-            # Questions about how protocols work
-            "que significa protocolo", "definicion de protocolo",
-            "como funciona el protocolo", "como funciona un protocolo",
-            "para que sirve el protocolo", "para que sirve un protocolo",
-            
-            # Requests for information/explanation
-            "explicame el protocolo", "explicame un protocolo",
-            "dame informacion sobre", "cuentame sobre",
-            "describe el protocolo", "describe un protocolo",
-            
-            # Questions about protocol creation/generation (informational)
-            "como se genera un protocolo", "como generar un protocolo",
-            "como se crea un protocolo", "como crear un protocolo",
-            "que necesito para generar", "que necesito para crear",
-            
-            # Questions asking which protocol to use
-            "que protocolo", "cual protocolo", "cuales protocolos"
-        ]
-        
-        # Check exclusions first (fast rejection)
-        if any(pattern in message_norm for pattern in exclusion_patterns):
+        # EXCLUSION PATTERNS: Informational queries (NOT activation) - fast rejection
+        if keywords.PROTOCOL_EXCLUSION in matches:
             return False
 
         # ACTIVATION PATTERNS: Explicit action keywords
-        activation_patterns = [
-            "activar protocolo", "activa protocolo", "activa el protocolo",
-            "iniciar protocolo", "inicia protocolo", "inicia el protocolo",
-            "generar protocolo", "genera protocolo", "genera el protocolo",
-            "crear protocolo", "crea protocolo", "crea el protocolo",
-            "necesito los pasos del protocolo",
-            "siguientes pasos del protocolo",
-            "procede con el protocolo", "continua con el protocolo"
-        ]
-        
-        # Check activation patterns
-        if any(pattern in message_norm for pattern in activation_patterns):
+        if keywords.PROTOCOL_ACTIVATION in matches:
             return True
         
         # Special case: If there's an active case and user asks about next steps
         # (but be careful not to trigger on "cuáles son los pasos" which is informational)
-        if case_id and ("siguiente" in message_norm or "continuar" in message_norm):
+        if case_id and keywords.PROTOCOL_NEXT_STEP in matches:
             # Only if it's not an informational question
-            if not any(q in message_norm for q in ["que son", "cuales son", "cual es"]):
+            if keywords.INFORMATIONAL_QUESTION not in matches:
                 return True
         
         return False
@@ -313,9 +317,7 @@ INSTRUCCIONES IMPORTANTES:
 
     def _detect_analysis_intent(self, message: str) -> bool:
         """Detecta si el usuario pide analizar un caso, revisar situación, etc."""
-        keywords = ["analiza", "analizar", "caso", "revisar", "evaluar", "situación", "resumen", "conflicto"]
-        message_lower = message.lower()
-        return any(k in message_lower for k in keywords)
+        return keywords.ANALYSIS_INTENT in match_message(message)
 
     def _prepare_analysis_messages(self, message: str, history: List, school_name: str, files: List[str] = None, session_id: str = None, bucket_name: str = None) -> List[BaseMessage]:
         """Prepara los mensajes para el análisis de caso."""
@@ -478,133 +480,95 @@ INSTRUCCIONES IMPORTANTES:
         import json
         import asyncio
 
-        # 0. Determinar bucket de almacenamiento
-        # 0. Determinar bucket de almacenamiento y Data Store
-        current_bucket = self.bucket_name
-        data_store_id = None
-        search_app_id = None  # Initialize to avoid UnboundLocalError
-        
-        # FALLBACK: Si user_id no viene en la request, intentar recuperarlo de los metadatos de la sesión
-        if not user_id and session_id:
-            try:
-                metadata = await history_service.get_session_metadata(session_id)
-                if metadata and metadata.get("user_id"):
-                    user_id = metadata.get("user_id")
-                    logger.info(f"♻️ [STREAM] Recovered user_id {user_id} from session metadata")
-                else:
-                     logger.warning(f"⚠️ [STREAM] No user_id provided AND no metadata found for session {session_id}. Potentially falling back to Global Data Store.")
-            except Exception as e:
-                logger.warning(f"⚠️ [STREAM] Failed to recover user_id from metadata: {e}")
+        # 0. Resolver contexto de la request (usuario, colegio, bucket, Data Store, límites e historial)
+        # Todas las lecturas se lanzan en paralelo fuera del event loop y se reutilizan en cada ruta.
+        request_context = await request_context_builder.build(session_id, user_id)
+        user_id = request_context.user_id
+        current_bucket = request_context.bucket_name
+        data_store_id = request_context.data_store_id
+        search_app_id = request_context.search_app_id
 
         # --- TOKEN LIMIT CHECK ---
-        if user_id:
-            try:
-                # Check limits before doing anything expensive
-                token_service.check_limits(user_id)
-            except LimitExceededException as e:
-                logger.warning(f"🚫 [LIMIT] Token limit exceeded for user {user_id}: {e.message}")
-                yield json.dumps({"type": "content", "content": f"\n\n🚫 **{e.message}**\n\nPor favor contacta a tu administrador para aumentar tu cupo."}, ensure_ascii=False) + "\n"
-                return
-            except Exception as e:
-                logger.error(f"⚠️ [LIMIT] Error checking token limits (falling open): {e}")
+        if request_context.is_over_limit:
+            logger.warning(f"🚫 [LIMIT] Token limit exceeded for user {user_id}: {request_context.limit_error}")
+            yield json.dumps({"type": "content", "content": f"\n\n🚫 **{request_context.limit_error}**\n\nPor favor contacta a tu administrador para aumentar tu cupo."}, ensure_ascii=False) + "\n"
+            return
 
-        if user_id:
-            try:
-                from app.services.users.user_service import user_service
-                from app.services.school_service import school_service
-                
-                # Use simple service if possible to avoid circular dep issues, or standard one
-                # Note: imports are inside method to match existing pattern
-                
-                user = user_service.get_user_by_id(user_id)
-                if user and user.colegios:
-                     school_id = user.colegios[0]
-                     current_bucket = storage_service.get_school_bucket_name(school_id)
-                     
-                     # Data Store Resolution
-                     colegio = school_service.get_colegio_by_id(school_id)
-                     if colegio:
-                         data_store_id = colegio.data_store_id
-                         search_app_id = colegio.search_app_id
-                         
-            except Exception as e:
-                logger.warning(f"Error resolving school bucket/datastore for user {user_id}: {e}")
-        
         # Set Context
         from app.core.context import current_data_store_id, current_user_email
         current_data_store_id.set(data_store_id)
         
         # Set user email for email tools
-        if user_id:
-            try:
-                user = user_service.get_user_by_id(user_id)
-                if user and user.correo:
-                    current_user_email.set(user.correo)
-                    logger.info(f"✉️ [STREAM] User email set in context: {user.correo}")
-            except Exception as e:
-                logger.warning(f"⚠️ [STREAM] Could not set user email in context: {e}")
+        if request_context.user_email:
+            current_user_email.set(request_context.user_email)
+            logger.info(f"✉️ [STREAM] User email set in context: {request_context.user_email}")
         
         logger.info(f"   🪣 [STREAM] Bucket resolved: {current_bucket} | Data Store: {data_store_id}")
-        
-        logger.info(f"   🪣 [STREAM] Bucket resolved: {current_bucket}")
 
-        # Cargar historial (lo necesitamos para intent classification y para procesos)
-        history = await self._load_history(session_id, current_bucket)
+        # Historial (lo necesitamos para intent classification y para procesos)
+        history = list(request_context.history)
+
+        # Filtro de IDs para el contenido en streaming: se limpia chunk a chunk
+        # reteniendo solo la cola que aún podría formar un ID (ver StreamingSanitizer)
+        id_filter = response_sanitizer.stream(case_id=case_id, session_id=session_id)
         
         # EARLY CHECK REMOVED: We now support remote document analysis without attached files.
         # The intent router and downstream logic will handle this.
 
+        # Clasificación sin LLM (fast-paths, caché, clasificador local): si ya resuelve la
+        # intención, solo falta el LLM cuando el PRE-LOAD agrega archivos del caso
+        fast_intent = None if files else intent_router.classify_fast(
+            message, has_files=False, case_id=case_id, history=history
+        )
+
+        # SPECULATIVE PREFETCH: lecturas que probablemente necesitará la ruta, lanzadas
+        # antes de clasificar para que corran mientras el clasificador responde.
+        # Tras la clasificación se cancelan las que la ruta elegida no usa.
+        from app.services.chat.case_query_service import case_query_service
+        from app.services.chat.reglamento_search_service import reglamento_search_service
+        prefetch = SpeculativePrefetch(enabled=settings.CHAT_SPECULATIVE_PREFETCH)
+        if case_id:
+            prefetch.start("case_context", self._load_case_context(case_id))  # Todas las rutas con caso
+            prefetch.start("case_data", case_query_service.load_case_data(case_id))  # CASE_QUERY
+        if not files:
+            # La búsqueda corre en el executor (no se puede cancelar) y se factura por
+            # consulta: solo se adelanta si la clasificación sin LLM ya predice SIMPLE_QA
+            if search_app_id and fast_intent and fast_intent["intent"] == intent_router.SIMPLE_QA:
+                prefetch.start("general_search", reglamento_search_service.search_general_info(
+                    query=message,
+                    company_search_app_id=search_app_id
+                ))
+            prefetch.start("session_context", history_service.get_session_context(session_id))  # DOCUMENT_ANALYSIS sin archivos
+
         # PRE-LOAD: Auto-load case files BEFORE intent classification if no files attached and case exists
         # This allows the intent router to correctly classify as DOCUMENT_ANALYSIS with files
         if case_id and not files:
-            analysis_keywords = ["analiz", "revis", "examin", "verific", "lee", "estudia", "resum", "que dice", "transcripci", "entrevista", "contenido"]
-            if any(keyword in message.lower() for keyword in analysis_keywords):
+            if keywords.PRELOAD_ANALYSIS in match_message(message):
                 logger.info(f"📂 [PRE-LOAD] Auto-loading case files before intent classification")
-                try:
-                    from app.services.case_service import case_service
-                    case_docs = case_service.get_case_documents(case_id)
-                    
-                    if case_docs:
-                        case_files = []
-                        for doc in case_docs:
-                            gcs_uri = doc.get("gcs_uri", "")
-                            content_type = doc.get("content_type", "")
-                            name = doc.get("name", "").lower()
-                            
-                            # Solo PDFs y TXTs son analizables
-                            if gcs_uri.startswith("gs://"):
-                                is_analyzable = (
-                                    content_type == "application/pdf" or
-                                    content_type.startswith("text/") or
-                                    name.endswith(".pdf") or
-                                    name.endswith(".txt")
-                                )
-                                if is_analyzable:
-                                    case_files.append(gcs_uri)
-                        
-                        MAX_AUTO_LOAD_DOCS = 10
-                        if len(case_files) > MAX_AUTO_LOAD_DOCS:
-                            case_files = case_files[:MAX_AUTO_LOAD_DOCS]
-                        
-                        if case_files:
-                            files = case_files
-                            logger.info(f"✅ [PRE-LOAD] Loaded {len(case_files)} case documents: {[f.split('/')[-1] for f in case_files]}")
-                        else:
-                            logger.info(f"📭 [PRE-LOAD] No analyzable PDF/TXT files found")
-                    else:
-                        logger.info(f"📭 [PRE-LOAD] No documents registered for case")
-                except Exception as e:
-                    logger.error(f"❌ [PRE-LOAD] Error loading case files: {e}")
+                case_files = await asyncio.get_running_loop().run_in_executor(None, self._preload_case_files_sync, case_id)
+                if case_files:
+                    files = case_files
         
         # 1. Classify intent for optimal routing
-        intent_result = await intent_router.classify_intent(
-            message=message,
-            has_files=bool(files and len(files) > 0),
-            case_id=case_id,
-            history=history,
-            user_id=user_id  # Pass user_id for token tracking
-        )
+        if files:
+            intent_result = await intent_router.classify_intent(
+                message=message,
+                has_files=True,
+                case_id=case_id,
+                history=history,
+                user_id=user_id  # Pass user_id for token tracking
+            )
+        else:
+            intent_result = fast_intent or await intent_router.classify_with_llm(
+                message, has_files=False, case_id=case_id, user_id=user_id
+            )
         logger.info(f"🎯 [STREAM ROUTER] Intent: {intent_result['intent']} (confidence: {intent_result['confidence']})")
+        prefetch.keep([
+            "case_context" if case_id else None,
+            "case_data" if intent_result['intent'] == intent_router.CASE_QUERY else None,
+            "general_search" if intent_result['intent'] == intent_router.SIMPLE_QA else None,
+            "session_context" if intent_result['intent'] == intent_router.DOCUMENT_ANALYSIS and not files else None
+        ])
         
         # AMBIGUITY CHECK - Handle low-confidence classifications
         from app.services.chat.ambiguity_handler import ambiguity_handler
@@ -620,6 +584,8 @@ INSTRUCCIONES IMPORTANTES:
                 case_id=case_id
             )
             
+            prefetch.cancel_all()
+
             # Stream clarification
             yield json.dumps({"type": "content", "content": clarification}, ensure_ascii=False) + "\n"
             
@@ -640,7 +606,7 @@ INSTRUCCIONES IMPORTANTES:
             
             if not has_context:
                 logger.info(f"🆕 [STREAM CONTEXT] Injecting case context for session {session_id}")
-                case_context = await self._load_case_context(case_id)
+                case_context = await prefetch.get("case_context", lambda: self._load_case_context(case_id))
                 
                 if case_context:
                     # Inyectar contexto del caso como mensaje del sistema al inicio
@@ -734,13 +700,20 @@ INSTRUCCIONES:
             
             async for chunk in self.llm.astream(messages):
                 if chunk.content:
-                    full_response += chunk.content
-                    yield json.dumps({"type": "content", "content": chunk.content}, ensure_ascii=False) + "\n"
+                    content = id_filter.feed(chunk.content)
+                    if content:
+                        full_response += content
+                        yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
                 
                 # Check for usage metadata in chunk
                 if chunk.usage_metadata:
                     accumulated_usage = chunk.usage_metadata
 
+            content = id_filter.flush()
+            if content:
+                full_response += content
+                yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
+
             # Save usage
             if user_id and accumulated_usage:
                 from app.services.users.user_service import user_service
@@ -766,7 +739,7 @@ INSTRUCCIONES:
             # Get case context if needed
             case_context = None
             if case_id:
-                case_context = await self._load_case_context(case_id)
+                case_context = await prefetch.get("case_context", lambda: self._load_case_context(case_id))
             
             # Convert files to full GCS URIs if needed
             full_file_uris = []
@@ -816,8 +789,15 @@ INSTRUCCIONES:
                     case_context=case_context,
                     user_id=user_id
                 ):
-                    full_response_text += chunk
-                    yield json.dumps({"type": "content", "content": chunk}, ensure_ascii=False) + "\n"
+                    content = id_filter.feed(chunk)
+                    if content:
+                        full_response_text += content
+                        yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
+                
+                content = id_filter.flush()
+                if content:
+                    full_response_text += content
+                    yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
                 
                 analysis_response = full_response_text
                 
@@ -894,6 +874,9 @@ INSTRUCCIONES:
                 school_name=school_name
             )
             
+            # Sin IDs internos, igual que el contenido transmitido por chunks
+            ai_response = id_filter.feed(ai_response) + id_filter.flush()
+
             # Stream the response content
             yield json.dumps({"type": "content", "content": ai_response}, ensure_ascii=False) + "\n"
             
@@ -913,17 +896,11 @@ INSTRUCCIONES:
             
             # Get user context if available
             user_context = None
-            if user_id:
-                try:
-                    from app.services.users.user_service_simple import user_service_simple
-                    user = user_service_simple.get_user_by_id(user_id)
-                    if user:
-                        user_context = {
-                            "nombre": user.nombre,
-                            "rol": user.rol
-                        }
-                except Exception as e:
-                    logger.warning(f"⚠️ [SIMPLE_QA] Error getting user context: {e}")
+            if request_context.user:
+                user_context = {
+                    "nombre": request_context.user.nombre,
+                    "rol": request_context.user.rol
+                }
             
             # Stream thinking message
             yield json.dumps({"type": "thinking", "content": "Pensando..."}, ensure_ascii=False) + "\n"
@@ -935,9 +912,13 @@ INSTRUCCIONES:
                 school_name=school_name,
                 history=history,
                 user_context=user_context,
-                search_app_id=search_app_id  # Enable RAG lite search
+                search_app_id=search_app_id,  # Enable RAG lite search
+                search_results=await prefetch.get("general_search")
             )
             
+            # Sin IDs internos, igual que el contenido transmitido por chunks
+            ai_response = id_filter.feed(ai_response) + id_filter.flush()
+
             # Stream the response content
             yield json.dumps({"type": "content", "content": ai_response}, ensure_ascii=False) + "\n"
             
@@ -954,8 +935,6 @@ INSTRUCCIONES:
         if intent_result['intent'] == intent_router.CASE_QUERY and case_id:
             logger.info(f"🚀 [FAST PATH STREAM] CASE_QUERY - Using Case Query Service")
             
-            from app.services.chat.case_query_service import case_query_service
-            
             # Stream thinking message
             yield json.dumps({"type": "thinking", "content": "Consultando información del caso..."}, ensure_ascii=False) + "\n"
             await asyncio.sleep(0.1)
@@ -964,9 +943,13 @@ INSTRUCCIONES:
             ai_response = await case_query_service.answer_case_question(
                 message=message,
                 case_id=case_id,
-                school_name=school_name
+                school_name=school_name,
+                case_data=await prefetch.get("case_data")
             )
             
+            # Sin IDs internos, igual que el contenido transmitido por chunks
+            ai_response = id_filter.feed(ai_response) + id_filter.flush()
+
             # Stream the response content
             yield json.dumps({"type": "content", "content": ai_response}, ensure_ascii=False) + "\n"
             
@@ -984,36 +967,20 @@ INSTRUCCIONES:
             logger.info(f"🚀 [FAST PATH STREAM] CASE_CREATION - Using Case Creation Service")
             
             from app.services.chat.case_creation_service import case_creation_service
-            from app.services.users.user_service_simple import user_service_simple
             
             # Get user context for personalization
-            user_context = None
+            user_context = request_context.user_context
             search_app_id = None  # For RAG search
             
-            if user_id:
-                try:
-                    user_data = user_service_simple.get_user_by_id(user_id)
-                    if user_data:
-                        user_context = {
-                            "nombre": user_data.nombre,
-                            "rol": user_data.rol,
-                            "correo": user_data.correo
-                        }
-                        
-                        # Get search_app_id from colegio
-                        if user_data.colegios:
-                            from app.services.school_service import school_service
-                            school_id = user_data.colegios[0]
-                            colegio = school_service.get_colegio_by_id(school_id)
-                            if colegio and colegio.search_app_id:
-                                search_app_id = colegio.search_app_id
-                                logger.info(f"🏫 [CASE_CREATION] Using search_app_id: {search_app_id}")
-                            else:
-                                # Fallback to demo app
-                                search_app_id = "demostracion_1767713503741"
-                                logger.warning(f"⚠️ [CASE_CREATION] No search_app_id in colegio, using demo: {search_app_id}")
-                except Exception as e:
-                    logger.warning(f"⚠️ [CASE_CREATION] Could not load user context: {e}")
+            # Get search_app_id from colegio
+            if request_context.user and request_context.user.colegios:
+                if request_context.search_app_id:
+                    search_app_id = request_context.search_app_id
+                    logger.info(f"🏫 [CASE_CREATION] Using search_app_id: {search_app_id}")
+                else:
+                    # Fallback to demo app
+                    search_app_id = "demostracion_1767713503741"
+                    logger.warning(f"⚠️ [CASE_CREATION] No search_app_id in colegio, using demo: {search_app_id}")
             
             # Stream thinking message
             yield json.dumps({"type": "thinking", "content": "Analizando descripción del caso..."}, ensure_ascii=False) + "\n"
@@ -1029,6 +996,9 @@ INSTRUCCIONES:
                 case_id=case_id  # Pass case_id to update ai_summary
             )
             
+            # Sin IDs internos, igual que el contenido transmitido por chunks
+            ai_response = id_filter.feed(ai_response) + id_filter.flush()
+
             # Stream the response content
             yield json.dumps({"type": "content", "content": ai_response}, ensure_ascii=False) + "\n"
             
@@ -1051,7 +1021,7 @@ INSTRUCCIONES:
                 # Get session context for better search
                 session_context = None
                 try:
-                    session_context_summary = await history_service.get_session_context(session_id)
+                    session_context_summary = await prefetch.get("session_context", lambda: history_service.get_session_context(session_id))
                     if session_context_summary:
                         session_context = {"summary": session_context_summary}
                         logger.info(f"📝 [REMOTE SEARCH] Using session context for document search")
@@ -1068,8 +1038,15 @@ INSTRUCCIONES:
                     case_context=session_context,
                     user_id=user_id
                 ):
-                    full_response_text += chunk
-                    yield json.dumps({"type": "content", "content": chunk}, ensure_ascii=False) + "\n"
+                    content = id_filter.feed(chunk)
+                    if content:
+                        full_response_text += content
+                        yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
+                
+                content = id_filter.flush()
+                if content:
+                    full_response_text += content
+                    yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
                 
                 # Generate suggestions
                 suggestions = await self._generate_suggestions(message, history, school_name, user_id=user_id)
@@ -1125,7 +1102,7 @@ INSTRUCCIONES:
                 logger.info(f"   🌊 [STREAM] Streaming análisis...")
                 
                 async for chunk in stream_generator:
-                    content = chunk.content
+                    content = id_filter.feed(chunk.content)
                     if content:
                         full_analysis_response += content
                         yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
@@ -1157,7 +1134,7 @@ INSTRUCCIONES:
                 accumulated_usage = None
                 
                 async for chunk in stream_generator:
-                    content = chunk.content
+                    content = id_filter.feed(chunk.content)
                     if content:
                         full_analysis_response += content
                         yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
@@ -1176,8 +1153,16 @@ INSTRUCCIONES:
 
         except Exception as e:
             logger.info(f"Error streaming analisis: {e}")
+            content = id_filter.flush()
+            if content:
+                yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
             yield json.dumps({"type": "content", "content": "Lo siento, ocurrió un error procesando tu mensaje."}, ensure_ascii=False) + "\n"
 
+        content = id_filter.flush()
+        if content:
+            full_analysis_response += content
+            yield json.dumps({"type": "content", "content": content}, ensure_ascii=False) + "\n"
+
         # Esperar y adjuntar Protocolo (si aplica)
         full_response = full_analysis_response
         if protocol_task:
@@ -1189,6 +1174,7 @@ INSTRUCCIONES:
             yield json.dumps({"type": "thinking", "content": "Generando reporte oficial..."}, ensure_ascii=False) + "\n"
 
             protocol_content = await protocol_task
+            protocol_content = id_filter.feed(protocol_content) + id_filter.flush()
             
             # Streaming del protocolo (simulado o bloque completo)
             # Como ya lo tenemos todo, lo enviamos. Podríamos partirlo si es muy largo para efecto visual.
@@ -1241,11 +1227,9 @@ INSTRUCCIONES:
             ]
             
             # Use flash-lite model for faster suggestions (not pro)
-            flash_llm = ChatVertexAI(
+            flash_llm = llm_registry.get(
                 model_name=settings.VERTEX_MODEL_FLASH,  # Use flash-lite for speed
                 temperature=0.7,
-                project=self.project_id,
-                location=self.model_location,
                 max_retries=1
             )
             
@@ -4,6 +4,7 @@ from typing import List, Optional, Dict
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part, SafetySetting, HarmCategory, HarmBlockThreshold
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -211,7 +212,6 @@ FORMATO DE RESPUESTA:
     ):
         """Streaming de análisis directo de PDFs"""
         import time
-        from langchain_google_vertexai import ChatVertexAI
         from langchain_core.messages import HumanMessage, SystemMessage
         from app.services.users.user_service import user_service
         from app.services.storage_service import storage_service
@@ -301,19 +301,39 @@ FORMATO DE RESPUESTA:
                        "file_uri": file_uri,
                        "mime_type": "application/pdf"
                    })
-            
+
+            # Pre-flight: estimar tokens localmente, recortar si no caben y verificar cuota
+            from app.services.token_estimator import token_estimator
+            from app.services.token_service import token_service, LimitExceededException
+
+            prompt_tokens = token_estimator.estimate_text(system_prompt)
+            # fit_parts lee la metadata de los blobs en GCS: fuera del event loop
+            content_parts, estimated_tokens, dropped = await asyncio.to_thread(
+                token_estimator.fit_parts, content_parts, token_estimator.max_request_tokens - prompt_tokens
+            )
+            estimated_tokens += prompt_tokens
+            if dropped:
+                logger.warning(f"⚠️ [DOC_ANALYZER_STREAM] Dropped {dropped} document parts to fit the context window")
+                yield f"_(Se omitieron {dropped} archivo(s) o partes por exceder el tamaño máximo analizable en una consulta.)_\n\n"
+
+            try:
+                token_service.check_limits(user_id, input_tokens_cost=estimated_tokens)
+            except LimitExceededException as e:
+                logger.warning(f"🚫 [DOC_ANALYZER_STREAM] Pre-flight limit check failed (~{estimated_tokens} tokens): {e.message}")
+                yield f"⚠️ {e.message} Este análisis requiere aproximadamente {estimated_tokens:,} tokens. Intenta con menos archivos o archivos más pequeños."
+                return
+            logger.info(f"🧮 [DOC_ANALYZER_STREAM] Estimated input: ~{estimated_tokens} tokens")
+
             messages = [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=content_parts)
             ]
             
-            # Use ChatVertexAI for easy streaming and token tracking
-            flash_llm = ChatVertexAI(
-                model=settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp",
+            # Shared ChatVertexAI client (registry) for easy streaming and token tracking
+            flash_llm = llm_registry.get(
+                model_name=settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp",
                 temperature=0.3,
                 max_output_tokens=8192,
-                project=settings.PROJECT_ID,
-                location=settings.VERTEX_LOCATION or "us-central1",
                 max_retries=5,
                 streaming=True
             )
@@ -478,14 +498,11 @@ FORMATO:
                 system_prompt += "\n\n⚠️ No se encontraron documentos. Proporciona orientación general."
             
             # 4. Stream LLM response
-            from langchain_google_vertexai import ChatVertexAI
             from langchain_core.messages import HumanMessage, SystemMessage
             
-            flash_llm = ChatVertexAI(
+            flash_llm = llm_registry.get(
                 model_name=settings.VERTEX_MODEL_FLASH or "gemini-2.5-flash-lite",
                 temperature=0.4,
-                project=settings.PROJECT_ID,
-                location=self.model_location,
                 streaming=True
             )
             
@@ -576,7 +593,6 @@ FORMATO:
         """
         try:
             from datetime import datetime
-            from langchain_google_vertexai import ChatVertexAI
             from langchain_core.messages import HumanMessage
             from pydantic import BaseModel, Field
             from typing import List
@@ -591,11 +607,9 @@ FORMATO:
                 has_potential_case: bool = Field(description="True si parece ser un caso de convivencia laboral")
             
             # Use Flash for fast extraction
-            flash_llm = ChatVertexAI(
+            flash_llm = llm_registry.get(
                 model_name=settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp",
-                temperature=0.3,
-                project=settings.PROJECT_ID,
-                location=self.model_location
+                temperature=0.3
             )
             
             extraction_prompt = f"""Analiza el siguiente texto y extrae información estructurada:
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+from google.cloud import firestore
+from langchain_core.messages import HumanMessage, AIMessage
+
+from app.services.chat.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BLOB_NAME = "history.json"
+
+
+class GcsSessionMigrator:
+    """
+    Migración offline de sesiones legacy (history.json en GCS) a Firestore.
+
+    Recorre los buckets con list_blobs y procesa los history.json con un pool de
+    workers acotado. Cada sesión se escribe con HistoryService._save_history_to_firestore
+    (mismo layout que las sesiones nuevas) y se omite si ya tiene mensajes en Firestore,
+    así que repetir la migración es seguro.
+
+    - Checkpoint (JSON): por bucket, el último blob tal que todos los anteriores ya se
+      procesaron. Al reanudar, list_blobs parte desde ahí (start_offset).
+    - Manifest (JSONL): una línea por sesión con su resultado (migrated, skipped, empty, error).
+
+    Cuando la migración termina se puede desactivar HISTORY_GCS_FALLBACK y la carga
+    de historial deja de consultar GCS.
+    """
+
+    def __init__(self, max_workers: int = 8, checkpoint_path: str = "gcs_migration_checkpoint.json",
+                 manifest_path: str = "gcs_migration_manifest.jsonl"):
+        self.history = history_service
+        self.db = history_service.db
+        self.max_workers = max_workers
+        self.checkpoint_path = checkpoint_path
+        self.manifest_path = manifest_path
+
+    # ---------- Checkpoint y manifest ----------
+
+    def _load_checkpoint(self) -> Dict[str, str]:
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, checkpoint: Dict[str, str]):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ---------- Buckets ----------
+
+    def school_bucket_names(self) -> List[str]:
+        """Buckets de colegios registrados (colegios.bucket_name)."""
+        names = []
+        for doc in self.db.collection("colegios").select(["bucket_name"]).stream():
+            bucket_name = (doc.to_dict() or {}).get("bucket_name")
+            if bucket_name and bucket_name not in names:
+                names.append(bucket_name)
+        return names
+
+    @staticmethod
+    def _session_id_from_blob(blob_name: str) -> Optional[str]:
+        """{id}/history.json o sesiones/{id}/history.json (buckets de colegio)."""
+        parts = blob_name.split("/")
+        if parts[-1] != HISTORY_BLOB_NAME:
+            return None
+        if len(parts) == 2:
+            return parts[0]
+        if len(parts) == 3 and parts[0] == "sesiones":
+            return parts[1]
+        return None
+
+    # ---------- Migración por sesión ----------
+
+    def _has_firestore_history(self, session_ref, session_data: dict) -> bool:
+        if session_data.get("next_order") is not None:
+            return True
+        return bool(list(session_ref.collection("messages").limit(1).stream()))
+
+    def migrate_blob(self, blob) -> dict:
+        session_id = self._session_id_from_blob(blob.name)
+        entry = {"session_id": session_id, "blob": f"gs://{blob.bucket.name}/{blob.name}"}
+        try:
+            session_ref = self.db.collection(self.history.collection_name).document(session_id)
+            session_data = self.history._get_session_data(session_ref)
+            if self._has_firestore_history(session_ref, session_data):
+                return {**entry, "status": "skipped"}
+
+            data = json.loads(blob.download_as_string())
+            if not isinstance(data, list):
+                return {**entry, "status": "error", "error": f"history is not a list ({type(data).__name__})"}
+
+            messages = []
+            for msg in data:
+                if not isinstance(msg, dict):
+                    continue
+                if msg.get("type") == "human":
+                    messages.append(HumanMessage(content=msg.get("content")))
+                elif msg.get("type") == "ai":
+                    messages.append(AIMessage(content=msg.get("content")))
+            if not messages:
+                return {**entry, "status": "empty"}
+
+            # Sin fallback a GCS: si Firestore falla, la sesión queda como error en el manifest
+            self.history._save_history_to_firestore(session_id, messages)
+
+            # Metadatos del listado que antes se calculaban leyendo el blob en cada request
+            metadata = {"id": session_id, "migrated_from": entry["blob"]}
+            if not session_data.get("updated_at"):
+                metadata["updated_at"] = blob.updated or firestore.SERVER_TIMESTAMP
+            if not session_data.get("title"):
+                preview = self.history._preview_from([{"type": "human", "content": m.content} for m in messages if isinstance(m, HumanMessage)])
+                if preview:
+                    metadata["title"] = preview[:40] + "..." if len(preview) > 40 else preview
+            session_ref.set(metadata, merge=True)
+
+            return {**entry, "status": "migrated", "messages": len(messages)}
+        except Exception as e:
+            logger.error(f"❌ [GCS_MIGRATION] Error migrating {entry['blob']}: {e}")
+            return {**entry, "status": "error", "error": str(e)}
+
+    # ---------- Recorrido ----------
+
+    def migrate_bucket(self, bucket_name: str, checkpoint: Dict[str, str], manifest, stats: Dict[str, int],
+                       limit: Optional[int] = None):
+        bucket = self.history.storage_client.bucket(bucket_name)
+        start_offset = checkpoint.get(bucket_name)
+        logger.info(f"📦 [GCS_MIGRATION] Bucket {bucket_name} (resuming after: {start_offset or '-'})")
+
+        # Blobs en orden de envío; el checkpoint avanza solo hasta el primero sin terminar
+        pending: List[str] = []
+        done = set()
+        in_flight = {}
+
+        def collect(finished):
+            for future in finished:
+                blob_name = in_flight.pop(future)
+                result = future.result()
+                manifest.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                stats[result["status"]] = stats.get(result["status"], 0) + 1
+                done.add(blob_name)
+            advanced = False
+            while pending and pending[0] in done:
+                checkpoint[bucket_name] = pending.pop(0)
+                done.discard(checkpoint[bucket_name])
+                advanced = True
+            if advanced:
+                manifest.flush()
+                self._save_checkpoint(checkpoint)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gcs-migration") as executor:
+            for blob in bucket.list_blobs(start_offset=start_offset):
+                if limit is not None and stats["submitted"] >= limit:
+                    break
+                if blob.name == start_offset or self._session_id_from_blob(blob.name) is None:
+                    continue
+                # Cola acotada: no se listan más blobs que los que el pool puede absorber
+                if len(in_flight) >= self.max_workers * 2:
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending.append(blob.name)
+                in_flight[executor.submit(self.migrate_blob, blob)] = blob.name
+                stats["submitted"] += 1
+
+            while in_flight:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(finished)
+
+    def run(self, bucket_names: List[str], limit: Optional[int] = None) -> dict:
+        checkpoint = self._load_checkpoint()
+        stats = {"submitted": 0}
+        started = datetime.utcnow()
+        with open(self.manifest_path, "a", encoding="utf-8") as manifest:
+            for bucket_name in bucket_names:
+                try:
+                    self.migrate_bucket(bucket_name, checkpoint, manifest, stats, limit)
+                except Exception as e:
+                    logger.error(f"❌ [GCS_MIGRATION] Error listing bucket {bucket_name}: {e}", exc_info=True)
+                    stats["bucket_errors"] = stats.get("bucket_errors", 0) + 1
+        stats["seconds"] = round((datetime.utcnow() - started).total_seconds(), 1)
+        logger.info(f"✅ [GCS_MIGRATION] Finished: {stats}")
+        return stats
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.chat.gcs_session_migration [--schools] [--bucket NOMBRE] [--workers N] [--limit N]
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migra sesiones legacy de GCS (history.json) a Firestore")
+    parser.add_argument("--bucket", action="append", help="Bucket a recorrer (por defecto el bucket de sesiones)")
+    parser.add_argument("--schools", action="store_true", help="Incluir los buckets de todos los colegios")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de sesiones a procesar en esta ejecución")
+    parser.add_argument("--checkpoint", default="gcs_migration_checkpoint.json")
+    parser.add_argument("--manifest", default="gcs_migration_manifest.jsonl")
+    args = parser.parse_args()
+
+    migrator = GcsSessionMigrator(args.workers, args.checkpoint, args.manifest)
+    buckets = args.bucket or [history_service.bucket_name]
+    if args.schools:
+        buckets += [name for name in migrator.school_bucket_names() if name not in buckets]
+    print(migrator.run(buckets, args.limit))
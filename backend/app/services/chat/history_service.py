@@ -1,11 +1,16 @@
 import json
 import logging
 import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from google.cloud import storage
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from app.core.config import get_settings
+from app.services.chat.message_page_store import MessagePageStore, PAGED_LAYOUT
+from app.services.page_cursor import InvalidCursorError
 
 settings = get_settings()
 
@@ -14,6 +19,118 @@ from google.cloud.firestore import FieldFilter
 
 
 logger = logging.getLogger(__name__)
+
+# Límite de operaciones por batch de Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
+# Encabezado del SystemMessage que lleva el resumen acumulado de turnos antiguos
+ROLLING_SUMMARY_HEADER = "RESUMEN DE LA CONVERSACIÓN ANTERIOR"
+
+# Campos de chat_sessions que necesita el listado (se leen con select, sin cargar mensajes)
+SESSION_LISTING_FIELDS = ["id", "title", "updated_at", "preview", "message_count", "next_order", "files_count"]
+SESSION_PREVIEW_CHARS = 100
+
+
+class HistoryCache:
+    """
+    Caché LRU de historiales por sesión, acotada por bytes (HISTORY_CACHE_MAX_BYTES).
+
+    Cada entrada guarda los registros (order, type, content, timestamp) y la versión
+    de la sesión ((next_order, history_revision) de chat_sessions/{id}). Una entrada solo se sirve
+    si su versión coincide con la del documento; los appends locales la extienden en
+    el lugar. `complete` indica si contiene el historial desde el order 0.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _records_size(records: List[dict]) -> int:
+        size = 0
+        for record in records:
+            content = record["content"]
+            size += (len(content) if isinstance(content, str) else len(json.dumps(content, default=str))) + 100
+        return size
+
+    def _drop(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry:
+            self._bytes -= entry["size"]
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["size"]
+
+    def get(self, session_id: str, version: Optional[tuple], tail: Optional[int] = None) -> Optional[List[dict]]:
+        """
+        Registros cacheados si la versión coincide. Con tail=None exige el historial
+        completo; con tail=n basta con tener los últimos n.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            usable = (
+                entry is not None and version is not None and entry["version"] == version and
+                (entry["complete"] or (tail is not None and len(entry["records"]) >= tail))
+            )
+            if not usable:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            records = entry["records"]
+            return list(records[-tail:]) if tail else list(records)
+
+    def put(self, session_id: str, version: Optional[tuple], records: List[dict], complete: bool):
+        if version is None or not self.max_bytes:
+            return
+        size = self._records_size(records)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(session_id)
+            self._entries[session_id] = {"version": version, "records": list(records), "complete": complete, "size": size}
+            self._bytes += size
+            self._evict()
+
+    def append(self, session_id: str, start_order: int, records: List[dict]):
+        """Extiende la entrada si estaba al día (su next_order == primer order nuevo); si no, la descarta."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            next_order, revision = entry["version"]
+            if next_order != start_order:
+                self._drop(session_id)
+                return
+            size = self._records_size(records)
+            entry["records"].extend(records)
+            entry["version"] = (start_order + len(records), revision)
+            entry["size"] += size
+            self._bytes += size
+            self._entries.move_to_end(session_id)
+            self._evict()
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
 class HistoryService:
     def __init__(self):
         self.project_id = settings.PROJECT_ID
@@ -21,6 +138,18 @@ class HistoryService:
         self.bucket_name = f"{self.project_id}-chat-sessions"
         self.db = firestore.Client(project=settings.PROJECT_ID, database=settings.FIRESTORE_DATABASE)
         self.collection_name = "chat_sessions"
+        # Historial con ventana: últimos N turnos literales + resumen acumulado de los anteriores
+        self.window_turns = settings.HISTORY_WINDOW_TURNS
+        self.summary_every_turns = settings.HISTORY_SUMMARY_EVERY_TURNS
+        self._background_tasks = set()
+        self.cache = HistoryCache(settings.HISTORY_CACHE_MAX_BYTES)
+        # Layout paginado (message_pages): nuevas sesiones y migración en segundo plano de las antiguas
+        self.paged_storage = settings.HISTORY_PAGED_STORAGE
+        self.page_store = MessagePageStore(self.db, settings.HISTORY_PAGE_SIZE, settings.HISTORY_PAGE_MAX_BYTES)
+        self._migration_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-pages")
+        self._migrating = set()
+        # Sesiones legacy en GCS (history.json); se desactiva tras la migración offline
+        self.gcs_fallback = settings.HISTORY_GCS_FALLBACK
 
     @property
     def storage_client(self):
@@ -32,79 +161,317 @@ class HistoryService:
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, self._load_history_sync, session_id, bucket_name)
 
+    async def load_windowed_history(self, session_id: str, bucket_name: Optional[str] = None) -> List:
+        """
+        Historial acotado para los prompts: últimos HISTORY_WINDOW_TURNS turnos literales,
+        precedidos por un SystemMessage con el resumen acumulado de los turnos anteriores.
+        Con HISTORY_WINDOW_TURNS = 0 retorna el historial completo.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load_windowed_history_sync, session_id, bucket_name)
+
+    def _load_windowed_history_sync(self, session_id: str, bucket_name: Optional[str] = None) -> List:
+        if self.window_turns <= 0:
+            return self._load_history_sync(session_id, bucket_name)
+
+        window_size = self.window_turns * 2
+        session_ref = self.db.collection(self.collection_name).document(session_id)
+        session_data = self._get_session_data(session_ref)
+        version = self._session_version(session_data)
+
+        records = self.cache.get(session_id, version, tail=window_size)
+        if records is None and self.page_store.is_paged(session_data):
+            next_order = session_data.get("next_order") or 0
+            start_order = max(0, next_order - window_size)
+            records = self.page_store.read_range(session_ref, session_data, start_order, next_order)
+            if not records:
+                return self._load_history_sync(session_id, bucket_name)[-window_size:]
+            self.cache.put(session_id, version, records, complete=start_order == 0)
+        elif records is None:
+            try:
+                docs = list(session_ref.collection("messages")
+                            .order_by("order", direction=firestore.Query.DESCENDING)
+                            .limit(window_size)
+                            .stream())
+            except Exception as e:
+                logger.warning(f"⚠️ [HISTORY] Windowed query failed, loading full history: {e}")
+                return self._load_history_sync(session_id, bucket_name)[-window_size:]
+
+            if not docs:
+                # Sesión vacía o legacy (GCS): la carga completa se encarga de migrar
+                return self._load_history_sync(session_id, bucket_name)[-window_size:]
+
+            docs.reverse()
+            records = [r for r in (self._record_from_data(doc.to_dict()) for doc in docs) if r is not None]
+            complete = len(docs) < window_size or (docs[0].to_dict().get("order") or 0) == 0
+            self.cache.put(session_id, version, records, complete)
+        else:
+            logger.info(f"⚡ [HISTORY] Window for {session_id} served from cache (version {version})")
+
+        messages = self._records_to_messages(records)
+        first_order = (records[0]["order"] or 0) if records else 0
+
+        # Solo hay turnos fuera de la ventana si el primer mensaje cargado no es el inicial
+        if first_order > 0:
+            rolling_summary = session_data.get("rolling_summary")
+            if rolling_summary and rolling_summary.get("text"):
+                messages.insert(0, SystemMessage(content=f"{ROLLING_SUMMARY_HEADER}:\n{rolling_summary['text']}"))
+
+        logger.info(f"✅ [HISTORY] Loaded windowed history for {session_id}: {len(messages)} messages (from order {first_order})")
+        return messages
+
+    @staticmethod
+    def _session_version(session_data: dict) -> Optional[tuple]:
+        """
+        Versión del historial para la caché: (next_order, history_revision).
+        next_order cambia con cada append; history_revision con ediciones en el lugar.
+        """
+        if session_data.get("next_order") is None:
+            return None
+        return session_data["next_order"], session_data.get("history_revision", 0)
+
+    def _bump_history_revision(self, session_id: str):
+        """Marca una edición en el lugar (sin nuevos mensajes) para que las cachés revaliden."""
+        self.cache.invalidate(session_id)
+        try:
+            self.db.collection(self.collection_name).document(session_id).set(
+                {"history_revision": firestore.Increment(1)}, merge=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] Could not bump history revision for {session_id}: {e}")
+
+    def _get_session_data(self, session_ref) -> dict:
+        """Documento chat_sessions/{id} (vacío si no existe o falla la lectura)."""
+        try:
+            snapshot = session_ref.get()
+            return (snapshot.to_dict() or {}) if snapshot.exists else {}
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] Could not read session document {session_ref.id}: {e}")
+            return {}
+
+    @staticmethod
+    def _record_from_data(data: dict) -> Optional[dict]:
+        """Registro cacheable de un documento de mensaje (None si está incompleto o es desconocido)."""
+        msg_type = data.get('type')
+        content = data.get('content')
+        if msg_type not in ('human', 'ai') or not content:
+            return None
+        return {"order": data.get('order'), "type": msg_type, "content": content, "timestamp": data.get('timestamp')}
+
+    @staticmethod
+    def _records_to_messages(records: List[dict]) -> List:
+        return [HumanMessage(content=r["content"]) if r["type"] == 'human' else AIMessage(content=r["content"]) for r in records]
+
+    def _should_refresh_summary(self, first_order: int, last_order: int) -> bool:
+        """True si el append cruzó un múltiplo de HISTORY_SUMMARY_EVERY_TURNS turnos."""
+        if self.window_turns <= 0 or self.summary_every_turns <= 0:
+            return False
+        every = self.summary_every_turns * 2
+        # Hasta que la conversación supere la ventana no hay nada que resumir
+        if last_order + 1 <= self.window_turns * 2:
+            return False
+        return first_order // every != (last_order + 1) // every
+
+    def _schedule_summary_refresh(self, session_id: str):
+        task = asyncio.create_task(self.refresh_rolling_summary(session_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def refresh_rolling_summary(self, session_id: str):
+        """
+        Actualiza incrementalmente el resumen acumulado de la sesión: solo resume los
+        mensajes que salieron de la ventana desde el último resumen y lo persiste en
+        chat_sessions/{id}.rolling_summary.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            pending = await loop.run_in_executor(None, self._get_unsummarized_messages_sync, session_id)
+            if not pending:
+                return
+            previous_text, messages, covered_until, user_id = pending
+
+            transcript = ""
+            for msg in messages:
+                role = "Usuario" if isinstance(msg, HumanMessage) else "Asistente"
+                content = msg.content if isinstance(msg.content, str) else str(msg.content)
+                transcript += f"{role}: {content}\n"
+
+            prompt = f"""Mantienes el resumen de una conversación sobre convivencia laboral (Ley Karin).
+Actualiza el resumen existente incorporando los nuevos mensajes.
+Conserva hechos, personas involucradas, fechas, decisiones y pendientes. No inventes información.
+Máximo 300 palabras, en texto plano.
+
+RESUMEN EXISTENTE:
+{previous_text or "(sin resumen previo)"}
+
+NUEVOS MENSAJES:
+{transcript}
+
+RESUMEN ACTUALIZADO:"""
+
+            from app.services.llm_registry import llm_registry
+            llm = llm_registry.get(
+                model_name=settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp",
+                temperature=0.2,
+                max_output_tokens=1024
+            )
+            response = await llm.ainvoke([HumanMessage(content=prompt)])
+            summary_text = (response.content or "").strip()
+            if not summary_text:
+                return
+
+            if user_id and response.usage_metadata:
+                from app.services.users.user_service import user_service
+                user_service.update_token_usage(
+                    user_id=user_id,
+                    input_tokens=response.usage_metadata.get('input_tokens', 0),
+                    output_tokens=response.usage_metadata.get('output_tokens', 0),
+                    model_name=llm.model_name
+                )
+
+            await loop.run_in_executor(None, self._save_rolling_summary_sync, session_id, summary_text, covered_until)
+            logger.info(f"🧾 [HISTORY] Rolling summary for {session_id} updated (covers up to order {covered_until}, +{len(messages)} msgs)")
+        except Exception as e:
+            logger.error(f"❌ [HISTORY] Error refreshing rolling summary for {session_id}: {e}")
+
+    def _get_unsummarized_messages_sync(self, session_id: str):
+        """Mensajes fuera de la ventana aún no incluidos en el resumen (None si no hay suficientes)."""
+        session_ref = self.db.collection(self.collection_name).document(session_id)
+        session_data = self._get_session_data(session_ref)
+        rolling_summary = session_data.get("rolling_summary") or {}
+        covered_until = rolling_summary.get("covered_until", -1)
+
+        messages_ref = session_ref.collection("messages")
+        next_order = session_data.get("next_order")
+        if next_order is None:
+            next_order = self._seed_next_order(messages_ref)
+        if not next_order:
+            return None
+        last_order = next_order - 1
+        window_start = last_order - self.window_turns * 2 + 1
+
+        if window_start - 1 - covered_until < self.summary_every_turns * 2:
+            return None
+
+        if self.page_store.is_paged(session_data):
+            records = self.page_store.read_range(session_ref, session_data, covered_until + 1, window_start)
+        else:
+            docs = list(messages_ref
+                        .where(filter=FieldFilter("order", ">", covered_until))
+                        .where(filter=FieldFilter("order", "<", window_start))
+                        .order_by("order")
+                        .stream())
+            records = [r for r in (self._record_from_data(doc.to_dict()) for doc in docs) if r is not None]
+        messages = self._records_to_messages(records)
+        if not messages:
+            return None
+        return rolling_summary.get("text"), messages, window_start - 1, session_data.get("user_id")
+
+    def _save_rolling_summary_sync(self, session_id: str, text: str, covered_until: int):
+        doc_ref = self.db.collection(self.collection_name).document(session_id)
+        doc_ref.set({
+            "rolling_summary": {
+                "text": text,
+                "covered_until": covered_until,
+                "updated_at": firestore.SERVER_TIMESTAMP
+            }
+        }, merge=True)
+
+    def _load_records_sync(self, session_id: str) -> List[dict]:
+        """
+        Registros del historial completo desde Firestore, ordenados por `order`.
+        Usa la caché si su versión coincide con la de la sesión (ver _session_version).
+        """
+        session_ref = self.db.collection(self.collection_name).document(session_id)
+        session_data = self._get_session_data(session_ref)
+        version = self._session_version(session_data)
+
+        cached = self.cache.get(session_id, version)
+        if cached is not None:
+            logger.info(f"⚡ [HISTORY] History for {session_id} served from cache (version {version})")
+            return cached
+
+        if self.page_store.is_paged(session_data):
+            records = self.page_store.read_range(session_ref, session_data, 0, session_data.get("next_order") or 0)
+            logger.info(f"📄 [HISTORY] Loaded {len(records)} messages from pages for session {session_id}")
+        else:
+            records = self._load_message_docs_records(session_ref)
+            # Sesiones largas con un documento por mensaje: migrar a páginas en segundo plano
+            if self.paged_storage and len(records) >= self.page_store.page_size:
+                self._schedule_page_migration(session_id)
+
+        if records:
+            self.cache.put(session_id, version, records, complete=True)
+        return records
+
+    def _load_message_docs_records(self, session_ref) -> List[dict]:
+        """Registros del layout de un documento por mensaje (chat_sessions/{id}/messages)."""
+        session_id = session_ref.id
+        messages_ref = session_ref.collection("messages")
+
+        # Intentar cargar con order_by, con fallback por falta de índice
+        docs = []
+        try:
+            # Usar order_by de forma segura - stream devuelve un iterador
+            docs = list(messages_ref.order_by("order").stream())
+            logger.info(f"✅ [HISTORY] Successfully loaded {len(docs)} documents using order_by")
+        except Exception as order_error:
+            logger.warning(f"⚠️ [HISTORY] order_by failed (missing index?), loading without order: {order_error}")
+            # Fallback: cargar sin orden y ordenar en memoria
+            try:
+                all_docs = list(messages_ref.stream())
+                logger.info(f"📄 [HISTORY] Loaded {len(all_docs)} documents without order")
+
+                # Separar documentos que tienen 'order' vs. los que no (para mensajes antiguos)
+                docs_with_order = []
+                docs_without_order = []
+
+                for doc in all_docs:
+                    doc_dict = doc.to_dict()
+                    if 'order' in doc_dict and doc_dict['order'] is not None:
+                        docs_with_order.append(doc)
+                    else:
+                        docs_without_order.append(doc)
+
+                # Ordenar los que tienen order
+                docs_with_order.sort(key=lambda d: d.to_dict().get('order', 0))
+
+                # Los documentos sin order van al final (son antiguos)
+                # Ordenar por timestamp si está disponible
+                docs_without_order.sort(key=lambda d: d.to_dict().get('timestamp', 0))
+
+                docs = docs_with_order + docs_without_order
+                logger.info(f"📊 [HISTORY] Sorted: {len(docs_with_order)} ordered + {len(docs_without_order)} legacy docs")
+            except Exception as fallback_error:
+                logger.error(f"❌ [HISTORY] Fallback sorting also failed: {fallback_error}", exc_info=True)
+                return []
+
+        logger.info(f"📄 [HISTORY] Found {len(docs)} documents in Firestore for session {session_id}")
+
+        records = []
+        for doc in docs:
+            record = self._record_from_data(doc.to_dict())
+            if record is None:
+                logger.warning(f"⚠️ [HISTORY] Skipping incomplete or unknown message {doc.id}")
+                continue
+            records.append(record)
+        return records
+
     def _load_history_sync(self, session_id: str, bucket_name: Optional[str] = None) -> List:
         """Load history from Firestore subcollection. Falls back to GCS if Firestore is empty."""
         try:
             logger.info(f"🔍 [HISTORY] Loading history for session {session_id}, bucket_name={bucket_name}")
-            
-            # Try loading from Firestore first
-            messages_ref = self.db.collection(self.collection_name).document(session_id).collection("messages")
-            
-            # Intentar cargar con order_by, con fallback por falta de índice
-            docs = []
-            try:
-                # Usar order_by de forma segura - stream devuelve un iterador
-                docs = list(messages_ref.order_by("order").stream())
-                logger.info(f"✅ [HISTORY] Successfully loaded {len(docs)} documents using order_by")
-            except Exception as order_error:
-                logger.warning(f"⚠️ [HISTORY] order_by failed (missing index?), loading without order: {order_error}")
-                # Fallback: cargar sin orden y ordenar en memoria
-                try:
-                    all_docs = list(messages_ref.stream())
-                    logger.info(f"📄 [HISTORY] Loaded {len(all_docs)} documents without order")
-                    
-                    # Separar documentos que tienen 'order' vs. los que no (para mensajes antiguos)
-                    docs_with_order = []
-                    docs_without_order = []
-                    
-                    for doc in all_docs:
-                        doc_dict = doc.to_dict()
-                        if 'order' in doc_dict and doc_dict['order'] is not None:
-                            docs_with_order.append(doc)
-                        else:
-                            docs_without_order.append(doc)
-                    
-                    # Ordenar los que tienen order
-                    docs_with_order.sort(key=lambda d: d.to_dict().get('order', 0))
-                    
-                    # Los documentos sin order van al final (son antiguos)
-                    # Ordenar por timestamp si está disponible
-                    docs_without_order.sort(key=lambda d: d.to_dict().get('timestamp', 0))
-                    
-                    docs = docs_with_order + docs_without_order
-                    logger.info(f"📊 [HISTORY] Sorted: {len(docs_with_order)} ordered + {len(docs_without_order)} legacy docs")
-                except Exception as fallback_error:
-                    logger.error(f"❌ [HISTORY] Fallback sorting also failed: {fallback_error}", exc_info=True)
-                    docs = []
-            
-            logger.info(f"📄 [HISTORY] Found {len(docs)} documents in Firestore for session {session_id}")
-            
-            messages = []
-            for doc in docs:
-                try:
-                    data = doc.to_dict()
-                    msg_type = data.get('type')
-                    content = data.get('content')
-                    
-                    if not msg_type or not content:
-                        logger.warning(f"⚠️ [HISTORY] Skipping incomplete message: type={msg_type}, has_content={bool(content)}")
-                        continue
-                    
-                    if msg_type == 'human':
-                        messages.append(HumanMessage(content=content))
-                    elif msg_type == 'ai':
-                        messages.append(AIMessage(content=content))
-                    else:
-                        logger.warning(f"⚠️ [HISTORY] Unknown message type: {msg_type}")
-                except Exception as msg_error:
-                    logger.error(f"❌ [HISTORY] Error processing message: {msg_error}")
-                    continue
-            
+
+            messages = self._records_to_messages(self._load_records_sync(session_id))
+
             # If Firestore has messages, return them
             if messages:
                 logger.info(f"✅ [HISTORY] Loaded {len(messages)} valid messages from Firestore for session {session_id}")
                 return messages
             
+            if not self.gcs_fallback:
+                return []
+
             # Otherwise, fall back to GCS for backward compatibility
             logger.info(f"🔍 [HISTORY] No valid Firestore messages found, checking GCS for session {session_id}")
             gcs_messages = self._load_history_from_gcs(session_id, bucket_name)
@@ -119,7 +486,7 @@ class HistoryService:
         except Exception as e:
             logger.error(f"❌ [HISTORY] Error loading history from Firestore: {e}", exc_info=True)
             # Final fallback to GCS
-            return self._load_history_from_gcs(session_id, bucket_name)
+            return self._load_history_from_gcs(session_id, bucket_name) if self.gcs_fallback else []
 
     async def load_history_with_timestamps(self, session_id: str, bucket_name: Optional[str] = None) -> List[Dict]:
         """Load history from Firestore with timestamps for frontend display."""
@@ -130,64 +497,7 @@ class HistoryService:
         """Load history from Firestore subcollection with timestamps."""
         try:
             logger.info(f"🔍 [HISTORY] Loading history with timestamps for session {session_id}")
-            
-            messages_ref = self.db.collection(self.collection_name).document(session_id).collection("messages")
-            
-            # Try loading with order_by
-            docs = []
-            try:
-                docs = list(messages_ref.order_by("order").stream())
-            except Exception as order_error:
-                logger.warning(f"⚠️ [HISTORY] order_by failed, loading without order: {order_error}")
-                try:
-                    all_docs = list(messages_ref.stream())
-                    docs_with_order = []
-                    docs_without_order = []
-                    
-                    for doc in all_docs:
-                        doc_dict = doc.to_dict()
-                        if 'order' in doc_dict and doc_dict['order'] is not None:
-                            docs_with_order.append(doc)
-                        else:
-                            docs_without_order.append(doc)
-                    
-                    docs_with_order.sort(key=lambda d: d.to_dict().get('order', 0))
-                    docs_without_order.sort(key=lambda d: d.to_dict().get('timestamp', 0))
-                    docs = docs_with_order + docs_without_order
-                except Exception as fallback_error:
-                    logger.error(f"❌ [HISTORY] Fallback also failed: {fallback_error}")
-                    docs = []
-            
-            messages = []
-            for doc in docs:
-                try:
-                    data = doc.to_dict()
-                    msg_type = data.get('type')
-                    content = data.get('content')
-                    timestamp = data.get('timestamp')
-                    
-                    if not msg_type or not content:
-                        continue
-                    
-                    role = "user" if msg_type == "human" else "bot"
-                    
-                    # Convert Firestore timestamp to ISO string
-                    timestamp_iso = None
-                    if timestamp:
-                        try:
-                            timestamp_iso = timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
-                        except:
-                            timestamp_iso = None
-                    
-                    messages.append({
-                        "role": role,
-                        "content": content,
-                        "timestamp": timestamp_iso
-                    })
-                except Exception as msg_error:
-                    logger.error(f"❌ [HISTORY] Error processing message: {msg_error}")
-                    continue
-            
+            messages = [self._record_to_display(record) for record in self._load_records_sync(session_id)]
             logger.info(f"✅ [HISTORY] Loaded {len(messages)} messages with timestamps for session {session_id}")
             return messages
             
@@ -195,6 +505,75 @@ class HistoryService:
             logger.error(f"❌ [HISTORY] Error loading history with timestamps: {e}", exc_info=True)
             return []
 
+    async def load_history_page(self, session_id: str, limit: int = 50, before: Optional[int] = None, bucket_name: Optional[str] = None) -> Dict:
+        """
+        Página del historial para el frontend: los `limit` mensajes más recientes con
+        order < before (o los últimos si before es None), en orden cronológico.
+        `next_before` es el cursor para pedir la página anterior (None si no hay más).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load_history_page_sync, session_id, limit, before, bucket_name)
+
+    def _load_history_page_sync(self, session_id: str, limit: int = 50, before: Optional[int] = None, bucket_name: Optional[str] = None, allow_migration: bool = True) -> Dict:
+        try:
+            session_ref = self.db.collection(self.collection_name).document(session_id)
+            session_data = self._get_session_data(session_ref)
+            next_order = session_data.get("next_order")
+            end_order = before if before is not None else next_order
+
+            cached = self.cache.get(session_id, self._session_version(session_data))
+            if cached is not None:
+                records = [r for r in cached if end_order is None or (r["order"] is not None and r["order"] < end_order)][-limit:]
+            elif self.page_store.is_paged(session_data):
+                end_order = end_order if end_order is not None else 0
+                records = self.page_store.read_range(session_ref, session_data, max(0, end_order - limit), end_order)
+            else:
+                query = session_ref.collection("messages")
+                if end_order is not None:
+                    query = query.where(filter=FieldFilter("order", "<", end_order))
+                docs = list(query.order_by("order", direction=firestore.Query.DESCENDING).limit(limit).stream())
+                docs.reverse()
+                records = [r for r in (self._record_from_data(doc.to_dict()) for doc in docs) if r is not None]
+
+            # Sesión legacy solo en GCS: la carga completa la migra a Firestore y se reintenta una vez
+            if not records and before is None and next_order is None and allow_migration and self.gcs_fallback:
+                if self._load_history_sync(session_id, bucket_name):
+                    return self._load_history_page_sync(session_id, limit, before, bucket_name, allow_migration=False)
+
+            first_order = records[0]["order"] if records else None
+            has_more = bool(first_order)
+            messages = []
+            for record in records:
+                message = self._record_to_display(record)
+                message["order"] = record["order"]
+                messages.append(message)
+
+            logger.info(f"📄 [HISTORY] Page for {session_id}: {len(messages)} messages before {end_order} (has_more={has_more})")
+            return {
+                "messages": messages,
+                "next_before": first_order if has_more else None,
+                "has_more": has_more
+            }
+        except Exception as e:
+            logger.error(f"❌ [HISTORY] Error loading history page for {session_id}: {e}", exc_info=True)
+            return {"messages": [], "next_before": None, "has_more": False}
+
+    @staticmethod
+    def _record_to_display(record: dict) -> dict:
+        """Formato para el frontend: role user/bot y timestamp ISO."""
+        timestamp = record.get("timestamp")
+        timestamp_iso = None
+        if timestamp:
+            try:
+                timestamp_iso = timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+            except Exception:
+                timestamp_iso = None
+        return {
+            "role": "user" if record["type"] == "human" else "bot",
+            "content": record["content"],
+            "timestamp": timestamp_iso
+        }
+
     
     def _load_history_from_gcs(self, session_id: str, bucket_name: Optional[str] = None) -> List:
         """Legacy method to load history from GCS. Used for backward compatibility."""
@@ -248,114 +627,380 @@ class HistoryService:
         await loop.run_in_executor(None, self._save_history_sync, session_id, messages, bucket_name)
 
     def _save_history_sync(self, session_id: str, messages: List, bucket_name: Optional[str] = None):
-        """Save history to Firestore subcollection. This replaces the entire message history."""
+        """Save history to Firestore (see _save_history_to_firestore), falling back to GCS on error."""
         try:
-            # Get reference to the messages subcollection
-            messages_ref = self.db.collection(self.collection_name).document(session_id).collection("messages")
-            
-            # Use a batch to perform atomic writes
-            batch = self.db.batch()
-            
-            # First, delete all existing messages in this subcollection
-            existing_docs = messages_ref.stream()
-            for doc in existing_docs:
-                batch.delete(doc.reference)
-            
-            # Now add all messages with order
-            for idx, msg in enumerate(messages):
-                msg_data = {
-                    'order': idx,
-                    'timestamp': firestore.SERVER_TIMESTAMP
-                }
-                
-                if isinstance(msg, HumanMessage):
-                    msg_data['type'] = 'human'
-                    msg_data['content'] = msg.content
-                elif isinstance(msg, AIMessage):
-                    msg_data['type'] = 'ai'
-                    msg_data['content'] = msg.content
-                else:
-                    continue
-                
-                # Create a new document with auto-generated ID
-                new_doc_ref = messages_ref.document()
-                batch.set(new_doc_ref, msg_data)
-            
-            # Commit the batch
-            batch.commit()
-            logger.info(f"💾 [HISTORY] Saved {len(messages)} messages to Firestore for session {session_id}")
-            
+            self._save_history_to_firestore(session_id, messages)
         except Exception as e:
             logger.error(f"Error saving history to Firestore: {e}")
             # Fallback to GCS if Firestore fails
             logger.warning(f"⚠️ [HISTORY] Falling back to GCS for session {session_id}")
             self._save_history_to_gcs(session_id, messages, bucket_name)
 
+    def _save_history_to_firestore(self, session_id: str, messages: List):
+        """
+        Save history to Firestore subcollection, replacing the stored history.
+        Raises on failure (no GCS fallback).
+
+        Compara contra lo guardado por `order` y escribe solo los mensajes nuevos
+        o modificados; borra los sobrantes (orders fuera de rango, duplicados o
+        documentos legacy sin order). Las escrituras se dividen en batches de
+        máximo FIRESTORE_BATCH_LIMIT operaciones.
+        """
+        session_ref = self.db.collection(self.collection_name).document(session_id)
+        messages_ref = session_ref.collection("messages")
+        session_data = self._get_session_data(session_ref)
+
+        session_update = {}
+        if self.page_store.is_paged(session_data) or self.paged_storage:
+            operations, order, session_update = self._build_paged_save_operations(session_ref, session_data, messages)
+        else:
+            operations, order = self._build_message_docs_save_operations(messages_ref, messages)
+
+        # Mantener el contador de appends y los campos del listado alineados con el historial guardado
+        serialized = [data for data in (self._serialize_message(msg) for msg in messages) if data is not None]
+        session_update.update({
+            "next_order": order,
+            "history_revision": firestore.Increment(1),
+            **self._listing_fields(serialized)
+        })
+        operations.append(("merge", session_ref, session_update))
+
+        if session_update.get("storage_layout") == PAGED_LAYOUT:
+            # Conversión a páginas: las páginas, luego el cambio de layout en su propio commit
+            # y recién entonces el borrado de los mensajes antiguos (como migrate_session_to_pages),
+            # así una falla a mitad de camino nunca deja la sesión sin historial legible
+            self._commit_operations(operations[:-1])
+            self._commit_operations(operations[-1:])
+            self.cache.invalidate(session_id)
+            self._delete_message_docs(session_ref)
+        else:
+            self._commit_operations(operations)
+            self.cache.invalidate(session_id)
+        logger.info(f"💾 [HISTORY] Saved {order} messages to Firestore for session {session_id} ({len(operations)} writes)")
+
+    def _build_message_docs_save_operations(self, messages_ref, messages: List):
+        """Diff por `order` contra chat_sessions/{id}/messages (layout de un documento por mensaje)."""
+        existing_by_order = {}
+        stale_refs = []
+        for doc in messages_ref.stream():
+            order = doc.to_dict().get('order')
+            if order is None or order in existing_by_order:
+                stale_refs.append(doc.reference)
+            else:
+                existing_by_order[order] = doc
+
+        operations = []
+        order = 0
+        for msg in messages:
+            msg_data = self._serialize_message(msg)
+            if msg_data is None:
+                continue
+
+            existing = existing_by_order.pop(order, None)
+            if existing is None:
+                msg_data.update({'order': order, 'timestamp': firestore.SERVER_TIMESTAMP})
+                operations.append(("set", messages_ref.document(), msg_data))
+            else:
+                stored = existing.to_dict()
+                if stored.get('type') != msg_data['type'] or stored.get('content') != msg_data['content']:
+                    operations.append(("update", existing.reference, msg_data))
+            order += 1
+
+        # Lo que quedó sin emparejar ya no forma parte del historial
+        stale_refs.extend(doc.reference for doc in existing_by_order.values())
+        operations.extend(("delete", ref, None) for ref in stale_refs)
+        return operations, order
+
+    def _build_paged_save_operations(self, session_ref, session_data: dict, messages: List):
+        """
+        Reescritura de las páginas que cambian. Retorna (operaciones, cantidad de mensajes,
+        campos de la sesión); si la sesión aún no era paginada, los campos incluyen el
+        cambio de storage_layout y el llamador borra los documentos antiguos al final.
+        Cada mensaje conserva el timestamp que ya tenía guardado.
+        """
+        records = []
+        for msg in messages:
+            msg_data = self._serialize_message(msg)
+            if msg_data is None:
+                continue
+            records.append({**msg_data, "order": len(records), "timestamp": None})
+
+        session_update = {}
+        if not self.page_store.is_paged(session_data):
+            # Conversión: los timestamps vienen de los documentos de mensaje (por posición)
+            for record, stored in zip(records, self._load_message_docs_records(session_ref)):
+                if stored["type"] == record["type"]:
+                    record["timestamp"] = stored.get("timestamp")
+            session_update["storage_layout"] = PAGED_LAYOUT
+
+        operations, layout = self.page_store.build_rewrite_operations(session_ref, records)
+        session_update.update(layout)
+        return operations, len(records), session_update
+
+    @staticmethod
+    def _content_text(content) -> str:
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text")
+        return ""
+
+    @staticmethod
+    def _content_files(content) -> int:
+        if isinstance(content, list):
+            return sum(1 for part in content if isinstance(part, dict) and part.get("type") in ("image_url", "media"))
+        return 0
+
+    def _preview_from(self, records: List[dict]) -> Optional[str]:
+        """Texto del primer mensaje de usuario, recortado para el listado."""
+        for record in records:
+            if record.get("type") == "human":
+                text = self._content_text(record.get("content")).strip()
+                if text:
+                    return text[:SESSION_PREVIEW_CHARS] + "..." if len(text) > SESSION_PREVIEW_CHARS else text
+        return None
+
+    def _listing_fields(self, records: List[dict]) -> dict:
+        """Campos desnormalizados del listado calculados desde el historial completo."""
+        fields = {
+            "message_count": len(records),
+            "files_count": sum(self._content_files(r.get("content")) for r in records if r.get("type") == "human")
+        }
+        preview = self._preview_from(records)
+        if preview:
+            fields["preview"] = preview
+        return fields
+
+    @staticmethod
+    def _serialize_message(msg) -> Optional[dict]:
+        if isinstance(msg, HumanMessage):
+            return {'type': 'human', 'content': msg.content}
+        if isinstance(msg, AIMessage):
+            return {'type': 'ai', 'content': msg.content}
+        return None
+
+    def _commit_operations(self, operations: List[tuple]):
+        """Aplica operaciones (tipo, referencia, datos) en batches de máximo FIRESTORE_BATCH_LIMIT."""
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for op, ref, data in operations[start:start + FIRESTORE_BATCH_LIMIT]:
+                if op == "set":
+                    batch.set(ref, data)
+                elif op == "merge":
+                    batch.set(ref, data, merge=True)
+                elif op == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+
     async def append_messages(self, session_id: str, new_messages: List):
         """Appends new messages to the history without overwriting existing ones."""
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, self._append_messages_sync, session_id, new_messages)
+        appended = await loop.run_in_executor(None, self._append_messages_sync, session_id, new_messages)
+        if appended and self._should_refresh_summary(*appended):
+            self._schedule_summary_refresh(session_id)
 
     def _append_messages_sync(self, session_id: str, new_messages: List):
-        """Sync implementation of append_messages"""
+        """
+        Sync implementation of append_messages. Retorna (primer order, último order) escritos.
+
+        En una sola transacción reserva los orders desde el contador `next_order` del
+        documento chat_sessions/{id} y escribe los mensajes, así dos appends concurrentes
+        nunca obtienen el mismo order.
+        """
         try:
             logger.info(f"➕ [HISTORY] Appending {len(new_messages)} messages to session {session_id}")
-            messages_ref = self.db.collection(self.collection_name).document(session_id).collection("messages")
-            
-            # Determine start index de forma robusta
-            start_index = 0
-            try:
-                # Intentar usar order_by para obtener el índice más alto
-                last_docs = list(messages_ref.order_by("order", direction=firestore.Query.DESCENDING).limit(1).stream())
-                if last_docs:
-                    start_index = last_docs[0].to_dict().get('order', -1) + 1
-                    logger.info(f"✅ [HISTORY] Found max order: {start_index - 1}, starting at {start_index}")
-            except Exception as order_error:
-                logger.warning(f"⚠️ [HISTORY] order_by failed for append, using fallback: {order_error}")
-                # Fallback: contar todos los documentos y usar el más alto
-                try:
-                    all_docs = list(messages_ref.stream())
-                    max_order = -1
-                    
-                    for doc in all_docs:
-                        doc_order = doc.to_dict().get('order', -1)
-                        if doc_order > max_order:
-                            max_order = doc_order
-                    
-                    start_index = max_order + 1
-                    logger.info(f"📊 [HISTORY] Scanned {len(all_docs)} docs, max_order={max_order}, starting at {start_index}")
-                except Exception as fallback_error:
-                    logger.error(f"❌ [HISTORY] Fallback also failed: {fallback_error}")
-                    start_index = 0
-            
-            logger.info(f"📝 [HISTORY] Starting at index {start_index}")
-            
-            batch = self.db.batch()
-            
-            for idx, msg in enumerate(new_messages):
-                msg_data = {
-                    'order': start_index + idx,
-                    'timestamp': firestore.SERVER_TIMESTAMP
-                }
-                
-                if isinstance(msg, HumanMessage):
-                    msg_data['type'] = 'human'
-                    msg_data['content'] = msg.content
-                elif isinstance(msg, AIMessage):
-                    msg_data['type'] = 'ai'
-                    msg_data['content'] = msg.content
-                else:
+            session_ref = self.db.collection(self.collection_name).document(session_id)
+            messages_ref = session_ref.collection("messages")
+
+            serialized = []
+            for msg in new_messages:
+                msg_data = self._serialize_message(msg)
+                if msg_data is None:
                     logger.warning(f"⚠️ [HISTORY] Skipping unknown message type: {type(msg)}")
                     continue
-                
-                new_doc_ref = messages_ref.document()
-                batch.set(new_doc_ref, msg_data)
-            
-            batch.commit()
-            logger.info(f"✅ [HISTORY] Successfully appended {len(new_messages)} messages to session {session_id}")
+                serialized.append(msg_data)
+            if not serialized:
+                return None
+
+            now = datetime.now(timezone.utc)
+
+            @firestore.transactional
+            def append_in_transaction(transaction):
+                snapshot = session_ref.get(transaction=transaction)
+                session_data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+                next_order = session_data.get("next_order")
+                session_update = {}
+                paged = self.page_store.is_paged(session_data)
+                if next_order is None:
+                    # Sesión anterior al contador: se inicializa una vez desde los mensajes existentes
+                    next_order = self._seed_next_order(messages_ref)
+                    # Las sesiones nuevas nacen con el layout paginado
+                    if next_order == 0 and self.paged_storage:
+                        paged = True
+                        session_update["storage_layout"] = PAGED_LAYOUT
+
+                if paged:
+                    session_update.update(self.page_store.add_append_writes(transaction, session_ref, session_data, [
+                        {**msg_data, "order": next_order + idx, "timestamp": now}
+                        for idx, msg_data in enumerate(serialized)
+                    ]))
+                else:
+                    for idx, msg_data in enumerate(serialized):
+                        transaction.set(messages_ref.document(), {
+                            **msg_data,
+                            'order': next_order + idx,
+                            'timestamp': firestore.SERVER_TIMESTAMP
+                        })
+                session_update["next_order"] = next_order + len(serialized)
+                # Campos del listado: se mantienen al escribir para no recorrer mensajes al listar
+                session_update["message_count"] = next_order + len(serialized)
+                session_update["updated_at"] = firestore.SERVER_TIMESTAMP
+                new_files = sum(self._content_files(m["content"]) for m in serialized if m["type"] == "human")
+                if new_files:
+                    session_update["files_count"] = firestore.Increment(new_files)
+                if not session_data.get("preview"):
+                    preview = self._preview_from(serialized)
+                    if preview:
+                        session_update["preview"] = preview
+                transaction.set(session_ref, session_update, merge=True)
+                return next_order
+
+            start_index = append_in_transaction(self.db.transaction())
+            self.cache.append(session_id, start_index, [
+                {"order": start_index + idx, "type": msg_data["type"], "content": msg_data["content"], "timestamp": now}
+                for idx, msg_data in enumerate(serialized)
+            ])
+            logger.info(f"✅ [HISTORY] Successfully appended {len(serialized)} messages to session {session_id} (orders {start_index}-{start_index + len(serialized) - 1})")
+            return start_index, start_index + len(serialized) - 1
             
         except Exception as e:
             logger.error(f"❌ [HISTORY] Error appending history to Firestore: {e}", exc_info=True)
+            return None
+
+    # ---------- Migración al layout paginado ----------
+
+    def _schedule_page_migration(self, session_id: str):
+        if session_id in self._migrating:
+            return
+        self._migrating.add(session_id)
+
+        def run():
+            try:
+                self.migrate_session_to_pages(session_id)
+            finally:
+                self._migrating.discard(session_id)
+
+        self._migration_executor.submit(run)
+
+    def migrate_session_to_pages(self, session_id: str) -> bool:
+        """
+        Convierte una sesión de un documento por mensaje a páginas.
+
+        Escribe las páginas, cambia storage_layout en una transacción que verifica que
+        no hubo appends entretanto (si los hubo, no cambia nada y se reintenta en otra
+        carga) y recién entonces borra los documentos de mensajes antiguos.
+        """
+        try:
+            session_ref = self.db.collection(self.collection_name).document(session_id)
+            session_data = self._get_session_data(session_ref)
+            if self.page_store.is_paged(session_data):
+                return False
+            initial_next_order = session_data.get("next_order")
+
+            records = self._load_message_docs_records(session_ref)
+            if not records:
+                return False
+
+            page_operations, layout = self.page_store.build_migration_operations(session_ref, records)
+            self._commit_operations(page_operations)
+
+            @firestore.transactional
+            def switch_layout(transaction) -> bool:
+                snapshot = session_ref.get(transaction=transaction)
+                current = (snapshot.to_dict() or {}) if snapshot.exists else {}
+                if self.page_store.is_paged(current) or current.get("next_order") != initial_next_order:
+                    return False
+                transaction.set(session_ref, {
+                    "storage_layout": PAGED_LAYOUT,
+                    **layout,
+                    "next_order": len(records),
+                    "history_revision": firestore.Increment(1),
+                    **self._listing_fields(records)
+                }, merge=True)
+                return True
+
+            if not switch_layout(self.db.transaction()):
+                logger.info(f"⏭️ [HISTORY] Session {session_id} changed during page migration, will retry later")
+                return False
+
+            self.cache.invalidate(session_id)
+            removed = self._delete_message_docs(session_ref)
+            logger.info(f"📦 [HISTORY] Migrated session {session_id} to pages ({len(records)} messages, {removed} docs removed)")
+            return True
+        except Exception as e:
+            logger.error(f"❌ [HISTORY] Error migrating session {session_id} to pages: {e}", exc_info=True)
+            return False
+
+    def _delete_message_docs(self, session_ref) -> int:
+        """Borra chat_sessions/{id}/messages de una sesión ya paginada (los documentos sobrantes no se leen)."""
+        try:
+            stale = [("delete", doc.reference, None) for doc in session_ref.collection("messages").stream()]
+            self._commit_operations(stale)
+            return len(stale)
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] Could not remove old message docs of {session_ref.id}: {e}")
+            return 0
+
+    def migrate_all_sessions_to_pages(self, limit: Optional[int] = None) -> dict:
+        """Migra al layout paginado todas las sesiones que aún usan un documento por mensaje."""
+        stats = {"scanned": 0, "migrated": 0, "skipped": 0}
+        for doc in self.db.collection(self.collection_name).select(["storage_layout"]).stream():
+            if limit is not None and stats["migrated"] >= limit:
+                break
+            stats["scanned"] += 1
+            if self.page_store.is_paged(doc.to_dict() or {}):
+                stats["skipped"] += 1
+                continue
+            if self.migrate_session_to_pages(doc.id):
+                stats["migrated"] += 1
+            else:
+                stats["skipped"] += 1
+        logger.info(f"📦 [HISTORY] Page migration finished: {stats}")
+        return stats
+
+    def backfill_listing_fields(self, limit: Optional[int] = None) -> dict:
+        """Calcula preview, message_count y files_count en sesiones creadas antes de desnormalizarlos."""
+        stats = {"scanned": 0, "updated": 0, "skipped": 0}
+        for doc in self.db.collection(self.collection_name).select(["message_count"]).stream():
+            if limit is not None and stats["updated"] >= limit:
+                break
+            stats["scanned"] += 1
+            if (doc.to_dict() or {}).get("message_count") is not None:
+                stats["skipped"] += 1
+                continue
+            try:
+                records = self._load_records_sync(doc.id)
+                doc.reference.set(self._listing_fields(records), merge=True)
+                stats["updated"] += 1
+            except Exception as e:
+                logger.error(f"❌ [HISTORY] Error backfilling listing fields for {doc.id}: {e}")
+                stats["skipped"] += 1
+        logger.info(f"📋 [HISTORY] Listing backfill finished: {stats}")
+        return stats
+
+    def _seed_next_order(self, messages_ref) -> int:
+        """Siguiente order para sesiones sin contador (max order + 1, o count() si no hay índice)."""
+        try:
+            last_docs = list(messages_ref.order_by("order", direction=firestore.Query.DESCENDING).limit(1).stream())
+            if last_docs:
+                return (last_docs[0].to_dict().get('order') or 0) + 1
+            return 0
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] order_by failed seeding next_order, using count(): {e}")
+            result = messages_ref.count(alias="total").get()
+            return int(result[0][0].value)
 
     async def replace_last_ai_message(self, session_id: str, new_content: str, message_order: int = None):
         """Replaces the content of an AI message in the history.
@@ -372,7 +1017,18 @@ class HistoryService:
         """Sync implementation of replace_last_ai_message"""
         try:
             logger.info(f"✏️ [HISTORY] Replacing AI message for session {session_id}, order={message_order}")
-            messages_ref = self.db.collection(self.collection_name).document(session_id).collection("messages")
+            session_ref = self.db.collection(self.collection_name).document(session_id)
+            messages_ref = session_ref.collection("messages")
+
+            session_data = self._get_session_data(session_ref)
+            if self.page_store.is_paged(session_data):
+                replaced = self.page_store.replace_ai_message(session_ref, session_data, new_content, message_order)
+                if replaced is None:
+                    logger.warning(f"⚠️ [HISTORY] No AI message found to replace in session {session_id}")
+                    return
+                self._bump_history_revision(session_id)
+                logger.info(f"✅ [HISTORY] Successfully replaced AI message at order {replaced} in session {session_id}")
+                return
             
             if message_order is not None:
                 # Find the specific message by order
@@ -381,6 +1037,7 @@ class HistoryService:
                     if docs:
                         doc = docs[0]
                         doc.reference.update({'content': new_content})
+                        self._bump_history_revision(session_id)
                         logger.info(f"✅ [HISTORY] Successfully replaced AI message at order {message_order} in session {session_id}")
                         return
                     else:
@@ -391,6 +1048,7 @@ class HistoryService:
                         if docs:
                             doc = docs[0]
                             doc.reference.update({'content': new_content})
+                            self._bump_history_revision(session_id)
                             logger.info(f"✅ [HISTORY] Successfully replaced AI message at order {message_order - 1} in session {session_id}")
                             return
                         # Still not found, fall through to last AI message logic
@@ -413,6 +1071,7 @@ class HistoryService:
                 if data.get('type') == 'ai':
                     # Update this message
                     doc.reference.update({'content': new_content})
+                    self._bump_history_revision(session_id)
                     logger.info(f"✅ [HISTORY] Successfully replaced last AI message in session {session_id}")
                     return
             
@@ -503,49 +1162,130 @@ class HistoryService:
             logger.error(f"❌ [METADATA] Error getting session metadata: {e}", exc_info=True)
             return None
 
-    async def list_sessions(self, user_id: Optional[str] = None) -> List[dict]:
-        """Lista las sesiones de chat. Si se proporciona user_id, filtra por usuario usando Firestore."""
+    async def list_sessions(self, user_id: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None):
+        """
+        Lista las sesiones de chat. Si se proporciona user_id, filtra por usuario usando Firestore.
+
+        Con `limit` devuelve una página {"sessions", "next_cursor"} ordenada por updated_at
+        descendente; `cursor` es el id de la última sesión de la página anterior. Si esa
+        sesión ya no existe se lanza InvalidCursorError.
+        """
+        loop = asyncio.get_running_loop()
         if user_id:
-            return await self._list_sessions_firestore(user_id)
+            return await loop.run_in_executor(None, self._list_sessions_firestore, user_id, limit, cursor)
         
         # Fallback a GCS si no hay user_id (comportamiento anterior)
-        loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, self._list_sessions_sync)
 
-    async def _list_sessions_firestore(self, user_id: str) -> List[dict]:
+    def _user_sessions_query(self, user_id: str):
+        # Requiere el índice compuesto chat_sessions (user_id ASC, updated_at DESC)
+        return (self.db.collection(self.collection_name)
+                .where(filter=FieldFilter("user_id", "==", user_id))
+                .order_by("updated_at", direction=firestore.Query.DESCENDING))
+
+    def _list_sessions_firestore(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+        cursor_snapshot = None
+        if cursor:
+            cursor_snapshot = self.db.collection(self.collection_name).document(cursor).get()
+            if not cursor_snapshot.exists:
+                raise InvalidCursorError(cursor)
         try:
-            # Nota: Eliminamos order_by de la query para evitar requerir un índice compuesto
-            # Se ordenará en memoria.
-            docs = (self.db.collection(self.collection_name)
-                   .where(filter=FieldFilter("user_id", "==", user_id))
-                   .stream())
-            
-            sessions = []
-            for doc in docs:
-                data = doc.to_dict()
-                updated_at = data.get("updated_at")
-                sessions.append({
-                    "id": data.get("id"),
-                    "title": data.get("title", "Conversación sin título"),
-                    "date": updated_at.strftime("%d/%m/%Y") if updated_at else "Reciente",
-                    "created_at": updated_at.isoformat() if updated_at else None,  # ISO format for frontend processing
-                    "timestamp": updated_at
-                })
-            
-            # Ordenar en memoria por timestamp descendente
-            sessions.sort(key=lambda x: x.get('timestamp') or datetime.min, reverse=True)
-            
-            # Limpiar timestamp antes de devolver (created_at ya tiene la info necesaria)
-            for s in sessions:
-                s.pop('timestamp', None)
+            query = self._user_sessions_query(user_id).select(SESSION_LISTING_FIELDS)
+            if cursor_snapshot is not None:
+                query = query.start_after(cursor_snapshot)
+            if limit:
+                # Un documento extra indica si hay otra página
+                query = query.limit(limit + 1)
+            sessions = [self._session_list_item(doc.id, doc.to_dict() or {}) for doc in query.stream()]
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] Indexed session listing failed (missing index?), sorting in memory: {e}")
+            sessions = self._list_sessions_unindexed(user_id)
+            if cursor:
+                ids = [s["id"] for s in sessions]
+                if cursor not in ids:
+                    raise InvalidCursorError(cursor)
+                sessions = sessions[ids.index(cursor) + 1:]
+            if limit:
+                sessions = sessions[:limit + 1]
 
+        if not limit:
             logger.info(f" Found {len(sessions)} sessions for user {user_id} in Firestore")
             return sessions
+
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
+        return {
+            "sessions": sessions,
+            "next_cursor": sessions[-1]["id"] if has_more and sessions else None
+        }
+
+    def _list_all_sessions_firestore(self) -> List[dict]:
+        """Listado sin usuario una vez migradas las sesiones de GCS (índice simple sobre updated_at)."""
+        try:
+            docs = (self.db.collection(self.collection_name)
+                    .order_by("updated_at", direction=firestore.Query.DESCENDING)
+                    .select(SESSION_LISTING_FIELDS)
+                    .stream())
+            return [self._session_list_item(doc.id, doc.to_dict() or {}) for doc in docs]
+        except Exception as e:
+            logger.error(f"Error listing sessions from Firestore: {e}")
+            return []
+
+    def _list_sessions_unindexed(self, user_id: str) -> List[dict]:
+        """Listado sin order_by (no requiere índice compuesto); ordena en memoria."""
+        try:
+            docs = (self.db.collection(self.collection_name)
+                   .where(filter=FieldFilter("user_id", "==", user_id))
+                   .select(SESSION_LISTING_FIELDS)
+                   .stream())
+            entries = [((doc.to_dict() or {}).get("updated_at"), self._session_list_item(doc.id, doc.to_dict() or {})) for doc in docs]
+            entries.sort(key=lambda entry: entry[0].timestamp() if entry[0] else 0, reverse=True)
+            return [item for _, item in entries]
         except Exception as e:
             logger.info(f"Error listing sessions from Firestore: {e}")
             return []
 
+    @staticmethod
+    def _session_list_item(session_id: str, data: dict) -> dict:
+        updated_at = data.get("updated_at")
+        preview = data.get("preview") or ""
+        return {
+            "id": data.get("id") or session_id,
+            "title": data.get("title") or "Conversación sin título",
+            "date": updated_at.strftime("%d/%m/%Y") if updated_at else "Reciente",
+            "created_at": updated_at.isoformat() if updated_at else None,  # ISO format for frontend processing
+            "preview": preview,
+            "message_count": data.get("message_count", data.get("next_order", 0)),
+            "files_count": data.get("files_count", 0)
+        }
+
+    async def count_sessions_by_day(self, user_id: str, start: datetime, end: datetime) -> Dict[str, int]:
+        """Sesiones del usuario actualizadas por día (YYYY-MM-DD) en [start, end]."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._count_sessions_by_day_sync, user_id, start, end)
+
+    def _count_sessions_by_day_sync(self, user_id: str, start: datetime, end: datetime) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        try:
+            query = (self._user_sessions_query(user_id)
+                     .where(filter=FieldFilter("updated_at", ">=", start))
+                     .where(filter=FieldFilter("updated_at", "<=", end))
+                     .select(["updated_at"]))
+            dates = [(doc.to_dict() or {}).get("updated_at") for doc in query.stream()]
+        except Exception as e:
+            logger.warning(f"⚠️ [HISTORY] Indexed session count failed (missing index?), filtering in memory: {e}")
+            dates = [datetime.fromisoformat(item["created_at"]) for item in self._list_sessions_unindexed(user_id) if item["created_at"]]
+            dates = [d for d in dates if start <= d.replace(tzinfo=None) <= end]
+
+        for updated_at in dates:
+            if updated_at:
+                date_key = updated_at.strftime("%Y-%m-%d")
+                counts[date_key] = counts.get(date_key, 0) + 1
+        return counts
+
     def _list_sessions_sync(self) -> List[dict]:
+        if not self.gcs_fallback:
+            return self._list_all_sessions_firestore()
         try:
             bucket = self.storage_client.bucket(self.bucket_name)
             if not bucket.exists():
@@ -632,13 +1372,16 @@ class HistoryService:
                 title = data.get("title", "Conversación sin título")
                 date_str = data.get("updated_at").strftime("%d/%m/%Y") if data.get("updated_at") else "Reciente"
                 
-                # Get preview from first message in subcollection
-                preview = ""
-                messages_ref = doc_ref.collection("messages")
-                first_messages = messages_ref.order_by("order").limit(1).stream()
+                # Preview desnormalizado; sesiones sin backfill lo calculan desde el primer mensaje
+                preview = data.get("preview") or ""
+                if preview or data.get("message_count") is not None:
+                    first_messages = []
+                elif self.page_store.is_paged(data):
+                    first_messages = self.page_store.read_range(doc_ref, data, 0, 1)
+                else:
+                    first_messages = [d.to_dict() for d in doc_ref.collection("messages").order_by("order").limit(1).stream()]
                 
-                for msg_doc in first_messages:
-                    msg_data = msg_doc.to_dict()
+                for msg_data in first_messages:
                     if msg_data.get('type') == 'human':
                         content = msg_data.get('content', '')
                         if isinstance(content, str):
@@ -653,6 +1396,9 @@ class HistoryService:
                     "preview": preview
                 }
             
+            if not self.gcs_fallback:
+                return None
+
             # 2. Fallback to GCS for backward compatibility
             logger.info(f"🔍 [HISTORY] No Firestore metadata found, checking GCS for session {session_id}")
             target_bucket_name = bucket_name or self.bucket_name
@@ -754,3 +1500,17 @@ class HistoryService:
             return None
 
 history_service = HistoryService()
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.chat.history_service migrate-pages|backfill-listing [límite]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    command_limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    if command == "migrate-pages":
+        print(history_service.migrate_all_sessions_to_pages(command_limit))
+    elif command == "backfill-listing":
+        print(history_service.backfill_listing_fields(command_limit))
+    else:
+        print("Uso: python -m app.services.chat.history_service migrate-pages|backfill-listing [límite]")
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.services.chat.intent_classifier import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Palabras vacías que no cambian la intención (se conservan negaciones e interrogativos)
+STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "a", "en",
+    "y", "o", "e", "u", "por", "para", "con", "sobre", "se", "lo", "le", "les", "me", "mi",
+    "mis", "su", "sus", "este", "esta", "estos", "estas", "ese", "esa", "eso", "esto",
+    "favor", "porfavor", "hola", "gracias", "pues", "bueno", "ok"
+}
+
+# Palabras que cambian la intención aunque el resto del mensaje sea igual: un casi-duplicado
+# solo se acepta si ambos mensajes tienen exactamente las mismas
+NEGATIONS = {"no", "ni", "nunca", "jamas", "tampoco", "sin", "nada", "nadie", "ningun", "ninguna", "ninguno"}
+INTERROGATIVES = {"que", "quien", "quienes", "cual", "cuales", "como", "cuando", "donde", "cuanto", "cuanta",
+                  "cuantos", "cuantas", "porque"}
+INTENT_MARKERS = NEGATIONS | INTERROGATIVES
+
+SHINGLE_SIZE = 4
+MIN_SHINGLES_FOR_NEAR_MATCH = 8  # Mensajes muy cortos solo por coincidencia exacta
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def cache_text(message: str) -> str:
+    """Mensaje normalizado: sin tildes, en minúsculas y sin palabras vacías."""
+    text = normalize_text(message).replace("¿", " ").replace("?", " ")
+    return " ".join(word for word in text.split() if word not in STOPWORDS)
+
+
+def intent_markers(text: str) -> frozenset:
+    """Negaciones e interrogativos presentes en un texto ya normalizado con cache_text."""
+    return frozenset(word for word in text.split() if word in INTENT_MARKERS)
+
+
+class IntentCache:
+    """
+    Caché TTL acotada para resultados de IntentRouter.classify_intent.
+
+    Clave: mensaje normalizado (cache_text) + has_files + caso activo. Además del acierto
+    exacto, busca casi-duplicados con MinHash sobre shingles de caracteres y LSH por
+    bandas: una entrada cercana se usa si su similitud de Jaccard estimada supera
+    `similarity`, tiene el mismo contexto (archivos / caso) y las mismas negaciones e
+    interrogativos ("quiero crear un caso" no sirve para "no quiero crear un caso").
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity: float = 0.8,
+                 num_perm: int = 32, bands: int = 8):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Permutaciones (a*x + b) mod p deterministas
+        self._perms = [(2 * i + 1) * 0x9E3779B1 % MERSENNE_PRIME or 1 for i in range(num_perm)]
+        self._offsets = [(i + 1) * 0x85EBCA6B % MERSENNE_PRIME for i in range(num_perm)]
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- MinHash ----------
+
+    def _signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        padded = f" {text} "
+        shingles = {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+        if len(shingles) < MIN_SHINGLES_FOR_NEAR_MATCH:
+            return None
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes)
+            for a, b in zip(self._perms, self._offsets)
+        )
+
+    def _band_keys(self, context: tuple, signature: Tuple[int, ...]) -> List[tuple]:
+        return [(context, band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    # ---------- Operaciones ----------
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry and entry["signature"]:
+            for band_key in self._band_keys(key[1:], entry["signature"]):
+                bucket = self._buckets.get(band_key)
+                if bucket:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    def _alive(self, entry: dict, now: float) -> bool:
+        return now - entry["stored_at"] < self.ttl_seconds
+
+    def get(self, message: str, has_files: bool, has_case: bool) -> Optional[Dict]:
+        if not self.max_entries:
+            return None
+        text = cache_text(message)
+        context = (has_files, has_case)
+        key = (text, *context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._alive(entry, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry["result"])
+                self._remove(key)
+
+            signature = self._signature(text)
+            if signature is not None:
+                markers = intent_markers(text)
+                candidates = set()
+                for band_key in self._band_keys(context, signature):
+                    candidates |= self._buckets.get(band_key, set())
+                best_key, best_similarity = None, 0.0
+                for candidate in candidates:
+                    candidate_entry = self._entries.get(candidate)
+                    if candidate_entry is None or not self._alive(candidate_entry, now):
+                        continue
+                    if candidate_entry["markers"] != markers:
+                        continue
+                    similarity = sum(1 for x, y in zip(signature, candidate_entry["signature"]) if x == y) / self.num_perm
+                    if similarity > best_similarity:
+                        best_key, best_similarity = candidate, similarity
+                if best_key is not None and best_similarity >= self.similarity:
+                    self._entries.move_to_end(best_key)
+                    self.near_hits += 1
+                    logger.info(f"♻️ [INTENT_CACHE] Near-duplicate hit (similarity {best_similarity:.2f})")
+                    return dict(self._entries[best_key]["result"])
+
+            self.misses += 1
+            return None
+
+    def put(self, message: str, has_files: bool, has_case: bool, result: Dict):
+        if not self.max_entries:
+            return
+        text = cache_text(message)
+        if not text:
+            return
+        context = (has_files, has_case)
+        key = (text, *context)
+        signature = self._signature(text)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "result": dict(result),
+                "signature": signature,
+                "markers": intent_markers(text),
+                "stored_at": time.monotonic()
+            }
+            if signature is not None:
+                for band_key in self._band_keys(context, signature):
+                    self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,355 @@
+import json
+import logging
+import math
+import os
+import random
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
+DEFAULT_MODEL_PATH = os.path.join(MODELS_DIR, "intent_classifier.json")
+SEED_PATH = os.path.join(MODELS_DIR, "intent_seed.jsonl")
+
+# Colección donde IntentRouter registra las decisiones del LLM (datos de entrenamiento)
+DECISIONS_COLLECTION = "intent_decisions"
+DECISION_MESSAGE_MAX_CHARS = 500
+
+# Datos personales que no se guardan en intent_decisions (orden: los más específicos primero)
+REDACTION_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "[EMAIL]"),
+    (re.compile(r"\b\d{1,2}\.?\d{3}\.?\d{3}-?[\dkK]\b"), "[RUT]"),
+    (re.compile(r"(?:\+?56\s?)?\b9\s?\d{4}\s?\d{4}\b"), "[TELEFONO]"),
+    (re.compile(r"\d{5,}"), "[NUMERO]"),
+]
+
+INTENTS = ["DOCUMENT_ANALYSIS", "SIMPLE_QA", "TOOL_REQUIRED", "CASE_QUERY", "CASE_CREATION"]
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9ñ?¿ ]", " ", text)).strip()
+
+
+def redact_message(message: str) -> str:
+    """Reemplaza correos, RUT, teléfonos y números largos por marcadores."""
+    for pattern, placeholder in REDACTION_PATTERNS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+def extract_features(message: str, has_files: bool = False, has_case: bool = False) -> Dict[str, float]:
+    """
+    Conteos de n-gramas de caracteres (3-5, dentro de cada palabra), palabras y
+    bigramas de palabras, más marcas de contexto (archivos adjuntos, caso activo).
+    """
+    text = normalize_text(message)
+    words = text.split()
+    counts: Counter = Counter()
+    for word in words:
+        padded = f" {word} "
+        for n in (3, 4, 5):
+            for i in range(len(padded) - n + 1):
+                counts[f"c:{padded[i:i + n]}"] += 1
+        counts[f"w:{word}"] += 1
+    for first, second in zip(words, words[1:]):
+        counts[f"b:{first} {second}"] += 1
+    if "?" in message or "¿" in message:
+        counts["ctx:question"] = 1
+    counts["ctx:files" if has_files else "ctx:no_files"] = 1
+    counts["ctx:case" if has_case else "ctx:no_case"] = 1
+    return dict(counts)
+
+
+class LocalIntentClassifier:
+    """
+    Clasificador local de intención (TF-IDF + regresión logística multinomial).
+
+    Se entrena con las decisiones que IntentRouter registra del LLM (intent_decisions)
+    y un conjunto semilla; el modelo se guarda como JSON en app/services/chat/models.
+    IntentRouter lo consulta antes de `_llm_classify` y solo usa su respuesta si la
+    probabilidad supera INTENT_LOCAL_THRESHOLD.
+
+    Uso: python -m app.services.chat.intent_classifier train|eval [opciones]
+    """
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, threshold: float = 0.85):
+        self.model_path = model_path
+        self.threshold = threshold
+        self._model = None
+        self._loaded = False
+
+    @property
+    def db(self):
+        from app.services.case_service import case_service
+        return case_service.db
+
+    def _load(self) -> Optional[dict]:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                with open(self.model_path, "r", encoding="utf-8") as f:
+                    self._model = json.load(f)
+                logger.info(f"🧮 [INTENT_LOCAL] Model loaded: {len(self._model['vocab'])} features, trained {self._model.get('trained_at')}")
+            except FileNotFoundError:
+                logger.warning(f"⚠️ [INTENT_LOCAL] No model at {self.model_path}, local classification disabled")
+            except Exception as e:
+                logger.error(f"❌ [INTENT_LOCAL] Error loading model: {e}")
+        return self._model
+
+    # ---------- Inferencia ----------
+
+    @staticmethod
+    def _vectorize(model: dict, features: Dict[str, float]) -> List[Tuple[int, float]]:
+        """TF-IDF (log tf) normalizado L2, solo con features del vocabulario."""
+        vocab = model["vocab"]
+        idf = model["idf"]
+        vector = []
+        for feature, count in features.items():
+            index = vocab.get(feature)
+            if index is not None:
+                vector.append((index, (1.0 + math.log(count)) * idf[index]))
+        norm = math.sqrt(sum(value * value for _, value in vector)) or 1.0
+        return [(index, value / norm) for index, value in vector]
+
+    @staticmethod
+    def _probabilities(model: dict, vector: List[Tuple[int, float]]) -> List[float]:
+        scores = []
+        for weights, bias in zip(model["weights"], model["bias"]):
+            scores.append(bias + sum(weights[index] * value for index, value in vector))
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict(self, message: str, has_files: bool = False, has_case: bool = False) -> Optional[Dict]:
+        """Intención más probable o None si no hay modelo."""
+        model = self._load()
+        if not model:
+            return None
+        vector = self._vectorize(model, extract_features(message, has_files, has_case))
+        if not vector:
+            return None
+        probabilities = self._probabilities(model, vector)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return {
+            "intent": model["labels"][best],
+            "confidence": round(probabilities[best], 4),
+            "reasoning": "Local classifier"
+        }
+
+    def classify(self, message: str, has_files: bool = False, has_case: bool = False) -> Optional[Dict]:
+        """Predicción solo si supera el umbral de confianza (si no, decide el LLM)."""
+        prediction = self.predict(message, has_files, has_case)
+        if not prediction or prediction["confidence"] < self.threshold:
+            return None
+        # CASE_QUERY solo tiene sentido con un caso activo
+        if prediction["intent"] == "CASE_QUERY" and not has_case:
+            return None
+        return prediction
+
+    # ---------- Registro de decisiones del LLM ----------
+
+    def record_decision(self, message: str, has_files: bool, has_case: bool, intent: str, confidence: float):
+        """
+        Guarda una decisión del LLM como ejemplo de entrenamiento (best effort).
+        El mensaje se guarda redactado y con expires_at (INTENT_DECISION_RETENTION_DAYS):
+        una política TTL de Firestore sobre ese campo, o `purge`, borra los vencidos.
+        """
+        try:
+            from google.cloud import firestore
+            self.db.collection(DECISIONS_COLLECTION).add({
+                "message": redact_message(message[:DECISION_MESSAGE_MAX_CHARS]),
+                "has_files": has_files,
+                "has_case": has_case,
+                "intent": intent,
+                "confidence": confidence,
+                "source": "llm",
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "expires_at": datetime.utcnow() + timedelta(days=settings.INTENT_DECISION_RETENTION_DAYS)
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ [INTENT_LOCAL] Could not record intent decision: {e}")
+
+    def purge_expired_decisions(self) -> int:
+        """Borra las decisiones con expires_at vencido (sin política TTL configurada)."""
+        from google.cloud.firestore import FieldFilter
+        query = self.db.collection(DECISIONS_COLLECTION).where(filter=FieldFilter("expires_at", "<", datetime.utcnow()))
+        deleted = 0
+        batch = self.db.batch()
+        for doc in query.select([]).stream():
+            batch.delete(doc.reference)
+            deleted += 1
+            if deleted % 500 == 0:
+                batch.commit()
+                batch = self.db.batch()
+        batch.commit()
+        logger.info(f"🧹 [INTENT_LOCAL] Purged {deleted} expired intent decisions")
+        return deleted
+
+    # ---------- Entrenamiento ----------
+
+    @staticmethod
+    def train(examples: List[dict], epochs: int = 40, learning_rate: float = 0.5, l2: float = 1e-4,
+              min_df: int = 1, seed: int = 13) -> dict:
+        """
+        Regresión logística multinomial por SGD sobre vectores TF-IDF dispersos.
+        examples: [{"message", "intent", "has_files", "has_case"}]
+        """
+        labels = [intent for intent in INTENTS if any(e["intent"] == intent for e in examples)]
+        label_index = {label: i for i, label in enumerate(labels)}
+        featurized = [
+            (extract_features(e["message"], e.get("has_files", False), e.get("has_case", False)), label_index[e["intent"]])
+            for e in examples if e.get("intent") in label_index
+        ]
+
+        document_frequency: Counter = Counter()
+        for features, _ in featurized:
+            document_frequency.update(features.keys())
+        vocab_terms = sorted(term for term, df in document_frequency.items() if df >= min_df)
+        vocab = {term: i for i, term in enumerate(vocab_terms)}
+        total_docs = len(featurized)
+        idf = [math.log((1 + total_docs) / (1 + document_frequency[term])) + 1.0 for term in vocab_terms]
+
+        model = {"labels": labels, "vocab": vocab, "idf": idf}
+        vectors = [(LocalIntentClassifier._vectorize(model, features), label) for features, label in featurized]
+
+        weights = [[0.0] * len(vocab) for _ in labels]
+        bias = [0.0] * len(labels)
+        model.update({"weights": weights, "bias": bias})
+        rng = random.Random(seed)
+        order = list(range(len(vectors)))
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1.0 + epoch * 0.1)
+            for i in order:
+                vector, label = vectors[i]
+                probabilities = LocalIntentClassifier._probabilities(model, vector)
+                for k, probability in enumerate(probabilities):
+                    gradient = probability - (1.0 if k == label else 0.0)
+                    bias[k] -= rate * gradient
+                    row = weights[k]
+                    for index, value in vector:
+                        row[index] -= rate * (gradient * value + l2 * row[index])
+
+        # Redondeo para un artefacto compacto
+        model["weights"] = [[round(w, 5) for w in row] for row in weights]
+        model["bias"] = [round(b, 5) for b in bias]
+        model["idf"] = [round(v, 5) for v in idf]
+        model["trained_at"] = datetime.utcnow().isoformat()
+        model["examples"] = total_docs
+        return model
+
+    @staticmethod
+    def evaluate(model: dict, examples: List[dict], threshold: float) -> dict:
+        """Exactitud global, cobertura sobre el umbral y precisión/recall por intención."""
+        results = []
+        for example in examples:
+            vector = LocalIntentClassifier._vectorize(model, extract_features(example["message"], example.get("has_files", False), example.get("has_case", False)))
+            probabilities = LocalIntentClassifier._probabilities(model, vector)
+            best = max(range(len(probabilities)), key=probabilities.__getitem__)
+            results.append((model["labels"][best], probabilities[best], example["intent"]))
+
+        confident = [r for r in results if r[1] >= threshold]
+        report = {
+            "examples": len(results),
+            "accuracy": round(sum(1 for p, _, t in results if p == t) / len(results), 4) if results else None,
+            "coverage_at_threshold": round(len(confident) / len(results), 4) if results else None,
+            "accuracy_at_threshold": round(sum(1 for p, _, t in confident if p == t) / len(confident), 4) if confident else None,
+            "per_intent": {}
+        }
+        for label in model["labels"]:
+            predicted = sum(1 for p, _, _ in results if p == label)
+            actual = sum(1 for _, _, t in results if t == label)
+            hits = sum(1 for p, _, t in results if p == label and t == label)
+            report["per_intent"][label] = {
+                "precision": round(hits / predicted, 4) if predicted else None,
+                "recall": round(hits / actual, 4) if actual else None,
+                "support": actual
+            }
+        return report
+
+    def save(self, model: dict, path: Optional[str] = None):
+        path = path or self.model_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(model, f, ensure_ascii=False, separators=(",", ":"))
+        self._model, self._loaded = model, True
+
+
+def load_examples_from_file(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_examples_from_firestore(classifier: LocalIntentClassifier, min_confidence: float) -> List[dict]:
+    examples = []
+    for doc in classifier.db.collection(DECISIONS_COLLECTION).stream():
+        data = doc.to_dict() or {}
+        if data.get("intent") in INTENTS and data.get("message") and (data.get("confidence") or 0) >= min_confidence:
+            examples.append(data)
+    return examples
+
+
+def split_examples(examples: Iterable[dict], eval_ratio: float) -> Tuple[List[dict], List[dict]]:
+    """División determinista por hash del mensaje (el mismo mensaje cae siempre del mismo lado)."""
+    train, evaluation = [], []
+    for example in examples:
+        bucket = zlib.crc32(example["message"].encode("utf-8")) % 1000 / 1000
+        (evaluation if bucket < eval_ratio else train).append(example)
+    return train, evaluation
+
+
+intent_classifier = LocalIntentClassifier(threshold=settings.INTENT_LOCAL_THRESHOLD)
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.chat.intent_classifier train|eval|purge [--no-firestore] [--file X.jsonl] ...
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Entrena/evalúa el clasificador local de intención")
+    parser.add_argument("command", choices=["train", "eval", "purge"])
+    parser.add_argument("--file", action="append", default=[], help="JSONL adicional de ejemplos")
+    parser.add_argument("--no-seed", action="store_true", help="No incluir intent_seed.jsonl")
+    parser.add_argument("--no-firestore", action="store_true", help="No leer intent_decisions de Firestore")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="Confianza mínima del LLM para usar una decisión")
+    parser.add_argument("--eval-ratio", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=settings.INTENT_LOCAL_THRESHOLD)
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        print(f"{intent_classifier.purge_expired_decisions()} decisiones vencidas eliminadas")
+        raise SystemExit(0)
+
+    all_examples = [] if args.no_seed else load_examples_from_file(SEED_PATH)
+    for extra_path in args.file:
+        all_examples += load_examples_from_file(extra_path)
+    if not args.no_firestore:
+        all_examples += load_examples_from_firestore(intent_classifier, args.min_confidence)
+    print(f"{len(all_examples)} ejemplos: {dict(Counter(e['intent'] for e in all_examples))}")
+
+    if args.command == "eval":
+        current = intent_classifier._load()
+        if not current:
+            raise SystemExit(f"No hay modelo en {intent_classifier.model_path}")
+        print(json.dumps(LocalIntentClassifier.evaluate(current, all_examples, args.threshold), indent=2))
+    else:
+        train_set, eval_set = split_examples(all_examples, args.eval_ratio)
+        if eval_set:
+            candidate = LocalIntentClassifier.train(train_set, epochs=args.epochs)
+            print(json.dumps(LocalIntentClassifier.evaluate(candidate, eval_set, args.threshold), indent=2))
+        # El artefacto final se entrena con todos los ejemplos
+        final_model = LocalIntentClassifier.train(all_examples, epochs=args.epochs)
+        intent_classifier.save(final_model, args.out)
+        print(f"Modelo guardado en {args.out} ({len(final_model['vocab'])} features)")
@@ -1,13 +1,20 @@
 import asyncio
 import logging
 from typing import Dict, List, Optional
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
+from app.services.chat.intent_classifier import intent_classifier
+from app.services.chat.intent_cache import IntentCache
+from app.services.chat import keyword_matcher as keywords
+from app.services.chat.keyword_matcher import keyword_matcher, match_message
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Confianza mínima de una clasificación del LLM para guardarla en la caché
+CACHE_MIN_CONFIDENCE = 0.7
+
 
 class IntentRouter:
     """
@@ -25,7 +32,15 @@ class IntentRouter:
     def __init__(self):
         self._llm = None
         self.model_location = settings.VERTEX_LOCATION or "us-central1"
-        self._cache = {}  # Simple cache for intent classification
+        # Clasificaciones por mensaje normalizado (exacto o casi-duplicado)
+        self.cache = IntentCache(
+            max_entries=settings.INTENT_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.INTENT_CACHE_TTL_SECONDS,
+            similarity=settings.INTENT_CACHE_SIMILARITY
+        )
+        self.local_classifier_enabled = settings.INTENT_LOCAL_CLASSIFIER
+        self.decision_logging = settings.INTENT_DECISION_LOGGING
+        self._background_tasks = set()
     
     @property
     def llm(self):
@@ -33,12 +48,10 @@ class IntentRouter:
         if self._llm is None:
             model_name = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL or "gemini-2.0-flash-exp"
             logger.info(f"🤖 [INTENT] Initializing LLM with model: {model_name}")
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
                 temperature=0.1,  # Low temperature for consistent classification
-                max_output_tokens=512,  # Enough for structured output
-                project=settings.PROJECT_ID,
-                location=self.model_location,
+                max_output_tokens=512  # Enough for structured output
             )
         return self._llm
     
@@ -55,7 +68,9 @@ class IntentRouter:
         
         Architecture:
         1. Fast-path heuristics (~20 lines) for 100% obvious cases
-        2. LLM classification for everything else (robust, handles edge cases)
+        2. Cache of previous classifications (normalized message, near-duplicates)
+        3. Local classifier (TF-IDF + logistic regression) when confident enough
+        4. LLM classification for everything else (robust, handles edge cases)
         
         Args:
             message: User message
@@ -71,9 +86,24 @@ class IntentRouter:
                 "reasoning": str  # Why this intent was chosen
             }
         """
+        result = self.classify_fast(message, has_files=has_files, case_id=case_id, history=history)
+        if result:
+            return result
+        return await self.classify_with_llm(message, has_files=has_files, case_id=case_id, user_id=user_id)
+
+    def classify_fast(
+        self,
+        message: str,
+        has_files: bool = False,
+        case_id: Optional[str] = None,
+        history: List = None
+    ) -> Optional[Dict[str, any]]:
+        """
+        Pasos 1-3 de classify_intent (fast-paths, caché y clasificador local), sin LLM.
+        Retorna None si el mensaje necesita la clasificación del LLM.
+        """
         try:
             import re
-            message_lower = message.lower()
             
             # ════════════════════════════════════════════════════════════════════
             # FAST-PATH #1: Email address detected → TOOL_REQUIRED
@@ -90,14 +120,8 @@ class IntentRouter:
             # ════════════════════════════════════════════════════════════════════
             # FAST-PATH #2: Explicit tool requests (email/calendar phrases)
             # ════════════════════════════════════════════════════════════════════
-            tool_phrases = [
-                "enviar correo", "redactar correo", "enviar email", "redactar email",
-                "enviar mail", "agendar reunión", "agendar reunion", "agenda cita",
-                "programar cita", "preparar correo", "notificar por correo",
-                "agendar citación", "citar a declarar", "enviar notificación"
-            ]
-            
-            if any(phrase in message_lower for phrase in tool_phrases):
+            matches = match_message(message)
+            if keywords.TOOL_PHRASE in matches:
                 logger.info(f"🎯 [INTENT] Fast-path: TOOL_REQUIRED (explicit tool phrase)")
                 return {
                     "intent": self.TOOL_REQUIRED,
@@ -111,18 +135,12 @@ class IntentRouter:
             if history and len(history) >= 2 and not case_id:
                 recent = history[-6:] if len(history) > 6 else history
                 recent_text = " ".join([
-                    m.content.lower() for m in recent 
+                    m.content for m in recent 
                     if hasattr(m, 'content') and isinstance(m.content, str)
                 ])
                 
-                # Indicadores de caso activo (Laboral)
-                case_indicators = [
-                    "tengo una denuncia", "trabajador", "denunciado", "denunciante",
-                    "testigos", "fecha del incidente", "acoso laboral", "acoso sexual",
-                    "violencia", "hostigamiento", "jefe", "supervisor"
-                ]
-                
-                if any(indicator in recent_text for indicator in case_indicators):
+                # Indicadores de caso activo (Laboral), ver keyword_matcher.CASE_INDICATOR
+                if keywords.CASE_INDICATOR in keyword_matcher.match(recent_text):
                     logger.info("🎯 [INTENT] Fast-path: CASE_CREATION (active conversation)")
                     return {
                         "intent": self.CASE_CREATION,
@@ -134,11 +152,8 @@ class IntentRouter:
             # FAST-PATH #4: Files attached + analysis verbs → DOCUMENT_ANALYSIS
             # ════════════════════════════════════════════════════════════════════
             if has_files:
-                analysis_verbs = ["analiz", "revis", "examin", "lee", "resum", "que dice", "que contiene"]
-                file_refs = ["archivo", "documento", "adjunto", "pdf", "contrato", "carta"]
-                
-                has_analysis = any(verb in message_lower for verb in analysis_verbs)
-                has_file_ref = any(ref in message_lower for ref in file_refs)
+                has_analysis = keywords.ANALYSIS_VERB in matches
+                has_file_ref = keywords.FILE_REF in matches
                 is_short_question = "?" in message and len(message.split()) < 10
                 
                 if has_analysis or has_file_ref or is_short_question:
@@ -149,28 +164,75 @@ class IntentRouter:
                         "reasoning": "Files attached with analysis request"
                     }
             
+            # ════════════════════════════════════════════════════════════════════
+            # CACHE: Same (or nearly the same) message already classified
+            # ════════════════════════════════════════════════════════════════════
+            cached = self.cache.get(message, has_files, bool(case_id))
+            if cached:
+                logger.info(f"⚡ [INTENT] Cache hit: {cached['intent']} (conf: {cached['confidence']:.2f})")
+                return cached
+
+            # ════════════════════════════════════════════════════════════════════
+            # LOCAL CLASSIFIER: Skip the LLM round trip when confident
+            # ════════════════════════════════════════════════════════════════════
+            if self.local_classifier_enabled:
+                local_result = intent_classifier.classify(message, has_files=has_files, has_case=bool(case_id))
+                if local_result:
+                    logger.info(f"🧮 [INTENT] Local classifier: {local_result['intent']} (conf: {local_result['confidence']:.2f})")
+                    self.cache.put(message, has_files, bool(case_id), local_result)
+                    return local_result
+
+            return None
+
+        except Exception as e:
+            return self._error_result(e)
+
+    async def classify_with_llm(
+        self,
+        message: str,
+        has_files: bool = False,
+        case_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, any]:
+        """Paso 4 de classify_intent: clasificación con el LLM (cachea y registra la decisión)."""
+        try:
             # ════════════════════════════════════════════════════════════════════
             # LLM CLASSIFICATION: For all ambiguous cases
             # ════════════════════════════════════════════════════════════════════
             logger.info("🧠 [INTENT] Using LLM for classification (no fast-path matched)")
-            return await self._llm_classify(message, has_files, case_id, user_id)
+            result = await self._llm_classify(message, has_files, case_id, user_id)
+            if not result.get("reasoning", "").startswith("Error"):
+                # Las clasificaciones dudosas no se cachean: se vuelven a evaluar
+                if result.get("confidence", 0) >= CACHE_MIN_CONFIDENCE:
+                    self.cache.put(message, has_files, bool(case_id), result)
+                if self.decision_logging:
+                    self._record_decision(message, has_files, bool(case_id), result)
+            return result
             
         except Exception as e:
-            logger.warning(f"⚠️ [INTENT] Classification error: {e}")
-            return {
-                "intent": self.TOOL_REQUIRED,
-                "confidence": 0.5,
-                "reasoning": f"Error during classification: {e}"
-            }
+            return self._error_result(e)
+
+    def _error_result(self, error: Exception) -> Dict[str, any]:
+        logger.warning(f"⚠️ [INTENT] Classification error: {error}")
+        return {
+            "intent": self.TOOL_REQUIRED,
+            "confidence": 0.5,
+            "reasoning": f"Error during classification: {error}"
+        }
     
+    def _record_decision(self, message: str, has_files: bool, has_case: bool, result: Dict):
+        """Registra la decisión del LLM (datos de entrenamiento del clasificador local) sin bloquear la respuesta."""
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(
+            None, intent_classifier.record_decision,
+            message, has_files, has_case, result["intent"], result["confidence"]
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     def _is_case_query(self, message: str) -> bool:
         """Fast keyword detection for case queries (deprecated - now using LLM)"""
-        query_keywords = [
-            "de que trata", "que caso", "cual es el caso", "resumen del caso",
-            "quien esta involucrado", "archivos del caso", "detalles del caso"
-        ]
-        message_lower = message.lower()
-        return any(k in message_lower for k in query_keywords)
+        return keywords.CASE_QUERY in match_message(message)
     
     async def _llm_classify(self, message: str, has_files: bool, case_id: Optional[str], user_id: Optional[str] = None) -> Dict:
         """Use LLM to classify when heuristics are insufficient"""
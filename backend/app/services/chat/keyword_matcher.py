@@ -0,0 +1,172 @@
+"""
+Keyword Matcher
+
+Reglas de palabras clave del pipeline de chat en un solo lugar. Todas las listas se
+compilan al importar en un autómata Aho-Corasick: un mensaje se normaliza una vez y
+se recorre una sola vez, obteniendo todas las categorías que coinciden (incluidas
+coincidencias solapadas entre categorías).
+
+Las coincidencias son por subcadena sobre texto normalizado (minúsculas, sin tildes),
+igual que las comparaciones `kw in message.lower()` que reemplaza.
+"""
+
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List
+
+# ════════════════════════════════════════════════════════════════════
+# Categorías
+# ════════════════════════════════════════════════════════════════════
+
+# IntentRouter fast-path #2: petición explícita de herramientas (email/calendario)
+TOOL_PHRASE = "tool_phrase"
+# IntentRouter fast-path #3: conversación de denuncia en curso (se evalúa sobre el historial)
+CASE_INDICATOR = "case_indicator"
+# IntentRouter fast-path #4: verbos de análisis y referencias a archivos
+ANALYSIS_VERB = "analysis_verb"
+FILE_REF = "file_ref"
+# IntentRouter._is_case_query (obsoleto)
+CASE_QUERY = "case_query"
+# stream_chat: pre-carga de documentos del caso antes de clasificar
+PRELOAD_ANALYSIS = "preload_analysis"
+# _detect_protocol_intent
+PROTOCOL_EXCLUSION = "protocol_exclusion"
+PROTOCOL_ACTIVATION = "protocol_activation"
+PROTOCOL_NEXT_STEP = "protocol_next_step"
+INFORMATIONAL_QUESTION = "informational_question"
+# _detect_analysis_intent
+ANALYSIS_INTENT = "analysis_intent"
+# AmbiguityHandler: opciones de aclaración
+AMBIGUITY_PROTOCOL = "ambiguity_protocol"
+AMBIGUITY_EMAIL = "ambiguity_email"
+AMBIGUITY_CALENDAR = "ambiguity_calendar"
+
+KEYWORD_SETS: Dict[str, List[str]] = {
+    TOOL_PHRASE: [
+        "enviar correo", "redactar correo", "enviar email", "redactar email",
+        "enviar mail", "agendar reunión", "agendar reunion", "agenda cita",
+        "programar cita", "preparar correo", "notificar por correo",
+        "agendar citación", "citar a declarar", "enviar notificación"
+    ],
+    CASE_INDICATOR: [
+        "tengo una denuncia", "trabajador", "denunciado", "denunciante",
+        "testigos", "fecha del incidente", "acoso laboral", "acoso sexual",
+        "violencia", "hostigamiento", "jefe", "supervisor"
+    ],
+    ANALYSIS_VERB: ["analiz", "revis", "examin", "lee", "resum", "que dice", "que contiene"],
+    FILE_REF: ["archivo", "documento", "adjunto", "pdf", "contrato", "carta"],
+    CASE_QUERY: [
+        "de que trata", "que caso", "cual es el caso", "resumen del caso",
+        "quien esta involucrado", "archivos del caso", "detalles del caso"
+    ],
+    PRELOAD_ANALYSIS: [
+        "analiz", "revis", "examin", "verific", "lee", "estudia", "resum",
+        "que dice", "transcripci", "entrevista", "contenido"
+    ],
+    PROTOCOL_EXCLUSION: [
+        # Questions about what/which protocols
+        "que es un protocolo", "que es el protocolo", "que son los protocolos",
+        "cual es el protocolo", "cuales son los protocolos",
+        # Questions about how protocols work
+        "que significa protocolo", "definicion de protocolo",
+        "como funciona el protocolo", "como funciona un protocolo",
+        "para que sirve el protocolo", "para que sirve un protocolo",
+        # Requests for information/explanation
+        "explicame el protocolo", "explicame un protocolo",
+        "dame informacion sobre", "cuentame sobre",
+        "describe el protocolo", "describe un protocolo",
+        # Questions about protocol creation/generation (informational)
+        "como se genera un protocolo", "como generar un protocolo",
+        "como se crea un protocolo", "como crear un protocolo",
+        "que necesito para generar", "que necesito para crear",
+        # Questions asking which protocol to use
+        "que protocolo", "cual protocolo", "cuales protocolos"
+    ],
+    PROTOCOL_ACTIVATION: [
+        "activar protocolo", "activa protocolo", "activa el protocolo",
+        "iniciar protocolo", "inicia protocolo", "inicia el protocolo",
+        "generar protocolo", "genera protocolo", "genera el protocolo",
+        "crear protocolo", "crea protocolo", "crea el protocolo",
+        "necesito los pasos del protocolo",
+        "siguientes pasos del protocolo",
+        "procede con el protocolo", "continua con el protocolo"
+    ],
+    PROTOCOL_NEXT_STEP: ["siguiente", "continuar"],
+    INFORMATIONAL_QUESTION: ["que son", "cuales son", "cual es"],
+    ANALYSIS_INTENT: ["analiza", "analizar", "caso", "revisar", "evaluar", "situación", "resumen", "conflicto"],
+    AMBIGUITY_PROTOCOL: ["protocolo", "rice", "normativa", "reglamento", "ley", "procedimiento"],
+    AMBIGUITY_EMAIL: ["correo", "email", "enviar", "redactar", "escribir", "escribe", "notificación", "notificar"],
+    AMBIGUITY_CALENDAR: ["calendario", "agenda", "cita", "reunión", "evento"],
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin tildes (NFD sin marcas combinantes)."""
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn").lower()
+
+
+class KeywordMatcher:
+    """Autómata Aho-Corasick sobre todas las listas de KEYWORD_SETS."""
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+        outputs: List[set] = [set()]
+
+        for category, keywords in keyword_sets.items():
+            for keyword in keywords:
+                node = 0
+                for char in normalize(keyword):
+                    next_node = self._goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(self._goto)
+                        self._goto[node][char] = next_node
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    node = next_node
+                outputs[node].add(category)
+
+        # Enlaces de fallo por BFS; cada nodo hereda las categorías de su sufijo más largo
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                outputs[child] |= outputs[self._fail[child]]
+
+        self._output = [frozenset(categories) for categories in outputs]
+
+    def match_normalized(self, text: str) -> FrozenSet[str]:
+        """Categorías presentes en un texto ya normalizado (una sola pasada)."""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        found = set()
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found |= output[node]
+        return frozenset(found)
+
+    def match(self, text: str) -> FrozenSet[str]:
+        return self.match_normalized(normalize(text))
+
+
+keyword_matcher = KeywordMatcher(KEYWORD_SETS)
+
+
+@lru_cache(maxsize=512)
+def match_message(message: str) -> FrozenSet[str]:
+    """
+    Categorías del mensaje. Cacheado por texto: router, stream_chat y AmbiguityHandler
+    consultan el mismo mensaje y solo el primero lo normaliza y recorre.
+    """
+    return keyword_matcher.match(message)
@@ -0,0 +1,253 @@
+import json
+import logging
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from google.cloud import firestore
+
+logger = logging.getLogger(__name__)
+
+# Valor de chat_sessions/{id}.storage_layout para sesiones paginadas
+PAGED_LAYOUT = "pages"
+# Bytes estimados por mensaje además del contenido (order, type, timestamp y claves)
+RECORD_OVERHEAD_BYTES = 100
+
+
+class MessagePageStore:
+    """
+    Almacenamiento paginado del historial de chat.
+
+    Los mensajes se empaquetan en documentos:
+        chat_sessions/{id}/message_pages/{página:06d}
+            page: int
+            messages: [{order, type, content, timestamp}, ...]
+
+    Una página se cierra al llegar a page_size mensajes o a max_page_bytes (muy por
+    debajo del límite de 1 MiB por documento, para dejar margen a ediciones en el
+    lugar). Los límites de página se guardan en la sesión:
+        chat_sessions/{id}.page_starts: [order inicial de cada página]
+        chat_sessions/{id}.last_page_bytes: bytes estimados de la última página
+    así cualquier rango de orders se resuelve con un get_all de las páginas que lo
+    cubren (sin queries). Las sesiones paginadas se marcan con storage_layout = "pages";
+    las que no tienen page_starts usan páginas de page_size mensajes.
+    """
+
+    def __init__(self, db, page_size: int, max_page_bytes: int):
+        self.db = db
+        self.page_size = page_size
+        self.max_page_bytes = max_page_bytes
+        self.subcollection = "message_pages"
+
+    @staticmethod
+    def is_paged(session_data: dict) -> bool:
+        return session_data.get("storage_layout") == PAGED_LAYOUT
+
+    def page_starts(self, session_data: dict) -> List[int]:
+        """Order inicial de cada página de la sesión."""
+        starts = session_data.get("page_starts")
+        if starts is not None:
+            return list(starts)
+        # Sesiones paginadas antes de page_starts: páginas de page_size mensajes
+        return list(range(0, session_data.get("next_order") or 0, self.page_size))
+
+    @staticmethod
+    def page_for_order(page_starts: List[int], order: int) -> int:
+        return max(bisect_right(page_starts, order) - 1, 0)
+
+    def page_ref(self, session_ref, page_index: int):
+        return session_ref.collection(self.subcollection).document(f"{page_index:06d}")
+
+    @staticmethod
+    def record_size(record: dict) -> int:
+        content = record.get("content")
+        if isinstance(content, str):
+            size = len(content.encode("utf-8"))
+        else:
+            size = len(json.dumps(content, default=str).encode("utf-8"))
+        return size + RECORD_OVERHEAD_BYTES
+
+    def plan_pages(self, records: List[dict], page_starts: List[int],
+                   last_page_bytes: int) -> Tuple[Dict[int, List[dict]], List[int], int]:
+        """
+        Asigna página a cada registro (orders consecutivos, continuando la última página).
+
+        Returns:
+            ({página: registros}, page_starts actualizado, bytes de la última página)
+        """
+        starts = list(page_starts)
+        pages: Dict[int, List[dict]] = {}
+        for record in records:
+            size = self.record_size(record)
+            order = record["order"]
+            if not starts or order - starts[-1] >= self.page_size or \
+                    (order > starts[-1] and last_page_bytes + size > self.max_page_bytes):
+                starts.append(order)
+                last_page_bytes = 0
+            last_page_bytes += size
+            pages.setdefault(len(starts) - 1, []).append(record)
+        return pages, starts, last_page_bytes
+
+    def layout_fields(self, page_starts: List[int], last_page_bytes: int) -> dict:
+        """Campos de chat_sessions/{id} que describen los límites de página."""
+        return {"page_starts": page_starts, "last_page_bytes": last_page_bytes}
+
+    # ---------- Lectura ----------
+
+    def read_range(self, session_ref, session_data: dict, start_order: int, end_order: int) -> List[dict]:
+        """Mensajes con start_order <= order < end_order, ordenados."""
+        if end_order <= start_order:
+            return []
+        starts = self.page_starts(session_data)
+        refs = [
+            self.page_ref(session_ref, page)
+            for page in range(self.page_for_order(starts, start_order), self.page_for_order(starts, end_order - 1) + 1)
+        ]
+        records = []
+        for snapshot in self.db.get_all(refs):
+            if not snapshot.exists:
+                continue
+            for message in (snapshot.to_dict() or {}).get("messages", []):
+                order = message.get("order")
+                if order is not None and start_order <= order < end_order:
+                    records.append(message)
+        records.sort(key=lambda r: r["order"])
+        return records
+
+    # ---------- Escritura ----------
+
+    def add_append_writes(self, transaction, session_ref, session_data: dict, records: List[dict]) -> dict:
+        """
+        Agrega a la transacción los mensajes nuevos (ya con order asignado).
+        ArrayUnion permite anexar sin leer la página. Retorna los campos de layout
+        que el llamador debe escribir en la sesión dentro de la misma transacción.
+        """
+        starts = self.page_starts(session_data)
+        last_page_bytes = session_data.get("last_page_bytes")
+        if last_page_bytes is None and starts:
+            # Sesión sin contador de bytes: se mide la última página una vez
+            snapshot = self.page_ref(session_ref, len(starts) - 1).get(transaction=transaction)
+            stored = (snapshot.to_dict() or {}).get("messages", []) if snapshot.exists else []
+            last_page_bytes = sum(self.record_size(message) for message in stored)
+
+        pages, starts, last_page_bytes = self.plan_pages(records, starts, last_page_bytes or 0)
+        for page, page_records in pages.items():
+            transaction.set(self.page_ref(session_ref, page), {
+                "page": page,
+                "messages": firestore.ArrayUnion(page_records),
+                "updated_at": firestore.SERVER_TIMESTAMP
+            }, merge=True)
+        return self.layout_fields(starts, last_page_bytes)
+
+    def build_rewrite_operations(self, session_ref, records: List[dict]) -> Tuple[List[tuple], dict]:
+        """
+        Operaciones (tipo, referencia, datos) para dejar las páginas iguales a `records`
+        (orders 0..n-1) y campos de layout de la sesión. Solo reescribe las páginas que
+        cambian y borra las sobrantes. Los registros sin timestamp conservan el del
+        mensaje guardado en el mismo order (mismo tipo); si no hay, usan la hora actual.
+        """
+        existing = {}
+        stored_timestamps = {}
+        for snapshot in session_ref.collection(self.subcollection).stream():
+            messages = (snapshot.to_dict() or {}).get("messages", [])
+            existing[snapshot.id] = messages
+            for message in messages:
+                stored_timestamps[message.get("order")] = (message.get("type"), message.get("timestamp"))
+
+        now = datetime.now(timezone.utc)
+        for record in records:
+            if record.get("timestamp") is None:
+                stored_type, stored_timestamp = stored_timestamps.get(record["order"], (None, None))
+                record["timestamp"] = stored_timestamp if stored_type == record["type"] and stored_timestamp else now
+
+        pages, starts, last_page_bytes = self.plan_pages(records, [], 0)
+        operations = []
+        for page, page_records in pages.items():
+            ref = self.page_ref(session_ref, page)
+            stored = existing.pop(ref.id, None)
+            if stored is not None and [(m.get("order"), m.get("type"), m.get("content")) for m in stored] == \
+                    [(r["order"], r["type"], r["content"]) for r in page_records]:
+                continue
+            operations.append(("set", ref, {
+                "page": page,
+                "messages": page_records,
+                "updated_at": firestore.SERVER_TIMESTAMP
+            }))
+
+        for page_id in existing:
+            operations.append(("delete", session_ref.collection(self.subcollection).document(page_id), None))
+        return operations, self.layout_fields(starts, last_page_bytes)
+
+    def replace_ai_message(self, session_ref, session_data: dict, new_content: str,
+                           message_order: Optional[int] = None) -> Optional[int]:
+        """
+        Reemplaza el contenido de un mensaje AI: el de message_order (o message_order - 1)
+        si es AI; si no, el último AI de la sesión. Retorna el order reemplazado.
+        """
+        next_order = session_data.get("next_order") or 0
+        starts = self.page_starts(session_data)
+        last_page = max(len(starts) - 1, 0)
+        candidates = []
+        if message_order is not None:
+            candidates = [message_order, message_order - 1]
+
+        @firestore.transactional
+        def replace_in_page(transaction, page: int, target_order: Optional[int]) -> Optional[int]:
+            page_ref = self.page_ref(session_ref, page)
+            snapshot = page_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            messages = list((snapshot.to_dict() or {}).get("messages", []))
+            for i in range(len(messages) - 1, -1, -1):
+                message = messages[i]
+                if message.get("type") != "ai":
+                    continue
+                if target_order is not None and message.get("order") != target_order:
+                    continue
+                replacement = {**message, "content": new_content}
+                delta = self.record_size(replacement) - self.record_size(message)
+                page_bytes = sum(self.record_size(m) for m in messages) + delta
+                if page_bytes > self.max_page_bytes:
+                    logger.warning(f"⚠️ [HISTORY] Page {page_ref.id} of {session_ref.id} exceeds the page budget after edit ({page_bytes} bytes)")
+                messages[i] = replacement
+                transaction.update(page_ref, {"messages": messages, "updated_at": firestore.SERVER_TIMESTAMP})
+                if page == last_page and session_data.get("last_page_bytes") is not None:
+                    transaction.set(session_ref, {"last_page_bytes": firestore.Increment(delta)}, merge=True)
+                return message.get("order")
+            return None
+
+        for target_order in candidates:
+            if 0 <= target_order < next_order:
+                replaced = replace_in_page(self.db.transaction(), self.page_for_order(starts, target_order), target_order)
+                if replaced is not None:
+                    return replaced
+
+        # Último mensaje AI: recorrer páginas desde la más reciente
+        for page in range(last_page, -1, -1):
+            replaced = replace_in_page(self.db.transaction(), page, None)
+            if replaced is not None:
+                return replaced
+        return None
+
+    # ---------- Migración ----------
+
+    def build_migration_operations(self, session_ref, records: List[dict]) -> Tuple[List[tuple], dict]:
+        """
+        Páginas completas para una sesión migrada desde el layout de un documento por
+        mensaje, y campos de layout a escribir junto con storage_layout.
+        """
+        now = datetime.now(timezone.utc)
+        normalized = [
+            {
+                "order": order,
+                "type": record["type"],
+                "content": record["content"],
+                "timestamp": record.get("timestamp") or now
+            }
+            for order, record in enumerate(records)
+        ]
+        pages, starts, last_page_bytes = self.plan_pages(normalized, [], 0)
+        operations = [
+            ("set", self.page_ref(session_ref, page), {"page": page, "messages": page_records, "updated_at": now})
+            for page, page_records in pages.items()
+        ]
+        return operations, self.layout_fields(starts, last_page_bytes)
@@ -9,11 +9,13 @@ Query Enrichment: Construye queries genéricas enfocadas en la conducta
 laboral para encontrar los protocolos pertinentes.
 """
 
+import asyncio
 import logging
 from typing import List, Dict, Optional
 from google.cloud import discoveryengine_v1beta
 from google.api_core.client_options import ClientOptions
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -182,9 +184,12 @@ class ReglamentoSearchService:
             }
             
             response = None
+            # client.search es bloqueante: se ejecuta fuera del event loop para que las
+            # búsquedas en paralelo (gather, prefetch de stream_chat) no se serialicen
+            loop = asyncio.get_running_loop()
             try:
                 # Intentar búsqueda Enterprise
-                response = client.search(enterprise_request)
+                response = await loop.run_in_executor(None, client.search, enterprise_request)
             except Exception as e:
                 # Si falla (ej: 400 por ser motor Standard), intentar búsqueda Standard
                 error_msg = str(e).lower()
@@ -203,7 +208,7 @@ class ReglamentoSearchService:
                             }
                         }
                     }
-                    response = client.search(standard_request)
+                    response = await loop.run_in_executor(None, client.search, standard_request)
                 else:
                     raise e
 
@@ -338,15 +343,13 @@ class ReglamentoSearchService:
         - Preserva términos importantes
         - Combina inteligentemente con contexto
         """
-        from langchain_google_vertexai import ChatVertexAI
         from langchain_core.messages import HumanMessage, SystemMessage
         
         # LLM rápido para extracción
-        llm = ChatVertexAI(
+        llm = llm_registry.get(
             model_name=settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp",
             temperature=0.1,
             max_output_tokens=100,
-            project=settings.PROJECT_ID,
             location=self.location
         )
         
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict
+from app.core.config import get_settings
+from app.schemas.user import Usuario, Colegio
+from app.services.chat.history_service import history_service
+from app.services.storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ChatRequestContext(BaseModel):
+    """
+    Contexto inmutable de una request de chat, resuelto una sola vez antes de
+    llamar al LLM y reutilizado por todas las rutas de stream_chat.
+    """
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    session_id: str
+    user_id: Optional[str] = None
+    user: Optional[Usuario] = None
+    school: Optional[Colegio] = None
+    schools: Tuple[Colegio, ...] = ()
+    bucket_name: str
+    data_store_id: Optional[str] = None
+    search_app_id: Optional[str] = None
+    user_email: Optional[str] = None
+    limit_error: Optional[str] = None  # Mensaje de LimitExceededException si la request debe bloquearse
+    history: Tuple[Any, ...] = ()  # BaseMessage (inmutable: copiar con list() antes de modificar)
+
+    @property
+    def is_over_limit(self) -> bool:
+        return self.limit_error is not None
+
+    @property
+    def user_context(self) -> Optional[dict]:
+        """Datos del usuario usados para personalizar prompts (SIMPLE_QA, CASE_CREATION)."""
+        if not self.user:
+            return None
+        return {
+            "nombre": self.user.nombre,
+            "rol": self.user.rol,
+            "correo": self.user.correo
+        }
+
+
+class ChatRequestContextBuilder:
+    """
+    Resuelve en paralelo (fuera del event loop) las lecturas previas al LLM:
+    metadatos de sesión, usuario, colegios, límites de tokens e historial.
+
+    Dependencias:
+        1. user_id (de la request o de los metadatos de la sesión)
+        2. documento del usuario
+        3. colegios + historial en paralelo (el bucket se deriva del id del colegio)
+        4. veredicto de límites evaluado en memoria sobre los documentos ya cargados
+    """
+
+    def __init__(self):
+        self.default_bucket = f"{settings.PROJECT_ID}-chat-sessions"
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _resolve_user_id(self, session_id: str) -> Optional[str]:
+        # FALLBACK: Si user_id no viene en la request, intentar recuperarlo de los metadatos de la sesión
+        try:
+            metadata = await history_service.get_session_metadata(session_id)
+            if metadata and metadata.get("user_id"):
+                logger.info(f"♻️ [CONTEXT] Recovered user_id {metadata.get('user_id')} from session metadata")
+                return metadata.get("user_id")
+            logger.warning(f"⚠️ [CONTEXT] No user_id provided AND no metadata found for session {session_id}. Potentially falling back to Global Data Store.")
+        except Exception as e:
+            logger.warning(f"⚠️ [CONTEXT] Failed to recover user_id from metadata: {e}")
+        return None
+
+    async def _get_user(self, user_id: str) -> Optional[Usuario]:
+        from app.services.users.user_service import user_service
+        try:
+            return await self._run(user_service.get_user_by_id, user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ [CONTEXT] Error loading user {user_id}: {e}")
+            return None
+
+    async def _get_schools(self, school_ids: List[str]) -> List[Colegio]:
+        from app.services.school_service import school_service
+        if not school_ids:
+            return []
+        results = await asyncio.gather(
+            *[self._run(school_service.get_colegio_by_id, school_id) for school_id in school_ids],
+            return_exceptions=True
+        )
+        schools = []
+        for school_id, result in zip(school_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ [CONTEXT] Error loading school {school_id}: {result}")
+            elif result:
+                schools.append(result)
+        return schools
+
+    def _evaluate_limits(self, user: Optional[Usuario], schools: List[Colegio]) -> Optional[str]:
+        from app.services.token_service import token_service, LimitExceededException
+        try:
+            token_service.evaluate_limits(user, schools)
+        except LimitExceededException as e:
+            return e.message
+        except Exception as e:
+            logger.error(f"⚠️ [LIMIT] Error checking token limits (falling open): {e}")
+        return None
+
+    async def build(self, session_id: str, user_id: Optional[str] = None) -> ChatRequestContext:
+        start = time.perf_counter()
+
+        if not user_id and session_id:
+            user_id = await self._resolve_user_id(session_id)
+
+        user = await self._get_user(user_id) if user_id else None
+
+        current_bucket = self.default_bucket
+        school_ids = list(user.colegios) if user and user.colegios else []
+        if school_ids:
+            current_bucket = storage_service.get_school_bucket_name(school_ids[0])
+
+        schools, history = await asyncio.gather(
+            self._get_schools(school_ids),
+            history_service.load_windowed_history(session_id, current_bucket)
+        )
+
+        # El colegio principal (colegios[0]) define Data Store y Search App
+        school = next((s for s in schools if s.id == school_ids[0]), None) if school_ids else None
+
+        context = ChatRequestContext(
+            session_id=session_id,
+            user_id=user_id,
+            user=user,
+            school=school,
+            schools=tuple(schools),
+            bucket_name=current_bucket,
+            data_store_id=school.data_store_id if school else None,
+            search_app_id=school.search_app_id if school else None,
+            user_email=user.correo if user else None,
+            limit_error=self._evaluate_limits(user, schools) if user else None,
+            history=tuple(history or [])
+        )
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"⚡ [CONTEXT] Request context resolved in {elapsed_ms:.0f}ms | Bucket: {current_bucket} | Data Store: {context.data_store_id} | History: {len(context.history)} msgs")
+        return context
+
+
+request_context_builder = ChatRequestContextBuilder()
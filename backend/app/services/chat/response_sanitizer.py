@@ -1,9 +1,17 @@
 import re
 import logging
+from functools import lru_cache
 from typing import Dict, Tuple, List, Optional
 
 logger = logging.getLogger(__name__)
 
+WHITESPACE_RE = re.compile(r'\s+')
+ORPHAN_COLON_RE = re.compile(r':\s*\n')
+EXTRA_NEWLINES_RE = re.compile(r'\n\s*\n\s*\n')
+FILE_SUFFIX_RE = re.compile(r'[_-](pdf|docx|jpg|png|xlsx)', re.IGNORECASE)
+FILE_REFERENCE_RE = re.compile(r'\b([a-zA-Z0-9_-]+\.(?:pdf|docx|doc|xlsx|xls|jpg|jpeg|png|txt))\b', re.IGNORECASE)
+ID_CHAR_RE = re.compile(r'[\w-]')
+
 
 class ResponseSanitizer:
     """
@@ -29,6 +37,10 @@ class ResponseSanitizer:
         'doc_id_parens': r'\(ID:\s*([a-zA-Z0-9_-]+)\)',
     }
     
+    # Characters held back at the end of a streamed buffer: enough for the longest
+    # prefix ("id del caso: ", "(ID: ", "para el caso ") before the ID itself
+    STREAM_LOOKBEHIND = 32
+    
     def __init__(self):
         self.replacements = {
             'case_id': '[CASO]',
@@ -38,6 +50,22 @@ class ResponseSanitizer:
             'generic': '[REF]'
         }
     
+    def stream(
+        self,
+        case_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        preserve_document_names: bool = True
+    ) -> "StreamingSanitizer":
+        """
+        Creates an incremental sanitizer for streamed responses (one per response).
+        
+        Usage:
+            id_filter = response_sanitizer.stream(case_id, session_id)
+            for chunk in chunks: yield id_filter.feed(chunk)
+            yield id_filter.flush()
+        """
+        return StreamingSanitizer(self, case_id, session_id, preserve_document_names)
+    
     def sanitize(
         self, 
         text: str, 
@@ -57,82 +85,24 @@ class ResponseSanitizer:
         Returns:
             Tuple of (sanitized_text, metadata_dict)
         """
-        sanitized = text
+        # 1-3. Same single-pass ID removal used for streamed responses
+        id_filter = self.stream(case_id, session_id, preserve_document_names)
+        sanitized = id_filter.feed(text) + id_filter.flush()
         metadata = {
-            'extracted_ids': [],
+            'extracted_ids': id_filter.extracted_ids,
             'case_id': case_id,
             'session_id': session_id
         }
         
-        # 1. Remove specific known IDs first
-        if case_id:
-            # Replace exact case_id matches
-            sanitized = sanitized.replace(case_id, self.replacements['case_id'])
-            
-            # Also remove case_id from common phrases
-            sanitized = re.sub(
-                f'(?:para el caso|del caso|case)\\s+{re.escape(case_id)}',
-                'de este caso',
-                sanitized,
-                flags=re.IGNORECASE
-            )
-        
-        if session_id:
-            sanitized = sanitized.replace(session_id, self.replacements['session_id'])
-        
-        # 2. Remove ID patterns from text
-        # Remove "ID: abc123xyz" patterns
-        sanitized = re.sub(
-            self.PATTERNS['doc_id_parens'],
-            '',
-            sanitized
-        )
-        
-        # Remove "ID del caso: xyz" or "case_id: xyz" patterns
-        def replace_case_id_match(match):
-            metadata['extracted_ids'].append(match.group(1))
-            return ''
-        
-        sanitized = re.sub(
-            self.PATTERNS['case_id_prefix'],
-            replace_case_id_match,
-            sanitized,
-            flags=re.IGNORECASE
-        )
-        
-        # 3. Remove standalone Firestore IDs (20+ char alphanumeric strings)
-        # But preserve document names like "protocolo_bullying_2024.pdf"
-        if preserve_document_names:
-            # Only remove IDs that don't have file extensions
-            def replace_firestore_id(match):
-                id_string = match.group(0)
-                # Check if it's likely a filename (has dots or common file patterns)
-                if '.' in id_string or re.search(r'[_-](pdf|docx|jpg|png|xlsx)', id_string, re.IGNORECASE):
-                    return id_string
-                metadata['extracted_ids'].append(id_string)
-                return self.replacements['firestore_id']
-            
-            sanitized = re.sub(
-                self.PATTERNS['firestore_id'],
-                replace_firestore_id,
-                sanitized
-            )
-        else:
-            sanitized = re.sub(
-                self.PATTERNS['firestore_id'],
-                self.replacements['firestore_id'],
-                sanitized
-            )
-        
         # 4. Clean up any resulting formatting issues
         # Remove double spaces
-        sanitized = re.sub(r'\s+', ' ', sanitized)
+        sanitized = WHITESPACE_RE.sub(' ', sanitized)
         
         # Remove orphaned colons
-        sanitized = re.sub(r':\s*\n', '\n', sanitized)
+        sanitized = ORPHAN_COLON_RE.sub('\n', sanitized)
         
         # Clean up multiple newlines
-        sanitized = re.sub(r'\n\s*\n\s*\n', '\n\n', sanitized)
+        sanitized = EXTRA_NEWLINES_RE.sub('\n\n', sanitized)
         
         logger.debug(f"🧹 Sanitized response: removed {len(metadata['extracted_ids'])} IDs")
         
@@ -148,8 +118,7 @@ class ResponseSanitizer:
         file_refs = []
         
         # Match common file patterns
-        file_pattern = r'\b([a-zA-Z0-9_-]+\.(?:pdf|docx|doc|xlsx|xls|jpg|jpeg|png|txt))\b'
-        matches = re.finditer(file_pattern, text, re.IGNORECASE)
+        matches = FILE_REFERENCE_RE.finditer(text)
         
         for match in matches:
             filename = match.group(1)
@@ -232,5 +201,123 @@ class ResponseSanitizer:
         return metadata
 
 
+@lru_cache(maxsize=256)
+def _id_pattern(case_id: Optional[str], session_id: Optional[str]) -> "re.Pattern":
+    """
+    All ID patterns as one compiled alternation (cached per case/session), so a text is
+    scanned once. Earlier alternatives win when several match at the same position.
+    """
+    patterns = ResponseSanitizer.PATTERNS
+    alternatives = []
+    if case_id:
+        case = re.escape(case_id)
+        alternatives.append(f'(?P<case_phrase>(?i:(?:para el caso|del caso|case)\\s+{case}))')
+        alternatives.append(f'(?P<case_id>{case})')
+    if session_id:
+        alternatives.append(f'(?P<session_id>{re.escape(session_id)})')
+    alternatives.append(f"(?P<doc_id_parens>{patterns['doc_id_parens']})")
+    alternatives.append(f"(?P<case_id_prefix>(?i:{patterns['case_id_prefix']}))")
+    alternatives.append(f"(?P<firestore_id>{patterns['firestore_id']})")
+    return re.compile('|'.join(alternatives))
+
+
+class StreamingSanitizer:
+    """
+    Incremental version of ResponseSanitizer.sanitize for streamed responses.
+    
+    Each chunk is appended to a small buffer and everything that can no longer become
+    part of an ID is released right away. Only the tail is held back: the trailing
+    run of ID characters (an ID still being written) plus STREAM_LOOKBEHIND characters
+    for its prefix. Released text is never scanned again.
+    
+    Unlike sanitize(), whitespace is left untouched so streamed markdown keeps its layout.
+    """
+    
+    def __init__(
+        self,
+        sanitizer: ResponseSanitizer,
+        case_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        preserve_document_names: bool = True
+    ):
+        self.sanitizer = sanitizer
+        self.preserve_document_names = preserve_document_names
+        self.pattern = _id_pattern(case_id or None, session_id or None)
+        self.lookbehind = sanitizer.STREAM_LOOKBEHIND + max(len(case_id or ''), len(session_id or ''))
+        self.extracted_ids: List[str] = []
+        self._buffer = ""
+    
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk and returns the sanitized text that is safe to emit (may be empty)."""
+        if not chunk:
+            return ""
+        self._buffer += chunk
+        return self._release(self._safe_cut())
+    
+    def flush(self) -> str:
+        """Returns the sanitized remainder at the end of the stream."""
+        return self._release(len(self._buffer))
+    
+    def _safe_cut(self) -> int:
+        buffer = self._buffer
+        cut = len(buffer)
+        # Trailing run of ID characters: it may still grow
+        while cut > 0 and ID_CHAR_RE.match(buffer[cut - 1]):
+            cut -= 1
+        cut -= self.lookbehind
+        # Never split a word: the remainder must start on a word boundary
+        while cut > 0 and ID_CHAR_RE.match(buffer[cut - 1]) and ID_CHAR_RE.match(buffer[cut]):
+            cut -= 1
+        return max(cut, 0)
+    
+    def _release(self, cut: int) -> str:
+        buffer = self._buffer
+        if cut <= 0:
+            return ""
+        released = []
+        position = 0
+        for match in self.pattern.finditer(buffer):
+            if match.start() >= cut:
+                break
+            if match.end() > cut:
+                # Match still open at the cut: keep it whole for the next chunk
+                cut = match.start()
+                break
+            released.append(buffer[position:match.start()])
+            released.append(self._replacement(match))
+            position = match.end()
+        released.append(buffer[position:cut])
+        self._buffer = buffer[cut:]
+        return ''.join(released)
+    
+    def _replacement(self, match: "re.Match") -> str:
+        replacements = self.sanitizer.replacements
+        kind = match.lastgroup
+        if kind == 'case_phrase':
+            return 'de este caso'
+        if kind == 'case_id':
+            return replacements['case_id']
+        if kind == 'session_id':
+            return replacements['session_id']
+        if kind == 'doc_id_parens':
+            return ''
+        if kind == 'case_id_prefix':
+            # Inner capture group of PATTERNS['case_id_prefix'] (the ID itself)
+            self.extracted_ids.append(match.group(self.pattern.groupindex['case_id_prefix'] + 1))
+            return ''
+        
+        # Standalone Firestore IDs (20+ char alphanumeric strings)
+        id_string = match.group(0)
+        if self.preserve_document_names:
+            # Check if it's likely a filename (has dots or common file patterns)
+            if '.' in id_string or FILE_SUFFIX_RE.search(id_string):
+                return id_string
+        # Long plain words ("desproporcionadamente") are not IDs
+        if id_string.isalpha() and id_string[1:].islower():
+            return id_string
+        self.extracted_ids.append(id_string)
+        return replacements['firestore_id']
+
+
 # Singleton instance
 response_sanitizer = ResponseSanitizer()
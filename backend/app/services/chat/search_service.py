@@ -5,6 +5,7 @@ from google.cloud.discoveryengine import SearchServiceClient, DocumentServiceCli
 from google.api_core.client_options import ClientOptions
 from langchain_core.tools import tool
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 from app.core.context import current_school_id, current_data_store_id
 
 
@@ -22,14 +23,11 @@ class SearchService:
     def llm(self):
         """Lazy-loaded Flash LLM for query enrichment"""
         if self._llm is None:
-            from langchain_google_vertexai import ChatVertexAI
             model_name = settings.VERTEX_MODEL_FLASH or "gemini-2.0-flash-exp"
             logger.info(f"🤖 [SEARCH] Initializing Flash LLM for query enrichment: {model_name}")
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.3,  # Low temp for consistent reformulation
-                project=settings.PROJECT_ID,
-                location=settings.VERTEX_LOCATION or "us-central1"
+                temperature=0.3  # Low temp for consistent reformulation
             )
         return self._llm
     
@@ -13,9 +13,9 @@ Casos de uso:
 
 import logging
 from typing import List, Optional
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -43,11 +43,9 @@ class SimpleQAService:
             model_name = settings.VERTEX_MODEL_FLASH or "gemini-2.5-flash-lite"
             logger.info(f"🤖 [SIMPLE_QA] Initializing Flash LLM: {model_name}")
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.5,  # Moderada - respuestas consistentes pero naturales
-                project=settings.PROJECT_ID,
-                location=self.model_location
+                temperature=0.5  # Moderada - respuestas consistentes pero naturales
             )
         return self._llm
     
@@ -57,12 +55,14 @@ class SimpleQAService:
         school_name: str, # Mantenemos nombre variable por compatibilidad (es Company Name)
         history: List,
         user_context: Optional[dict] = None,
-        search_app_id: Optional[str] = None  # ← NUEVO: ID de app de búsqueda para RAG lite
+        search_app_id: Optional[str] = None,  # ← NUEVO: ID de app de búsqueda para RAG lite
+        search_results: Optional[dict] = None  # Resultado ya obtenido de search_general_info (prefetch)
     ) -> str:
         """
         Responde una pregunta simple de forma rápida.
         
         NUEVO: Si se proporciona search_app_id, busca contexto relevante antes de responder (RAG Lite).
+        Si llega search_results (búsqueda lanzada en paralelo con la clasificación), no se repite.
         """
         logger.info(f"❓ [SIMPLE_QA] Processing question: {message[:50]}...")
         
@@ -73,10 +73,11 @@ class SimpleQAService:
                 try:
                     from app.services.chat.reglamento_search_service import reglamento_search_service
                     
-                    search_results = await reglamento_search_service.search_general_info(
-                        query=message,
-                        company_search_app_id=search_app_id
-                    )
+                    if search_results is None:
+                        search_results = await reglamento_search_service.search_general_info(
+                            query=message,
+                            company_search_app_id=search_app_id
+                        )
                     
                     # Formatear resultados para el prompt
                     if search_results.get("reglamento_results") or search_results.get("ley_karin_results"):
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativePrefetch:
+    """
+    Lecturas especulativas de una request de chat.
+
+    stream_chat lanza aquí, junto con la clasificación de intención, las lecturas
+    que probablemente necesitará la ruta elegida (contexto del caso, búsqueda en el
+    reglamento, documentos del caso). Cuando se conoce la intención, `keep` cancela
+    las que no se van a usar y cada ruta recoge su resultado con `get`.
+
+    Los errores de una lectura no se propagan: `get` recurre a la lectura normal de la ruta.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._started_at: Dict[str, float] = {}
+
+    def start(self, key: str, awaitable: Awaitable) -> None:
+        if not self.enabled or key in self._tasks:
+            # Evitar "coroutine was never awaited" si no se lanza
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            return
+        self._tasks[key] = asyncio.ensure_future(awaitable)
+        self._started_at[key] = time.perf_counter()
+
+    async def get(self, key: str, loader: Optional[Callable[[], Awaitable]] = None) -> Any:
+        """
+        Resultado de la lectura `key`. Si no se lanzó, se canceló o falló, usa
+        `loader` (la lectura normal de la ruta) o devuelve None.
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            try:
+                result = await task
+                elapsed = (time.perf_counter() - self._started_at[key]) * 1000
+                logger.info(f"⚡ [PREFETCH] '{key}' ready ({elapsed:.0f}ms since start)")
+                return result
+            except asyncio.CancelledError:
+                # Solo se absorbe la cancelación de la lectura, no la de la request
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                logger.warning(f"⚠️ [PREFETCH] '{key}' failed, falling back to direct load: {e}")
+        return await loader() if loader else None
+
+    def keep(self, keys: Iterable[Optional[str]]) -> None:
+        """Cancela las lecturas que no están en `keys`."""
+        wanted = {key for key in keys if key}
+        cancelled = []
+        for key, task in self._tasks.items():
+            if key not in wanted and not task.done():
+                task.cancel()
+                cancelled.append(key)
+        if cancelled:
+            logger.info(f"🗑️ [PREFETCH] Cancelled unused prefetches: {cancelled}")
+
+    def cancel_all(self) -> None:
+        self.keep(())
@@ -10,10 +10,10 @@ NO usa ReAct Agent - extrae parámetros directamente con structured output.
 import asyncio
 import logging
 from typing import Dict, List, Optional
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage
 from pydantic import BaseModel, Field
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -41,12 +41,10 @@ class ToolOrchestrator:
             model_name = settings.VERTEX_MODEL_FLASH or "gemini-2.5-flash-lite"
             logger.info(f"🤖 [TOOL_ORCH] Initializing LLM: {model_name}")
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
                 temperature=0.3,  # Baja para consistencia
-                max_output_tokens=1024,
-                project=settings.PROJECT_ID,
-                location=self.model_location
+                max_output_tokens=1024
             )
         return self._llm
     
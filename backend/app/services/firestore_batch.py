@@ -0,0 +1,43 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Documentos por llamada a get_all (BatchGetDocuments); listas más largas se parten en varias
+GET_ALL_CHUNK_SIZE = 300
+
+
+def get_documents(
+    db,
+    collection_name: str,
+    document_ids: Iterable[str],
+    field_paths: Optional[List[str]] = None,
+    chunk_size: int = GET_ALL_CHUNK_SIZE
+) -> Dict[str, dict]:
+    """
+    Lee varios documentos de una colección por ID con get_all, en uno o pocos round trips.
+
+    Args:
+        db: Cliente de Firestore
+        collection_name: Colección de los documentos
+        document_ids: IDs a leer (se ignoran vacíos y duplicados)
+        field_paths: Máscara de campos opcional (solo se transfieren esos campos)
+        chunk_size: Máximo de documentos por llamada a get_all
+
+    Returns:
+        Dict {id: datos} con los documentos existentes, en el orden de document_ids
+    """
+    ids = list(dict.fromkeys(doc_id for doc_id in document_ids if doc_id))
+    if not ids:
+        return {}
+
+    collection = db.collection(collection_name)
+    found: Dict[str, dict] = {}
+    for start in range(0, len(ids), chunk_size):
+        refs = [collection.document(doc_id) for doc_id in ids[start:start + chunk_size]]
+        for snapshot in db.get_all(refs, field_paths=field_paths):
+            if snapshot.exists:
+                found[snapshot.id] = snapshot.to_dict() or {}
+
+    # get_all no garantiza el orden de respuesta
+    return {doc_id: found[doc_id] for doc_id in ids if doc_id in found}
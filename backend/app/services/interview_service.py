@@ -7,10 +7,11 @@ from google.cloud.firestore import FieldFilter
 from google.cloud import storage
 
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
+from app.services.token_estimator import token_estimator
 from app.schemas.interview import InterviewCreate, InterviewUpdate, Interview, InterviewStatus, Signature, Attachment
 from app.services.storage_service import storage_service
 from app.services.transcription_service import transcription_service
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage
 
 logger = logging.getLogger(__name__)
@@ -33,11 +34,9 @@ class InterviewService:
         if self._llm is None:
             model_name = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL_REASON or settings.VERTEX_MODEL
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.1,
-                project=settings.PROJECT_ID,
-                location=settings.VERTEX_LOCATION or "us-central1",
+                temperature=0.1
             )
         return self._llm
 
@@ -471,7 +470,20 @@ The JSON structure must be exactly as follows:
   "resumen_ejecutivo": "El presente resumen ejecutivo aborda... (contenido completo del resumen)"
 }
 """
+        # Pre-flight: descartar adjuntos que no caben y verificar cuota con la estimación local
+        structure_tokens = token_estimator.estimate_text(structure_instruction)
+        import asyncio
+        message_content, estimated_tokens, dropped = await asyncio.to_thread(
+            token_estimator.fit_parts, message_content, token_estimator.max_request_tokens - structure_tokens, 2
+        )
+        if dropped:
+            logger.warning(f"Dropped {dropped} attachment parts from summary of interview {interview_id} to fit the context window")
         message_content.append({"type": "text", "text": structure_instruction})
+        estimated_tokens += structure_tokens
+
+        if interview.owner_id:
+            from app.services.token_service import token_service
+            token_service.check_limits(interview.owner_id, input_tokens_cost=estimated_tokens)
 
         try:
            # Invocar modelo Multimodal
@@ -531,11 +543,19 @@ The JSON structure must be exactly as follows:
         if not valid_interviews:
             return "No hay transcripciones disponibles para analizar."
 
-        # Compilar texto
+        # Compilar texto (hasta donde alcance la ventana de contexto, según la estimación local)
+        budget = token_estimator.max_request_tokens - 1000
         compiled_text = ""
+        included = 0
         for i, interview in enumerate(valid_interviews):
-            compiled_text += f"--- Entrevista {i+1} (Estudiante: {interview.student_name}, Curso: {interview.course}) ---\n"
-            compiled_text += f"{interview.transcription}\n\n"
+            block = f"--- Entrevista {i+1} (Estudiante: {interview.student_name}, Curso: {interview.course}) ---\n"
+            block += f"{interview.transcription}\n\n"
+            if included and token_estimator.estimate_text(compiled_text + block) > budget:
+                break
+            compiled_text += block
+            included += 1
+        if included < len(valid_interviews):
+            logger.warning(f"Global summary limited to {included}/{len(valid_interviews)} interviews to fit the context window")
 
         # Prompt para Gemini
         prompt = f"""Eres un Agente experto en Prevención y Ley Karin (21.643).
@@ -549,8 +569,16 @@ Genera un Resumen Ejecutivo que identifique:
 TRANSCRIPCIONES:
 {compiled_text}
 """
+        if user_id:
+            from app.services.token_service import token_service
+            token_service.check_limits(user_id, input_tokens_cost=token_estimator.estimate_text(prompt))
+
         response = await self.llm.ainvoke([HumanMessage(content=prompt)])
-        
+
+        # Calibrar la estimación local con el consumo real (prompt de solo texto)
+        if response.usage_metadata:
+            token_estimator.calibrate(len(prompt), response.usage_metadata.get('input_tokens', 0))
+
         # Track Usage
         if user_id and hasattr(response, 'usage_metadata'):
              from app.services.users.user_service import user_service
@@ -643,6 +671,9 @@ TRANSCRIPCIONES:
 
         logger.info(f"Transferring files from interview {interview_id} to case {case_id}")
 
+        # Los documentos del caso se registran juntos al final (un solo batch)
+        transferred_files = []
+
         # 1. Transferir audio principal si existe
         if interview.audio_uri:
             try:
@@ -668,7 +699,7 @@ TRANSCRIPCIONES:
                     "session_id": None
                 }
 
-                case_service.save_single_document(case_id, file_data, source="entrevista")
+                transferred_files.append(file_data)
                 logger.info(f"Audio transferred: {file_data['name']}")
             except Exception as e:
                 logger.error(f"Error transferring audio: {e}")
@@ -690,7 +721,7 @@ TRANSCRIPCIONES:
                         "session_id": None
                     }
 
-                    case_service.save_single_document(case_id, file_data, source="entrevista")
+                    transferred_files.append(file_data)
                     logger.info(f"Attachment transferred: {att.name}")
                 except Exception as e:
                     logger.error(f"Error transferring attachment {att.name}: {e}")
@@ -721,7 +752,7 @@ TRANSCRIPCIONES:
                     "session_id": None
                 }
 
-                case_service.save_single_document(case_id, file_data, source="entrevista")
+                transferred_files.append(file_data)
                 logger.info(f"Summary transferred as PDF file")
             except Exception as e:
                 logger.error(f"Error transferring summary: {e}")
@@ -769,11 +800,12 @@ TRANSCRIPCIONES:
                     "session_id": None
                 }
                 
-                case_service.save_single_document(case_id, file_data, source="entrevista")
+                transferred_files.append(file_data)
                 logger.info(f"Transcriptions compiled and transferred as PDF file")
             except Exception as e:
                 logger.error(f"Error transferring transcriptions: {e}")
 
+        case_service.save_documents(case_id, transferred_files, source="entrevista")
         logger.info(f"File transfer completed from interview {interview_id} to case {case_id}")
 
     async def _generate_transcription_summary(self, interview: Interview, transcriptions: list) -> str:
@@ -816,6 +848,8 @@ IMPORTANTE:
 RESUMEN:"""
 
             response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            if response.usage_metadata:
+                token_estimator.calibrate(len(prompt), response.usage_metadata.get('input_tokens', 0))
             
             # Track Usage
             if interview.owner_id and hasattr(response, 'usage_metadata'):
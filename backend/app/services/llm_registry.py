@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from langchain_google_vertexai import ChatVertexAI
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class LLMRegistry:
+    """
+    Registro central de clientes ChatVertexAI compartidos entre servicios.
+
+    Cada perfil (modelo, temperatura, max_output_tokens, streaming) se construye
+    una sola vez por proceso. La inicialización es perezosa y thread-safe: si dos
+    requests piden el mismo perfil en frío, solo una construye el cliente.
+    """
+
+    def __init__(self):
+        self.project_id = settings.PROJECT_ID
+        self.model_location = settings.VERTEX_LOCATION or "us-central1"
+        self._clients: Dict[Tuple, ChatVertexAI] = {}
+        self._stats: Dict[Tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def _profile_key(
+        self,
+        model_name: str,
+        temperature: float,
+        max_output_tokens: Optional[int],
+        streaming: bool,
+        max_retries: Optional[int],
+        request_timeout: Optional[int],
+        location: str
+    ) -> Tuple:
+        return (model_name, float(temperature), max_output_tokens, bool(streaming), max_retries, request_timeout, location)
+
+    def get(
+        self,
+        model_name: str,
+        temperature: float = 0.0,
+        max_output_tokens: Optional[int] = None,
+        streaming: bool = False,
+        max_retries: Optional[int] = None,
+        request_timeout: Optional[int] = None,
+        location: Optional[str] = None
+    ) -> ChatVertexAI:
+        """
+        Retorna el cliente compartido para el perfil indicado, creándolo si no existe.
+
+        Args:
+            model_name: Nombre del modelo de Vertex AI
+            temperature: Temperatura de muestreo
+            max_output_tokens: Límite de tokens de salida (None = default del modelo)
+            streaming: Si el cliente se usará con astream
+            max_retries: Reintentos del cliente (None = default de LangChain)
+            request_timeout: Timeout en segundos por request (None = default)
+            location: Región de Vertex AI (None = VERTEX_LOCATION)
+        """
+        location = location or self.model_location
+        key = self._profile_key(model_name, temperature, max_output_tokens, streaming, max_retries, request_timeout, location)
+
+        client = self._clients.get(key)
+        if client is not None:
+            with self._lock:
+                self._stats[key]["hits"] += 1
+            return client
+
+        with self._lock:
+            # Double-check: otro hilo pudo construirlo mientras esperábamos el lock
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats[key]["hits"] += 1
+                return client
+
+            start = time.perf_counter()
+            kwargs = {
+                "model_name": model_name,
+                "temperature": temperature,
+                "project": self.project_id,
+                "location": location,
+                "streaming": streaming,
+            }
+            if max_output_tokens is not None:
+                kwargs["max_output_tokens"] = max_output_tokens
+            if max_retries is not None:
+                kwargs["max_retries"] = max_retries
+            if request_timeout is not None:
+                kwargs["model_kwargs"] = {"request_timeout": request_timeout}
+
+            client = ChatVertexAI(**kwargs)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            self._stats[key] = {
+                "model": model_name,
+                "temperature": temperature,
+                "max_output_tokens": max_output_tokens,
+                "streaming": streaming,
+                "max_retries": max_retries,
+                "request_timeout": request_timeout,
+                "location": location,
+                "created_at": datetime.utcnow().isoformat(),
+                "build_ms": round(build_ms, 1),
+                "hits": 1
+            }
+            self._clients[key] = client
+            logger.info(f"🤖 [LLM_REGISTRY] Built client for {model_name} (temp={temperature}, max_out={max_output_tokens}, streaming={streaming}) in {build_ms:.0f}ms")
+            return client
+
+    def warm_up(self):
+        """Pre-construye los perfiles más usados para que la primera request no pague la inicialización."""
+        flash_model = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL or "gemini-2.0-flash-exp"
+        reason_model = settings.VERTEX_MODEL_REASON or settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL
+        profiles = [
+            {"model_name": flash_model, "temperature": 0.1, "max_output_tokens": 512},  # IntentRouter
+            {"model_name": flash_model, "temperature": 0.5},  # SimpleQAService
+            {"model_name": flash_model, "temperature": 0.7, "max_retries": 1},  # Sugerencias
+            {"model_name": reason_model, "temperature": 0.5, "streaming": True, "max_retries": 2, "request_timeout": 300},  # GeneralChatAgent
+        ]
+        for profile in profiles:
+            if not profile["model_name"]:
+                continue
+            try:
+                self.get(**profile)
+            except Exception as e:
+                logger.warning(f"⚠️ [LLM_REGISTRY] Could not warm up {profile['model_name']}: {e}")
+
+    def get_stats(self) -> List[dict]:
+        """Estadísticas por perfil: cuándo se creó, cuánto tardó y cuántas veces se reutilizó."""
+        return [dict(stats) for stats in self._stats.values()]
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,40 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """El cursor de paginación no es válido o apunta a un documento que ya no existe."""
+
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__(f"Invalid or expired cursor: {cursor}")
+
+
+def encode_cursor(sort_value: Any, doc_id: str) -> str:
+    """
+    Cursor opaco con el valor del campo de orden y el ID del último documento de la página.
+    Permite continuar con start_after por valor aunque ese documento se haya borrado.
+    """
+    if isinstance(sort_value, datetime):
+        value = {"ts": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    payload = json.dumps([value, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """(valor del campo de orden, ID del documento). Lanza InvalidCursorError si no se puede leer."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(doc_id, str) or not doc_id:
+            raise ValueError("missing document id")
+        if "ts" in value:
+            return datetime.fromisoformat(value["ts"]), doc_id
+        return value["v"], doc_id
+    except (ValueError, TypeError, KeyError, binascii.Error, UnicodeError) as e:
+        raise InvalidCursorError(cursor) from e
@@ -2,9 +2,9 @@ from typing import List, Optional
 import datetime
 import logging
 import json
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 from app.services.chat.search_service import search_service
 from app.services.chat.prompt_service import prompt_service
 
@@ -29,12 +29,10 @@ class ProtocolAgent:
         if self._llm is None:
             model_name = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL
             
-            self._llm = ChatVertexAI(
-                model=model_name,
+            self._llm = llm_registry.get(
+                model_name=model_name,
                 temperature=0.2,
-                max_output_tokens=4096,
-                project=self.project_id,
-                location=self.model_location,
+                max_output_tokens=4096
             )
         return self._llm
 
@@ -9,6 +9,7 @@ from datetime import datetime
 from google.cloud import firestore
 from app.core.config import get_settings
 from app.schemas.user import Colegio, ColegioCreate, ColegioUpdate
+from app.services.firestore_batch import get_documents
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -264,13 +265,14 @@ class SchoolService:
             return []
 
     def get_colegios_by_ids(self, colegio_ids: List[str]) -> List[Colegio]:
-        """Obtiene múltiples colegios por sus IDs"""
+        """Obtiene múltiples colegios por sus IDs (una lectura por lotes, en el orden recibido)"""
         try:
             colegios = []
-            for colegio_id in colegio_ids:
-                colegio = self.get_colegio_by_id(colegio_id)
-                if colegio:
-                    colegios.append(colegio)
+            for colegio_id, data in get_documents(self.db, self.collection_name, colegio_ids or []).items():
+                try:
+                    colegios.append(Colegio(**data))
+                except Exception as e:
+                    logger.error(f" Error parseando colegio {colegio_id}: {e}")
 
             return colegios
 
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+from google.cloud import firestore
+from google.cloud.firestore import FieldFilter
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ACTIVE_CASE_STATUSES = ["active", "abierto", "pendiente"]
+ACTIVE_COMMITMENT_STATUSES = ["vigente", "proximo_a_vencer"]
+
+
+class StatsService:
+    """
+    Estadísticas con agregaciones de Firestore (count()/sum()).
+
+    Las agregaciones se resuelven en el servidor sobre los índices: solo viaja el
+    resultado, no los documentos. Las consultas independientes de una misma
+    estadística se lanzan en paralelo en un pool acotado.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stats")
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = firestore.Client(project=settings.PROJECT_ID, database=settings.FIRESTORE_DATABASE)
+        return self._db
+
+    # ---------- Motor ----------
+
+    def query(self, collection_name: str, filters: Iterable[tuple] = ()):
+        """Query de una colección con filtros (campo, operador, valor)."""
+        query = self.db.collection(collection_name)
+        for field, op, value in filters:
+            query = query.where(filter=FieldFilter(field, op, value))
+        return query
+
+    def aggregate(self, query, sum_fields: Iterable[str] = ()) -> Dict[str, float]:
+        """
+        count() y sum() de una query en un solo round trip.
+
+        Returns:
+            {"count": n, "<campo>": suma, ...}
+        """
+        aggregation = query.count(alias="count")
+        for field in sum_fields:
+            aggregation = aggregation.sum(field, alias=field)
+        values = {}
+        for result in aggregation.get()[0]:
+            values[result.alias] = result.value or 0
+        values["count"] = int(values.get("count", 0))
+        return values
+
+    def count(self, query) -> int:
+        return self.aggregate(query)["count"]
+
+    def count_many(self, queries: Dict[str, object]) -> Dict[str, int]:
+        """Ejecuta varios count() en paralelo. Retorna {nombre: total}."""
+        futures = {name: self._executor.submit(self.count, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    # ---------- Estudiantes ----------
+
+    def get_student_stats(self, student_id: str) -> dict:
+        """
+        Casos activos/cerrados, entrevistas y compromisos activos de un estudiante.
+        Un caso sin status es activo (default de Case.status): se cuentan los cerrados
+        explícitamente (not-in excluye documentos sin el campo) y el resto son activos.
+        """
+        student = ("student_id", "==", student_id)
+        try:
+            counts = self.count_many({
+                "cases": self.query("cases", [student]),
+                "closed_cases": self.query("cases", [student, ("status", "not-in", ACTIVE_CASE_STATUSES)]),
+                "interviews": self.query("interviews", [student]),
+                "active_commitments": self.query("commitments", [student, ("status", "in", ACTIVE_COMMITMENT_STATUSES)])
+            })
+            return {
+                "casosActivos": counts["cases"] - counts["closed_cases"],
+                "casosCerrados": counts["closed_cases"],
+                "entrevistas": counts["interviews"],
+                "compromisosActivos": counts["active_commitments"]
+            }
+        except Exception as e:
+            logger.error(f"Error getting student stats: {e}")
+            return {
+                "casosActivos": 0,
+                "casosCerrados": 0,
+                "entrevistas": 0,
+                "compromisosActivos": 0
+            }
+
+    # ---------- Dashboard ----------
+
+    async def count_cases_by_day(self, colegio_id: str, start: datetime, end: datetime) -> Dict[str, int]:
+        """Casos creados por día (YYYY-MM-DD) en [start, end] para un colegio."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._count_cases_by_day_sync, colegio_id, start, end)
+
+    def _count_cases_by_day_sync(self, colegio_id: str, start: datetime, end: datetime) -> Dict[str, int]:
+        # Una query por rango sobre el índice (colegio_id, created_at) que solo trae created_at
+        school = ("colegio_id", "==", colegio_id)
+        try:
+            docs = list(self.query("cases", [
+                school, ("created_at", ">=", start), ("created_at", "<=", end)
+            ]).select(["created_at"]).stream())
+            # Casos antiguos guardan created_at como string ISO: un rango de datetime no los
+            # incluye, así que se leen también por rango de strings
+            docs += list(self.query("cases", [
+                school, ("created_at", ">=", start.isoformat()),
+                ("created_at", "<", (end + timedelta(microseconds=1)).isoformat())
+            ]).select(["created_at"]).stream())
+            return self._bucket_by_day(docs, start, end)
+        except Exception as e:
+            logger.warning(f"⚠️ [STATS] Indexed case count failed (missing index?), bucketing in memory: {e}")
+            return self._count_cases_by_day_unindexed(colegio_id, start, end)
+
+    def _count_cases_by_day_unindexed(self, colegio_id: str, start: datetime, end: datetime) -> Dict[str, int]:
+        """Sin índice compuesto: solo created_at de los casos del colegio, filtrado en memoria."""
+        query = self.query("cases", [("colegio_id", "==", colegio_id)]).select(["created_at"])
+        return self._bucket_by_day(query.stream(), start, end)
+
+    @staticmethod
+    def _bucket_by_day(docs: Iterable, start: datetime, end: datetime) -> Dict[str, int]:
+        """Cuenta por día (YYYY-MM-DD) los created_at dentro de [start, end]."""
+        counts: Dict[str, int] = {}
+        for doc in docs:
+            created_at = (doc.to_dict() or {}).get("created_at")
+            # created_at puede ser string o datetime
+            if isinstance(created_at, str):
+                try:
+                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                except ValueError:
+                    continue
+            if created_at and start <= created_at.replace(tzinfo=None) <= end:
+                date_key = created_at.strftime("%Y-%m-%d")
+                counts[date_key] = counts.get(date_key, 0) + 1
+        return counts
+
+
+# Instancia singleton
+stats_service = StatsService()
@@ -0,0 +1,187 @@
+import io
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Costos por modalidad documentados para Gemini
+PDF_TOKENS_PER_PAGE = 258  # Cada página de PDF se procesa como imagen
+IMAGE_TOKENS = 258
+AUDIO_TOKENS_PER_SECOND = 32
+
+# Heurísticas cuando no se conoce el número de páginas / la duración
+PDF_BYTES_PER_PAGE = 100 * 1024
+AUDIO_BYTES_PER_SECOND = 16 * 1024  # ~128 kbps
+
+# Sobrecosto fijo por mensaje (roles, separadores, etc.)
+MESSAGE_OVERHEAD_TOKENS = 8
+
+
+class TokenEstimator:
+    """
+    Estimación local de tokens de entrada, sin llamar a count_tokens del modelo.
+
+    - Texto: caracteres / chars-por-token. La razón parte en
+      TOKEN_ESTIMATE_CHARS_PER_TOKEN y se calibra con el usage_metadata real
+      de las llamadas de solo texto (promedio móvil).
+    - PDF: páginas * PDF_TOKENS_PER_PAGE. El upload de archivos del chat guarda
+      page_count en la metadata del blob; sin ella se estiman desde el tamaño.
+    - Audio: segundos * AUDIO_TOKENS_PER_SECOND, con la duración estimada desde el
+      tamaño (o duration_seconds si el blob lo trae en su metadata).
+
+    Se usa antes de enviar una request para verificar la cuota
+    (token_service.check_limits) y recortar entradas que no caben.
+    """
+
+    def __init__(self):
+        self.chars_per_token = settings.TOKEN_ESTIMATE_CHARS_PER_TOKEN
+        self.max_request_tokens = settings.MAX_REQUEST_INPUT_TOKENS
+        self._calibration_weight = 0.1
+        self._samples = 0
+        self._blob_cache: Dict[str, int] = {}
+        self._blob_cache_limit = 1000
+        self._lock = threading.Lock()
+
+    # ---------- Texto ----------
+
+    def estimate_text(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        return int(len(text) / self.chars_per_token) + 1
+
+    def calibrate(self, text_chars: int, actual_input_tokens: int):
+        """Ajusta chars-por-token con el consumo real de una llamada de solo texto."""
+        if text_chars < 200 or not actual_input_tokens:
+            return
+        observed = text_chars / actual_input_tokens
+        # Descartar observaciones absurdas (p.ej. usage_metadata incompleto)
+        if not 1.0 <= observed <= 8.0:
+            return
+        with self._lock:
+            self.chars_per_token += self._calibration_weight * (observed - self.chars_per_token)
+            self._samples += 1
+
+    # ---------- Archivos ----------
+
+    def estimate_pdf(self, page_count: Optional[int] = None, size_bytes: Optional[int] = None) -> int:
+        if not page_count:
+            page_count = max(1, int((size_bytes or 0) / PDF_BYTES_PER_PAGE) + 1)
+        return page_count * PDF_TOKENS_PER_PAGE
+
+    def estimate_audio(self, duration_seconds: Optional[float] = None, size_bytes: Optional[int] = None) -> int:
+        if not duration_seconds:
+            duration_seconds = (size_bytes or 0) / AUDIO_BYTES_PER_SECOND
+        return int(duration_seconds * AUDIO_TOKENS_PER_SECOND) + 1
+
+    @staticmethod
+    def count_pdf_pages(content: bytes) -> Optional[int]:
+        """Número de páginas de un PDF en memoria (None si no se puede leer)."""
+        try:
+            import pypdf
+            return len(pypdf.PdfReader(io.BytesIO(content)).pages)
+        except Exception:
+            return None
+
+    def estimate_file(
+        self,
+        mime_type: str,
+        size_bytes: Optional[int] = None,
+        page_count: Optional[int] = None,
+        duration_seconds: Optional[float] = None
+    ) -> int:
+        mime_type = mime_type or ""
+        if mime_type == "application/pdf":
+            return self.estimate_pdf(page_count, size_bytes)
+        if mime_type.startswith("audio/") or mime_type.startswith("video/"):
+            return self.estimate_audio(duration_seconds, size_bytes)
+        if mime_type.startswith("image/"):
+            return IMAGE_TOKENS
+        # Texto plano u otros: se asume ~1 byte por carácter
+        return int((size_bytes or 0) / self.chars_per_token) + 1
+
+    def estimate_blob(self, file_uri: str, mime_type: str) -> int:
+        """
+        Estima un archivo en GCS leyendo solo su metadata (sin descargarlo).
+        Usa los metadatos personalizados page_count / duration_seconds si existen.
+        Hace una llamada bloqueante a GCS: desde código async, usar asyncio.to_thread.
+        """
+        key = f"{file_uri}|{mime_type}"
+        cached = self._blob_cache.get(key)
+        if cached is not None:
+            return cached
+
+        size_bytes = None
+        page_count = None
+        duration_seconds = None
+        try:
+            from app.services.storage_service import storage_service
+            bucket_name, blob_path = file_uri.replace("gs://", "").split("/", 1)
+            blob = storage_service.client.bucket(bucket_name).blob(blob_path)
+            blob.reload()
+            size_bytes = blob.size
+            metadata = blob.metadata or {}
+            if metadata.get("page_count"):
+                page_count = int(metadata["page_count"])
+            if metadata.get("duration_seconds"):
+                duration_seconds = float(metadata["duration_seconds"])
+        except Exception as e:
+            logger.warning(f"⚠️ [TOKEN_ESTIMATOR] Could not read metadata for {file_uri}: {e}")
+
+        estimate = self.estimate_file(mime_type, size_bytes, page_count, duration_seconds)
+        with self._lock:
+            if len(self._blob_cache) >= self._blob_cache_limit:
+                self._blob_cache.clear()
+            self._blob_cache[key] = estimate
+        return estimate
+
+    # ---------- Mensajes ----------
+
+    def estimate_part(self, part) -> int:
+        """Estima una parte de contenido en formato LangChain (str, text, media, image_url)."""
+        if isinstance(part, str):
+            return self.estimate_text(part)
+        if not isinstance(part, dict):
+            return 0
+        part_type = part.get("type")
+        if part_type == "text":
+            return self.estimate_text(part.get("text"))
+        if part_type == "media":
+            file_uri = part.get("file_uri") or ""
+            if file_uri.startswith("gs://"):
+                return self.estimate_blob(file_uri, part.get("mime_type"))
+            return self.estimate_file(part.get("mime_type"))
+        if part_type == "image_url":
+            return IMAGE_TOKENS
+        return 0
+
+    def estimate_content(self, content) -> int:
+        if isinstance(content, list):
+            return sum(self.estimate_part(part) for part in content) + MESSAGE_OVERHEAD_TOKENS
+        return self.estimate_part(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def fit_parts(self, parts: List, budget: int, keep_first: int = 1) -> Tuple[List, int, int]:
+        """
+        Recorta una lista de partes para que quepa en el presupuesto.
+        Conserva siempre las primeras keep_first (instrucciones) y descarta
+        desde el final las que no caben.
+
+        Returns:
+            (partes conservadas, tokens estimados, partes descartadas)
+        """
+        kept = []
+        total = MESSAGE_OVERHEAD_TOKENS
+        dropped = 0
+        for i, part in enumerate(parts):
+            cost = self.estimate_part(part)
+            if i < keep_first or total + cost <= budget:
+                kept.append(part)
+                total += cost
+            else:
+                dropped += 1
+        return kept, total, dropped
+
+
+token_estimator = TokenEstimator()
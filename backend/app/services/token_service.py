@@ -1,9 +1,14 @@
 import logging
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.core.config import get_settings
+from app.schemas.user import Usuario, Colegio
 from app.services.users.user_service import user_service
 from app.services.school_service import school_service
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class LimitExceededException(Exception):
     def __init__(self, message: str, limit_type: str):
@@ -12,11 +17,116 @@ class LimitExceededException(Exception):
         super().__init__(self.message)
 
 class TokenService:
+    """
+    Verificación de límites de tokens con caché de cuotas en memoria.
+
+    Cada usuario/colegio se cachea con sus límites y su uso leído de Firestore
+    (TTL QUOTA_CACHE_TTL_SECONDS). El consumo registrado por el usage ledger
+    que aún no se ha persistido se suma localmente, de modo que la verificación
+    es O(1) en memoria. Cuando el uso supera QUOTA_REFRESH_RATIO del límite,
+    la entrada se relee desde Firestore en cada verificación para ser exacta.
+    """
+
+    def __init__(self):
+        self.ttl_seconds = settings.QUOTA_CACHE_TTL_SECONDS
+        self.refresh_ratio = settings.QUOTA_REFRESH_RATIO
+        self._quotas: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Caché de cuotas ----------
+
+    def _quota_from_model(self, kind: str, model, now: float) -> dict:
+        usage = model.token_usage
+        return {
+            "kind": kind,
+            "name": getattr(model, "nombre", None),
+            "colegios": list(getattr(model, "colegios", []) or []) if kind == "user" else [],
+            "has_usage": usage is not None,
+            "input_limit": model.input_token_limit,
+            "output_limit": model.output_token_limit,
+            "input_used": usage.input_tokens if usage else 0,
+            "output_used": usage.output_tokens if usage else 0,
+            "unflushed_input": 0,
+            "unflushed_output": 0,
+            "fetched_at": now
+        }
+
+    def _store(self, kind: str, model) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            key = (kind, model.id)
+            previous = self._quotas.get(key)
+            entry = self._quota_from_model(kind, model, now)
+            # El consumo pendiente de flush no está en Firestore todavía: se conserva
+            if previous:
+                entry["unflushed_input"] = previous["unflushed_input"]
+                entry["unflushed_output"] = previous["unflushed_output"]
+            self._quotas[key] = entry
+            return entry
+
+    def _is_near_limit(self, entry: dict) -> bool:
+        if entry["input_limit"]:
+            if entry["input_used"] + entry["unflushed_input"] >= entry["input_limit"] * self.refresh_ratio:
+                return True
+        if entry["output_limit"]:
+            if entry["output_used"] + entry["unflushed_output"] >= entry["output_limit"] * self.refresh_ratio:
+                return True
+        return False
+
+    def _get_quota(self, kind: str, entity_id: str) -> Optional[dict]:
+        """Retorna la cuota cacheada; la relee si expiró o si está cerca del límite."""
+        with self._lock:
+            entry = self._quotas.get((kind, entity_id))
+        if entry and time.monotonic() - entry["fetched_at"] < self.ttl_seconds and not self._is_near_limit(entry):
+            return entry
+
+        if kind == "user":
+            model = user_service.get_user_by_id(entity_id)
+        else:
+            model = school_service.get_colegio_by_id(entity_id)
+        if not model:
+            return None
+        return self._store(kind, model)
+
+    def invalidate(self, kind: str, entity_id: str):
+        """Descarta la cuota cacheada (p.ej. tras cambiar límites desde el dashboard)."""
+        with self._lock:
+            self._quotas.pop((kind, entity_id), None)
+
+    def record_usage(self, user_id: str, input_tokens: int, output_tokens: int):
+        """Suma consumo aún no persistido al usuario y a sus colegios cacheados."""
+        with self._lock:
+            user_entry = self._quotas.get(("user", user_id))
+            if not user_entry:
+                return
+            keys = [("user", user_id)] + [("school", school_id) for school_id in user_entry["colegios"]]
+            for key in keys:
+                entry = self._quotas.get(key)
+                if entry:
+                    entry["unflushed_input"] += input_tokens
+                    entry["unflushed_output"] += output_tokens
+
+    def on_usage_flushed(self, per_user: Dict[str, dict]):
+        """El usage ledger persistió este consumo: deja de contarlo como pendiente."""
+        with self._lock:
+            for user_id, totals in per_user.items():
+                user_entry = self._quotas.get(("user", user_id))
+                if not user_entry:
+                    continue
+                keys = [("user", user_id)] + [("school", school_id) for school_id in user_entry["colegios"]]
+                for key in keys:
+                    entry = self._quotas.get(key)
+                    if entry:
+                        entry["unflushed_input"] = max(0, entry["unflushed_input"] - totals["input_tokens"])
+                        entry["unflushed_output"] = max(0, entry["unflushed_output"] - totals["output_tokens"])
+
+    # ---------- Verificación ----------
+
     def check_limits(self, user_id: str, input_tokens_cost: int = 0) -> None:
         """
         Verifica si el usuario o su colegio han excedido los límites de tokens.
         Lanza LimitExceededException si se excede algún límite.
-        
+
         Args:
             user_id: ID del usuario
             input_tokens_cost: Costo estimado de tokens de entrada para esta request (opcional)
@@ -25,64 +135,82 @@ class TokenService:
             return
 
         try:
-            # 1. Obtener usuario con sus datos de uso y límites
-            user = user_service.get_user_by_id(user_id)
-            if not user:
+            # 1. Obtener cuota del usuario (caché) con sus datos de uso y límites
+            user_quota = self._get_quota("user", user_id)
+            if not user_quota:
                 return
 
-            # --- CHECK USUARIO ---
-            if user.token_usage:
-                # Input Limit
-                if user.input_token_limit is not None:
-                    current_input = user.token_usage.input_tokens
-                    if current_input + input_tokens_cost > user.input_token_limit:
-                        raise LimitExceededException(
-                            f"Has excedido tu límite mensual de tokens de entrada ({user.input_token_limit}).",
-                            "user_input"
-                        )
-                
-                # Output Limit (Solo chequeamos uso histórico, no podemos predecir output exacto)
-                # Si ya está pasado, no dejamos generar más.
-                if user.output_token_limit is not None:
-                    current_output = user.token_usage.output_tokens
-                    if current_output >= user.output_token_limit:
-                        raise LimitExceededException(
-                            f"Has excedido tu límite mensual de tokens de salida ({user.output_token_limit}).",
-                            "user_output"
-                        )
-
-            # --- CHECK COLEGIOS ---
-            # Si el usuario pertenece a colegios, verificamos los límites de CADA colegio.
-            # Basta con que UNO esté bloqueado para bloquear (o política estricta).
-            # Asumimos que el usuario consume de TODOS sus colegios asociados (aunque usualmente es 1).
-            if user.colegios:
-                for school_id in user.colegios:
-                    school = school_service.get_colegio_by_id(school_id)
-                    if school and school.token_usage:
-                        # Input Limit
-                        if school.input_token_limit is not None:
-                            current_input = school.token_usage.input_tokens
-                            if current_input + input_tokens_cost > school.input_token_limit:
-                                raise LimitExceededException(
-                                    f"El colegio {school.nombre} ha excedido su límite de tokens de entrada.",
-                                    "school_input"
-                                )
-                        
-                        # Output Limit
-                        if school.output_token_limit is not None:
-                            current_output = school.token_usage.output_tokens
-                            if current_output >= school.output_token_limit:
-                                raise LimitExceededException(
-                                    f"El colegio {school.nombre} ha excedido su límite de tokens de salida.",
-                                    "school_output"
-                                )
+            school_quotas = [self._get_quota("school", school_id) for school_id in user_quota["colegios"]]
+            self._evaluate_quotas(user_quota, school_quotas, input_tokens_cost)
 
         except LimitExceededException:
             raise
         except Exception as e:
             logger.error(f"Error checking token limits for user {user_id}: {e}")
-            # En caso de error de sistema, decidimos si bloquear o fall open. 
+            # En caso de error de sistema, decidimos si bloquear o fall open.
             # Fall open (no bloquear) es más seguro para UX a menos que sea crítico.
             pass
 
+    def evaluate_limits(self, user: Optional[Usuario], schools: List[Optional[Colegio]], input_tokens_cost: int = 0) -> None:
+        """
+        Evalúa los límites sobre un usuario y sus colegios ya cargados (sin I/O)
+        y refresca la caché de cuotas con esos documentos.
+        Lanza LimitExceededException si se excede algún límite.
+
+        Permite que quien ya tiene los documentos en memoria (p.ej. ChatRequestContext)
+        no tenga que volver a leerlos desde Firestore.
+        """
+        if not user:
+            return
+
+        user_quota = self._store("user", user)
+        school_quotas = [self._store("school", school) for school in schools if school]
+        self._evaluate_quotas(user_quota, school_quotas, input_tokens_cost)
+
+    def _evaluate_quotas(self, user_quota: dict, school_quotas: List[Optional[dict]], input_tokens_cost: int = 0) -> None:
+        # --- CHECK USUARIO ---
+        if user_quota["has_usage"]:
+            # Input Limit
+            if user_quota["input_limit"] is not None:
+                current_input = user_quota["input_used"] + user_quota["unflushed_input"]
+                if current_input + input_tokens_cost > user_quota["input_limit"]:
+                    raise LimitExceededException(
+                        f"Has excedido tu límite mensual de tokens de entrada ({user_quota['input_limit']}).",
+                        "user_input"
+                    )
+
+            # Output Limit (Solo chequeamos uso histórico, no podemos predecir output exacto)
+            # Si ya está pasado, no dejamos generar más.
+            if user_quota["output_limit"] is not None:
+                current_output = user_quota["output_used"] + user_quota["unflushed_output"]
+                if current_output >= user_quota["output_limit"]:
+                    raise LimitExceededException(
+                        f"Has excedido tu límite mensual de tokens de salida ({user_quota['output_limit']}).",
+                        "user_output"
+                    )
+
+        # --- CHECK COLEGIOS ---
+        # Si el usuario pertenece a colegios, verificamos los límites de CADA colegio.
+        # Basta con que UNO esté bloqueado para bloquear (o política estricta).
+        # Asumimos que el usuario consume de TODOS sus colegios asociados (aunque usualmente es 1).
+        for school_quota in school_quotas:
+            if school_quota and school_quota["has_usage"]:
+                # Input Limit
+                if school_quota["input_limit"] is not None:
+                    current_input = school_quota["input_used"] + school_quota["unflushed_input"]
+                    if current_input + input_tokens_cost > school_quota["input_limit"]:
+                        raise LimitExceededException(
+                            f"El colegio {school_quota['name']} ha excedido su límite de tokens de entrada.",
+                            "school_input"
+                        )
+
+                # Output Limit
+                if school_quota["output_limit"] is not None:
+                    current_output = school_quota["output_used"] + school_quota["unflushed_output"]
+                    if current_output >= school_quota["output_limit"]:
+                        raise LimitExceededException(
+                            f"El colegio {school_quota['name']} ha excedido su límite de tokens de salida.",
+                            "school_output"
+                        )
+
 token_service = TokenService()
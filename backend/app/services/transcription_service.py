@@ -1,7 +1,7 @@
 import logging
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.messages import HumanMessage
 from app.core.config import get_settings
+from app.services.llm_registry import llm_registry
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -15,11 +15,9 @@ class TranscriptionService:
         if self._llm is None:
             model_name = settings.VERTEX_MODEL_FLASH or settings.VERTEX_MODEL_REASON or settings.VERTEX_MODEL
             
-            self._llm = ChatVertexAI(
+            self._llm = llm_registry.get(
                 model_name=model_name,
-                temperature=0.0,
-                project=settings.PROJECT_ID,
-                location=settings.VERTEX_LOCATION or "us-central1",
+                temperature=0.0
             )
         return self._llm
     
@@ -0,0 +1,135 @@
+import logging
+import random
+from datetime import datetime
+from typing import Optional, Tuple
+from google.cloud import firestore
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class UsageCounterService:
+    """
+    Contadores globales de consumo de tokens repartidos en shards.
+
+    usage_counters/global/shards/{0..N-1} acumulan input/output/total tokens.
+    Cada flush del usage ledger incrementa un shard al azar, así varias
+    instancias no compiten por el mismo documento. Leer el total cuesta N lecturas.
+    """
+
+    def __init__(self):
+        self.num_shards = settings.USAGE_COUNTER_SHARDS
+        self.collection_name = "usage_counters"
+        self.counter_id = "global"
+
+    @property
+    def db(self):
+        from app.services.users.user_service import user_service
+        return user_service.db
+
+    def _shards_ref(self):
+        return self.db.collection(self.collection_name).document(self.counter_id).collection("shards")
+
+    def build_increment_operation(self, input_tokens: int, output_tokens: int) -> Tuple[str, object, dict]:
+        """Operación (para el batch del usage ledger) que incrementa un shard aleatorio."""
+        shard_ref = self._shards_ref().document(str(random.randrange(self.num_shards)))
+        return ("merge", shard_ref, {
+            "input_tokens": firestore.Increment(input_tokens),
+            "output_tokens": firestore.Increment(output_tokens),
+            "total_tokens": firestore.Increment(input_tokens + output_tokens),
+            "updated_at": datetime.utcnow()
+        })
+
+    def _marker_ref(self):
+        """usage_counters/global: seeded_at indica que los shards ya incluyen el consumo histórico."""
+        return self.db.collection(self.collection_name).document(self.counter_id)
+
+    def _read_shards(self, transaction=None) -> Tuple[dict, bool]:
+        marker_ref = self._marker_ref()
+        refs = [self._shards_ref().document(str(i)) for i in range(self.num_shards)]
+        totals = {"total_input_tokens": 0, "total_output_tokens": 0, "total_tokens": 0}
+        seeded = False
+        for snapshot in self.db.get_all([marker_ref] + refs, transaction=transaction):
+            if not snapshot.exists:
+                continue
+            data = snapshot.to_dict() or {}
+            if snapshot.reference.path == marker_ref.path:
+                seeded = bool(data.get("seeded_at"))
+                continue
+            totals["total_input_tokens"] += data.get("input_tokens", 0)
+            totals["total_output_tokens"] += data.get("output_tokens", 0)
+            totals["total_tokens"] += data.get("total_tokens", 0)
+        return totals, seeded
+
+    def get_totals(self) -> Tuple[dict, bool]:
+        """
+        Suma los shards. Retorna (totales, seeded): seeded es False mientras los contadores
+        no fueron inicializados con el consumo histórico (los flushes del ledger crean
+        shards antes de eso, así que su existencia no basta).
+        """
+        return self._read_shards()
+
+    def count_documents(self, collection_name: str) -> int:
+        """Cuenta documentos con una agregación count() (sin transferir los documentos)."""
+        result = self.db.collection(collection_name).count(alias="total").get()
+        return int(result[0][0].value)
+
+    def rebuild_from_users(self, only_if_unseeded: bool = False) -> dict:
+        """
+        Inicializa (o corrige) los contadores con la suma de token_usage de todos los usuarios.
+
+        No sobrescribe los shards: aplica al shard 0 la diferencia entre la suma de usuarios
+        y la de los shards como Increment, así los incrementos del ledger que llegan mientras
+        tanto no se pierden. Un flush que cae entre la lectura de usuarios y la de los shards
+        puede quedar contado solo en uno de los lados (diferencia acotada a ese flush);
+        basta volver a ejecutar para corregirla.
+
+        Args:
+            only_if_unseeded: No hacer nada si otro proceso ya inicializó los contadores
+
+        Returns:
+            Totales resultantes
+        """
+        from app.services.users.user_service import user_service
+
+        users_totals = {"total_input_tokens": 0, "total_output_tokens": 0, "total_tokens": 0}
+        for doc in user_service.db.collection("usuarios").select(["token_usage"]).stream():
+            usage = (doc.to_dict() or {}).get("token_usage") or {}
+            users_totals["total_input_tokens"] += usage.get("input_tokens", 0)
+            users_totals["total_output_tokens"] += usage.get("output_tokens", 0)
+            users_totals["total_tokens"] += usage.get("total_tokens", 0)
+
+        @firestore.transactional
+        def apply_difference(transaction) -> Optional[dict]:
+            shard_totals, seeded = self._read_shards(transaction)
+            if only_if_unseeded and seeded:
+                return None
+            transaction.set(self._shards_ref().document("0"), {
+                "input_tokens": firestore.Increment(users_totals["total_input_tokens"] - shard_totals["total_input_tokens"]),
+                "output_tokens": firestore.Increment(users_totals["total_output_tokens"] - shard_totals["total_output_tokens"]),
+                "total_tokens": firestore.Increment(users_totals["total_tokens"] - shard_totals["total_tokens"]),
+                "updated_at": datetime.utcnow()
+            }, merge=True)
+            transaction.set(self._marker_ref(), {"seeded_at": datetime.utcnow()}, merge=True)
+            return users_totals
+
+        totals = apply_difference(self.db.transaction())
+        if totals is None:
+            logger.info("📊 [COUNTERS] Global usage counters already seeded, skipping")
+            return self._read_shards()[0]
+        logger.info(f"📊 [COUNTERS] Global usage counters rebuilt: {totals}")
+        return totals
+
+
+usage_counter_service = UsageCounterService()
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.usage_counter_service rebuild
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        print(usage_counter_service.rebuild_from_users())
+    else:
+        print("Uso: python -m app.services.usage_counter_service rebuild")
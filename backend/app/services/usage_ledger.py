@@ -0,0 +1,372 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+from google.cloud import firestore
+from app.core.config import get_settings
+from app.services.firestore_batch import get_documents
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Límite de operaciones por batch de Firestore
+FIRESTORE_BATCH_LIMIT = 500
+# Intentos de flush antes de descartar un evento (errores transitorios de Firestore)
+FLUSH_MAX_ATTEMPTS = 5
+
+
+class UsageLedger:
+    """
+    Libro de consumo de tokens en memoria.
+
+    record() solo encola el evento (no hace I/O). Un hilo en segundo plano agrupa
+    los eventos por usuario, colegio y modelo y los persiste con batch writes
+    cada USAGE_FLUSH_INTERVAL_SECONDS o cuando se acumulan USAGE_FLUSH_MAX_EVENTS.
+    Las escrituras que fallan se reintentan en los flush siguientes (solo esas, para no
+    duplicar Increments) y la caché de cuotas descuenta el consumo de un usuario recién
+    cuando sus totales quedaron escritos. Al apagar la app, stop() hace un último flush.
+    """
+
+    def __init__(self):
+        self.flush_interval = settings.USAGE_FLUSH_INTERVAL_SECONDS
+        self.max_pending = settings.USAGE_FLUSH_MAX_EVENTS
+        self._pending: List[dict] = []
+        # Operaciones que fallaron al escribirse: {"operation", "attempts"} (se reintentan en el próximo flush)
+        self._failed: List[dict] = []
+        # Eventos cuyo consumo aún no se confirma en Firestore: (eventos, operaciones de cuota)
+        self._unconfirmed: List[Tuple[List[dict], List[tuple]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+
+    @property
+    def db(self):
+        from app.services.users.user_service import user_service
+        return user_service.db
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stopped.clear()
+            self._worker = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ [USAGE_LEDGER] Error in background flush: {e}")
+
+    def record(self, user_id: str, input_tokens: int, output_tokens: int, model_name: str = "unknown"):
+        """Registra un evento de consumo. No bloquea: la escritura ocurre en el próximo flush."""
+        if not user_id:
+            logger.warning("⚠️ No user_id provided for token tracking")
+            return
+
+        event = {
+            "user_id": user_id,
+            "input_tokens": int(input_tokens or 0),
+            "output_tokens": int(output_tokens or 0),
+            "model": model_name or "unknown",
+            "timestamp": datetime.utcnow()
+        }
+        with self._lock:
+            self._pending.append(event)
+            pending_count = len(self._pending)
+            self._ensure_worker()
+
+        # Actualizar la caché de cuotas al instante (la escritura a Firestore llega en el flush)
+        from app.services.token_service import token_service
+        token_service.record_usage(user_id, event["input_tokens"], event["output_tokens"])
+
+        logger.info(f"💰 [TOKEN_TRACKING] Queued for {user_id}: +{event['input_tokens']} in, +{event['output_tokens']} out. Model: {event['model']}")
+
+        if pending_count >= self.max_pending:
+            self._wake.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _aggregate(self, events: List[dict]) -> Tuple[Dict[str, dict], Dict[Tuple[str, str], dict]]:
+        """Agrupa eventos por usuario (totales) y por (usuario, modelo) (logs)."""
+        per_user: Dict[str, dict] = {}
+        per_user_model: Dict[Tuple[str, str], dict] = {}
+
+        for event in events:
+            totals = per_user.setdefault(event["user_id"], {"input_tokens": 0, "output_tokens": 0, "calls": 0})
+            totals["input_tokens"] += event["input_tokens"]
+            totals["output_tokens"] += event["output_tokens"]
+            totals["calls"] += 1
+
+            log = per_user_model.setdefault((event["user_id"], event["model"]), {
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "calls": 0,
+                "first_timestamp": event["timestamp"],
+                "timestamp": event["timestamp"]
+            })
+            log["input_tokens"] += event["input_tokens"]
+            log["output_tokens"] += event["output_tokens"]
+            log["calls"] += 1
+            log["timestamp"] = max(log["timestamp"], event["timestamp"])
+
+        return per_user, per_user_model
+
+    def _load_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        """Lee los usuarios involucrados en un solo round trip (solo los campos necesarios)."""
+        return get_documents(self.db, "usuarios", user_ids, field_paths=["colegios", "correo", "nombre"])
+
+    def _build_operations(self, events: List[dict]) -> Tuple[List[tuple], Dict[str, List[tuple]]]:
+        """
+        Construye la lista de operaciones (tipo, referencia, datos) para un conjunto de eventos.
+
+        Returns:
+            (operaciones, {user_id: operaciones de totales del usuario y de sus colegios}).
+            La caché de cuotas solo descuenta el consumo de un usuario cuando estas se escribieron.
+        """
+        per_user, per_user_model = self._aggregate(events)
+        users = self._load_users(list(per_user.keys()))
+        now = datetime.utcnow()
+
+        operations = []
+        quota_operations: Dict[str, List[tuple]] = {}
+        per_school: Dict[str, dict] = {}
+
+        for user_id, totals in per_user.items():
+            user_data = users.get(user_id)
+            if user_data is None:
+                logger.warning(f"⚠️ User {user_id} not found for token tracking")
+                continue
+
+            total = totals["input_tokens"] + totals["output_tokens"]
+            user_ref = self.db.collection("usuarios").document(user_id)
+            user_operation = ("update", user_ref, {
+                "token_usage.input_tokens": firestore.Increment(totals["input_tokens"]),
+                "token_usage.output_tokens": firestore.Increment(totals["output_tokens"]),
+                "token_usage.total_tokens": firestore.Increment(total),
+                "token_usage.last_updated": now
+            })
+            operations.append(user_operation)
+            quota_operations[user_id] = [user_operation]
+
+            for colegio_id in user_data.get("colegios", []) or []:
+                school_totals = per_school.setdefault(colegio_id, {"input_tokens": 0, "output_tokens": 0})
+                school_totals["input_tokens"] += totals["input_tokens"]
+                school_totals["output_tokens"] += totals["output_tokens"]
+
+        for (user_id, model_name), log in per_user_model.items():
+            user_data = users.get(user_id)
+            if user_data is None:
+                continue
+
+            colegios = user_data.get("colegios", []) or []
+            usage_log = {
+                "timestamp": log["timestamp"],
+                "first_timestamp": log["first_timestamp"],
+                "model": model_name,
+                "input_tokens": log["input_tokens"],
+                "output_tokens": log["output_tokens"],
+                "total_tokens": log["input_tokens"] + log["output_tokens"],
+                "calls": log["calls"],
+                "user_id": user_id,
+                "user_email": user_data.get("correo"),
+                "user_name": user_data.get("nombre"),
+                "school_ids": colegios
+            }
+            user_ref = self.db.collection("usuarios").document(user_id)
+            operations.append(("set", user_ref.collection("usage_logs").document(), usage_log))
+
+            for colegio_id in colegios:
+                colegio_ref = self.db.collection("colegios").document(colegio_id)
+                operations.append(("set", colegio_ref.collection("school_usage_logs").document(), dict(usage_log)))
+
+        school_operations = {}
+        for colegio_id, totals in per_school.items():
+            colegio_ref = self.db.collection("colegios").document(colegio_id)
+            school_operations[colegio_id] = ("update", colegio_ref, {
+                "token_usage.input_tokens": firestore.Increment(totals["input_tokens"]),
+                "token_usage.output_tokens": firestore.Increment(totals["output_tokens"]),
+                "token_usage.total_tokens": firestore.Increment(totals["input_tokens"] + totals["output_tokens"]),
+                "token_usage.last_updated": now
+            })
+            operations.append(school_operations[colegio_id])
+        for user_id in quota_operations:
+            quota_operations[user_id].extend(school_operations[colegio_id] for colegio_id in users[user_id].get("colegios", []) or [])
+
+        # Rollups diarios (usuario, colegio y global) para el dashboard de tokens
+        from app.services.usage_rollup_service import usage_rollup_service
+        user_schools = {uid: (data.get("colegios", []) or []) for uid, data in users.items()}
+        operations.extend(usage_rollup_service.build_increment_operations(events, user_schools))
+
+        # Contador global (sharded) para /stats/global
+        from app.services.usage_counter_service import usage_counter_service
+        counted = [totals for uid, totals in per_user.items() if uid in users]
+        if counted:
+            operations.append(usage_counter_service.build_increment_operation(
+                sum(t["input_tokens"] for t in counted),
+                sum(t["output_tokens"] for t in counted)
+            ))
+
+        return operations, quota_operations
+
+    @staticmethod
+    def _apply(writer, op: str, ref, data: dict):
+        """Aplica una operación sobre un batch o directamente sobre la referencia (writer=None)."""
+        if writer is None:
+            if op == "update":
+                ref.update(data)
+            else:
+                ref.set(data, merge=(op == "merge"))
+            return
+
+        if op == "update":
+            writer.update(ref, data)
+        else:
+            writer.set(ref, data, merge=(op == "merge"))
+
+    def _commit(self, operations: List[tuple]) -> List[tuple]:
+        """
+        Escribe las operaciones en batches de máximo FIRESTORE_BATCH_LIMIT.
+        Retorna las operaciones que no se pudieron escribir.
+        """
+        failed = []
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            chunk = operations[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = self.db.batch()
+            for op, ref, data in chunk:
+                self._apply(batch, op, ref, data)
+            try:
+                batch.commit()
+            except Exception as e:
+                # El batch es atómico: si falla (p.ej. un colegio eliminado), nada se aplicó.
+                # Reintentamos operación por operación para no perder el resto del consumo.
+                logger.warning(f"⚠️ [USAGE_LEDGER] Batch of {len(chunk)} operations failed, retrying individually: {e}")
+                for operation in chunk:
+                    op, ref, data = operation
+                    try:
+                        self._apply(None, op, ref, data)
+                    except Exception as e_op:
+                        logger.error(f"❌ [USAGE_LEDGER] Error writing {ref.path}: {e_op}")
+                        failed.append(operation)
+        return failed
+
+    def flush(self) -> int:
+        """
+        Persiste los eventos pendientes y reintenta las operaciones que fallaron antes.
+        Retorna el número de eventos cuyo consumo quedó confirmado.
+        """
+        with self._flush_lock:
+            with self._lock:
+                events = self._pending
+                self._pending = []
+            retries, self._failed = self._failed, []
+
+            if not events and not retries:
+                return 0
+
+            operations, quota_operations = [], {}
+            if events:
+                try:
+                    operations, quota_operations = self._build_operations(events)
+                except Exception as e:
+                    self._requeue(events, e)
+                    events = []
+
+            failed = self._commit([retry["operation"] for retry in retries] + operations)
+            self._retry_later(failed, retries)
+
+            # Eventos de usuarios inexistentes no generan escrituras: se confirman de inmediato
+            for user_id, user_events in self._group_by_user(events).items():
+                self._unconfirmed.append((user_events, quota_operations.get(user_id, [])))
+
+            confirmed = self._confirm_written()
+            if events or confirmed:
+                total_tokens = sum(e["input_tokens"] + e["output_tokens"] for e in events)
+                written = len(retries) + len(operations) - len(failed)
+                logger.info(f"💰 [TOKENS] Flushed {len(events)} usage events ({total_tokens} tokens) in {written} writes, {len(failed)} pending retry")
+            return confirmed
+
+    @staticmethod
+    def _group_by_user(events: List[dict]) -> Dict[str, List[dict]]:
+        grouped: Dict[str, List[dict]] = {}
+        for event in events:
+            grouped.setdefault(event["user_id"], []).append(event)
+        return grouped
+
+    def _retry_later(self, failed: List[tuple], retries: List[dict]):
+        """
+        Guarda las operaciones fallidas para el próximo flush (sin repetir las que sí se
+        escribieron: los Increment no son idempotentes). Tras FLUSH_MAX_ATTEMPTS se descartan.
+        """
+        attempts = {id(retry["operation"]): retry["attempts"] for retry in retries}
+        dropped = 0
+        for operation in failed:
+            attempt = attempts.get(id(operation), 0) + 1
+            if attempt < FLUSH_MAX_ATTEMPTS:
+                self._failed.append({"operation": operation, "attempts": attempt})
+            else:
+                dropped += 1
+                logger.error(f"❌ [USAGE_LEDGER] Dropping write to {operation[1].path} after {FLUSH_MAX_ATTEMPTS} failed attempts")
+        if self._failed:
+            logger.warning(f"⚠️ [USAGE_LEDGER] {len(self._failed)} usage writes will be retried in the next flush")
+
+    def _confirm_written(self) -> int:
+        """
+        Avisa a la caché de cuotas el consumo cuyas escrituras de totales ya no están
+        pendientes (escritas, o descartadas tras FLUSH_MAX_ATTEMPTS).
+        """
+        pending = {id(retry["operation"]) for retry in self._failed}
+        confirmed, waiting = [], []
+        for events, operations in self._unconfirmed:
+            if any(id(operation) in pending for operation in operations):
+                waiting.append((events, operations))
+            else:
+                confirmed.extend(events)
+        self._unconfirmed = waiting
+        if confirmed:
+            self._notify_flushed(confirmed)
+        return len(confirmed)
+
+    def _requeue(self, events: List[dict], error: Exception):
+        """
+        Devuelve al inicio de la cola los eventos cuyo flush falló antes de escribir
+        (p.ej. al leer los usuarios) para el próximo intento.
+        Tras FLUSH_MAX_ATTEMPTS intentos se descartan (y se registra el consumo perdido).
+        """
+        retry, dropped = [], []
+        for event in events:
+            event["attempts"] = event.get("attempts", 0) + 1
+            (retry if event["attempts"] < FLUSH_MAX_ATTEMPTS else dropped).append(event)
+
+        with self._lock:
+            self._pending = retry + self._pending
+        logger.warning(f"⚠️ [USAGE_LEDGER] Error flushing {len(events)} usage events, {len(retry)} requeued: {error}")
+
+        if dropped:
+            lost_tokens = sum(e["input_tokens"] + e["output_tokens"] for e in dropped)
+            logger.error(f"❌ [USAGE_LEDGER] Dropping {len(dropped)} usage events ({lost_tokens} tokens) after {FLUSH_MAX_ATTEMPTS} failed flushes")
+            # No se escribirán: la caché de cuotas tampoco debe seguir contándolos como pendientes
+            self._notify_flushed(dropped)
+
+    def _notify_flushed(self, events: List[dict]):
+        from app.services.token_service import token_service
+        per_user, _ = self._aggregate(events)
+        token_service.on_usage_flushed(per_user)
+
+    def stop(self):
+        """Detiene el hilo de flush y persiste lo pendiente (llamar al apagar la app)."""
+        self._stopped.set()
+        self._wake.set()
+        if self._worker is not None and self._worker.is_alive():
+            self._worker.join(timeout=self.flush_interval + 5)
+        self.flush()
+        if self._failed:
+            logger.error(f"❌ [USAGE_LEDGER] {len(self._failed)} usage writes still failing at shutdown, they will be lost")
+
+
+usage_ledger = UsageLedger()
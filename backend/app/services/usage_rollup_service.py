@@ -0,0 +1,224 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from google.cloud import firestore
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Límite de operaciones por batch de Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class UsageRollupService:
+    """
+    Rollups diarios de consumo de tokens.
+
+    Documentos (id = YYYY-MM-DD, UTC):
+        usuarios/{user_id}/usage_daily/{día}
+        colegios/{school_id}/usage_daily/{día}
+        usage_daily_global/{día}
+
+    Se mantienen con incrementos desde el usage ledger y pueden reconstruirse
+    desde usage_logs / school_usage_logs con backfill().
+    """
+
+    def __init__(self):
+        self.daily_collection = "usage_daily"
+        self.global_collection = "usage_daily_global"
+
+    @property
+    def db(self):
+        from app.services.users.user_service import user_service
+        return user_service.db
+
+    @staticmethod
+    def day_key(timestamp: datetime) -> str:
+        return timestamp.strftime("%Y-%m-%d")
+
+    def _user_day_ref(self, user_id: str, day: str):
+        return self.db.collection("usuarios").document(user_id).collection(self.daily_collection).document(day)
+
+    def _school_day_ref(self, school_id: str, day: str):
+        return self.db.collection("colegios").document(school_id).collection(self.daily_collection).document(day)
+
+    def _global_day_ref(self, day: str):
+        return self.db.collection(self.global_collection).document(day)
+
+    @staticmethod
+    def _empty_totals() -> dict:
+        return {"input_tokens": 0, "output_tokens": 0, "count": 0}
+
+    @staticmethod
+    def _add(totals: dict, input_tokens: int, output_tokens: int, calls: int):
+        totals["input_tokens"] += input_tokens
+        totals["output_tokens"] += output_tokens
+        totals["count"] += calls
+
+    def build_increment_operations(self, events: List[dict], user_schools: Dict[str, List[str]]) -> List[Tuple[str, object, dict]]:
+        """
+        Operaciones de incremento de rollups para un flush del usage ledger.
+
+        Args:
+            events: Eventos crudos del ledger (user_id, input_tokens, output_tokens, timestamp)
+            user_schools: Colegios de cada usuario (solo usuarios existentes)
+        """
+        per_user_day: Dict[Tuple[str, str], dict] = {}
+        per_school_day: Dict[Tuple[str, str], dict] = {}
+        per_global_day: Dict[str, dict] = {}
+
+        for event in events:
+            user_id = event["user_id"]
+            if user_id not in user_schools:
+                continue
+            day = self.day_key(event["timestamp"])
+            args = (event["input_tokens"], event["output_tokens"], 1)
+            self._add(per_user_day.setdefault((user_id, day), self._empty_totals()), *args)
+            self._add(per_global_day.setdefault(day, self._empty_totals()), *args)
+            for school_id in user_schools[user_id]:
+                self._add(per_school_day.setdefault((school_id, day), self._empty_totals()), *args)
+
+        now = datetime.utcnow()
+
+        def increment(day: str, totals: dict) -> dict:
+            return {
+                "date": day,
+                "input_tokens": firestore.Increment(totals["input_tokens"]),
+                "output_tokens": firestore.Increment(totals["output_tokens"]),
+                "total_tokens": firestore.Increment(totals["input_tokens"] + totals["output_tokens"]),
+                "count": firestore.Increment(totals["count"]),
+                "updated_at": now
+            }
+
+        operations = []
+        for (user_id, day), totals in per_user_day.items():
+            operations.append(("merge", self._user_day_ref(user_id, day), increment(day, totals)))
+        for (school_id, day), totals in per_school_day.items():
+            operations.append(("merge", self._school_day_ref(school_id, day), increment(day, totals)))
+        for day, totals in per_global_day.items():
+            operations.append(("merge", self._global_day_ref(day), increment(day, totals)))
+        return operations
+
+    def get_daily_history(self, start: datetime, end: datetime, user_id: Optional[str] = None, school_id: Optional[str] = None) -> List[dict]:
+        """
+        Historial diario entre start y end (inclusive) leyendo un documento por día.
+        Los días sin rollup se devuelven en cero.
+        """
+        days = []
+        current = start.date()
+        while current <= end.date():
+            days.append(current.strftime("%Y-%m-%d"))
+            current += timedelta(days=1)
+
+        if user_id:
+            refs = [self._user_day_ref(user_id, day) for day in days]
+        elif school_id:
+            refs = [self._school_day_ref(school_id, day) for day in days]
+        else:
+            refs = [self._global_day_ref(day) for day in days]
+
+        daily_stats = {
+            day: {"date": day, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "count": 0}
+            for day in days
+        }
+        if refs:
+            for snapshot in self.db.get_all(refs):
+                if snapshot.exists and snapshot.id in daily_stats:
+                    data = snapshot.to_dict() or {}
+                    for field in ("input_tokens", "output_tokens", "total_tokens", "count"):
+                        daily_stats[snapshot.id][field] = data.get(field, 0)
+
+        return sorted(daily_stats.values(), key=lambda x: x["date"])
+
+    def backfill(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+        """
+        Reconstruye los rollups desde los logs crudos (sobrescribe los días afectados).
+
+        Conviene ejecutarlo con poco tráfico: los incrementos que lleguen durante
+        la reconstrucción de un día pueden quedar sobrescritos.
+        """
+        per_user_day: Dict[Tuple[str, str], dict] = {}
+        per_school_day: Dict[Tuple[str, str], dict] = {}
+        per_global_day: Dict[str, dict] = {}
+
+        def scan(collection_id: str):
+            query = self.db.collection_group(collection_id)
+            if start_date:
+                query = query.where("timestamp", ">=", start_date)
+            if end_date:
+                query = query.where("timestamp", "<=", end_date)
+            return query.stream()
+
+        user_logs = 0
+        for doc in scan("usage_logs"):
+            data = doc.to_dict()
+            ts = data.get("timestamp")
+            user_id = data.get("user_id") or doc.reference.parent.parent.id
+            if not ts:
+                continue
+            day = self.day_key(ts)
+            args = (data.get("input_tokens", 0), data.get("output_tokens", 0), data.get("calls", 1))
+            self._add(per_user_day.setdefault((user_id, day), self._empty_totals()), *args)
+            self._add(per_global_day.setdefault(day, self._empty_totals()), *args)
+            user_logs += 1
+
+        school_logs = 0
+        for doc in scan("school_usage_logs"):
+            data = doc.to_dict()
+            ts = data.get("timestamp")
+            if not ts:
+                continue
+            school_id = doc.reference.parent.parent.id
+            day = self.day_key(ts)
+            args = (data.get("input_tokens", 0), data.get("output_tokens", 0), data.get("calls", 1))
+            self._add(per_school_day.setdefault((school_id, day), self._empty_totals()), *args)
+            school_logs += 1
+
+        now = datetime.utcnow()
+
+        def snapshot(day: str, totals: dict) -> dict:
+            return {
+                "date": day,
+                "input_tokens": totals["input_tokens"],
+                "output_tokens": totals["output_tokens"],
+                "total_tokens": totals["input_tokens"] + totals["output_tokens"],
+                "count": totals["count"],
+                "updated_at": now
+            }
+
+        writes = []
+        for (user_id, day), totals in per_user_day.items():
+            writes.append((self._user_day_ref(user_id, day), snapshot(day, totals)))
+        for (school_id, day), totals in per_school_day.items():
+            writes.append((self._school_day_ref(school_id, day), snapshot(day, totals)))
+        for day, totals in per_global_day.items():
+            writes.append((self._global_day_ref(day), snapshot(day, totals)))
+
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(ref, data)
+            batch.commit()
+
+        result = {
+            "user_logs_scanned": user_logs,
+            "school_logs_scanned": school_logs,
+            "user_days": len(per_user_day),
+            "school_days": len(per_school_day),
+            "global_days": len(per_global_day)
+        }
+        logger.info(f"📊 [ROLLUPS] Backfill complete: {result}")
+        return result
+
+
+usage_rollup_service = UsageRollupService()
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.usage_rollup_service [YYYY-MM-DD] [YYYY-MM-DD]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    start_arg = datetime.strptime(sys.argv[1], "%Y-%m-%d") if len(sys.argv) > 1 else None
+    end_arg = datetime.strptime(sys.argv[2], "%Y-%m-%d").replace(hour=23, minute=59, second=59) if len(sys.argv) > 2 else None
+    print(usage_rollup_service.backfill(start_arg, end_arg))
@@ -251,72 +251,12 @@ class UserService:
 
     def update_token_usage(self, user_id: str, input_tokens: int, output_tokens: int, model_name: str = "unknown"):
         """
-        Actualiza el contador de tokens usados por un usuario y sus colegios.
-        Incrementa los valores atómicamente.
+        Registra el consumo de tokens de un usuario y sus colegios.
+        No bloquea: el evento se encola en el usage ledger, que agrupa y
+        persiste los incrementos con batch writes en segundo plano.
         """
-        if not user_id:
-            logger.warning("⚠️ No user_id provided for token tracking")
-            return
-
-        try:
-            doc_ref = self.db.collection(self.collection_name).document(user_id)
-            
-            # 1. Obtener usuario para saber sus colegios
-            doc_snapshot = doc_ref.get()
-            if not doc_snapshot.exists:
-                logger.warning(f"⚠️ User {user_id} not found for token tracking")
-                return
-            
-            user_data = doc_snapshot.to_dict()
-            colegios = user_data.get("colegios", [])
-
-            # 2. Usar incremento de Firestore para atomicidad en usuario
-            updates = {
-                "token_usage.input_tokens": firestore.Increment(input_tokens),
-                "token_usage.output_tokens": firestore.Increment(output_tokens),
-                "token_usage.total_tokens": firestore.Increment(input_tokens + output_tokens),
-                "token_usage.last_updated": datetime.utcnow()
-            }
-            
-            # DEBUG LOG
-            logger.info(f"💰 [TOKEN_TRACKING] Updating for {user_id}: +{input_tokens} in, +{output_tokens} out. Model: {model_name}")
-            
-            doc_ref.update(updates)
-            
-            # 3. Loguear evento
-            usage_log = {
-                "timestamp": datetime.utcnow(),
-                "model": model_name,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": input_tokens + output_tokens,
-                "user_id": user_id,
-                "user_email": user_data.get("correo"),
-                "user_name": user_data.get("nombre"),
-                "school_ids": colegios
-            }
-            doc_ref.collection("usage_logs").add(usage_log)
-
-            # 4. Actualizar colegios (incrementar atomicamente)
-            for colegio_id in colegios:
-                try:
-                    colegio_ref = self.db.collection("colegios").document(colegio_id)
-                    colegio_updates = {
-                        "token_usage.input_tokens": firestore.Increment(input_tokens),
-                        "token_usage.output_tokens": firestore.Increment(output_tokens),
-                        "token_usage.total_tokens": firestore.Increment(input_tokens + output_tokens),
-                        "token_usage.last_updated": datetime.utcnow()
-                    }
-                    colegio_ref.update(colegio_updates)
-                    # Opcional: Log por colegio
-                    colegio_ref.collection("school_usage_logs").add({**usage_log, "user_id": user_id})
-                except Exception as e_col:
-                    logger.error(f"❌ Error updating simple token usage for school {colegio_id}: {e_col}")
-            
-            logger.info(f"💰 [TOKENS] Updated usage for user {user_id} and {len(colegios)} schools: +{input_tokens+output_tokens} tokens")
-            
-        except Exception as e:
-            logger.error(f"❌ Error updating token usage for user {user_id}: {e}")
+        from app.services.usage_ledger import usage_ledger
+        usage_ledger.record(user_id, input_tokens, output_tokens, model_name)
 
 # Instancia singleton
 user_service = UserService()
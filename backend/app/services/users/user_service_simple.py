@@ -1,11 +1,12 @@
 import uuid
 import bcrypt
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from google.cloud import firestore
 from app.core.config import get_settings
 from app.schemas.user import Usuario, UsuarioCreate, UsuarioUpdate
+from app.services.firestore_batch import get_documents
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -119,6 +120,21 @@ class UserServiceSimple:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
 
+    def get_users_by_ids(self, user_ids: List[str]) -> Dict[str, Usuario]:
+        """Obtiene varios usuarios por ID en una lectura por lotes"""
+        users = {}
+        try:
+            documents = get_documents(self.db, self.collection_name, user_ids)
+        except Exception as e:
+            logger.error(f"Error getting users {user_ids}: {e}")
+            return users
+        for user_id, data in documents.items():
+            try:
+                users[user_id] = Usuario(**data)
+            except Exception as e:
+                logger.error(f"Error parsing user {user_id}: {e}")
+        return users
+
     def get_user_by_email(self, email: str) -> Optional[Usuario]:
         """Obtiene un usuario por correo electrónico"""
         try:
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.case_service import CaseService
+from app.services.page_cursor import InvalidCursorError, encode_cursor
+
+
+def make_item(case_id: str, day: int, status: str = "active", case_type: str = "acoso") -> dict:
+    return {
+        "id": case_id,
+        "status": status,
+        "case_type": case_type,
+        "created_at": datetime(2024, 5, day, tzinfo=timezone.utc),
+        "title": f"Caso {case_id}",
+    }
+
+
+ITEMS = [
+    make_item("a", 1),
+    make_item("b", 3, status="closed"),
+    make_item("c", 2, case_type="maltrato"),
+    make_item("d", 4),
+    make_item("e", 5),
+]
+
+
+def page(items=ITEMS, limit=2, cursor=None, status=None, case_type=None, date_from=None, date_to=None,
+         sort_by="created_at", descending=True) -> dict:
+    return CaseService._page_case_items(list(items), limit, cursor, status, case_type, date_from, date_to,
+                                        sort_by, descending)
+
+
+def collect_ids(**kwargs) -> list:
+    ids, cursor = [], None
+    while True:
+        result = page(cursor=cursor, **kwargs)
+        ids.extend(item["id"] for item in result["items"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_sorts_descending_and_pages_with_cursor():
+    first = page()
+    assert [item["id"] for item in first["items"]] == ["e", "d"]
+    assert first["next_cursor"] == encode_cursor(ITEMS[3]["created_at"], "d")
+    second = page(cursor=first["next_cursor"])
+    assert [item["id"] for item in second["items"]] == ["b", "c"]
+    last = page(cursor=second["next_cursor"])
+    assert [item["id"] for item in last["items"]] == ["a"]
+    assert last["next_cursor"] is None
+
+
+def test_following_cursors_returns_every_item_once():
+    assert collect_ids() == ["e", "d", "b", "c", "a"]
+    assert collect_ids(descending=False, limit=3) == ["a", "c", "b", "d", "e"]
+
+
+def test_no_cursor_when_page_is_exactly_full():
+    result = page(limit=5)
+    assert len(result["items"]) == 5
+    assert result["next_cursor"] is None
+
+
+def test_filters_by_status_and_type():
+    assert collect_ids(status="active") == ["e", "d", "c", "a"]
+    assert collect_ids(case_type="maltrato") == ["c"]
+    assert collect_ids(status="closed", case_type="maltrato") == []
+
+
+def test_date_range_accepts_naive_and_aware_datetimes():
+    ids = collect_ids(date_from=datetime(2024, 5, 2), date_to=datetime(2024, 5, 4, tzinfo=timezone.utc))
+    assert ids == ["d", "b", "c"]
+
+
+def test_items_without_sort_value():
+    items = ITEMS + [{"id": "z", "status": "active", "case_type": "acoso", "created_at": None}]
+    assert page(items=items, limit=10)["items"][-1]["id"] == "z"
+    assert "z" not in [item["id"] for item in page(items=items, limit=10, date_from=datetime(2024, 1, 1))["items"]]
+
+
+def test_cursor_of_deleted_case_continues_after_its_position():
+    cursor = page()["next_cursor"]
+    remaining = [item for item in ITEMS if item["id"] != "d"]
+    assert [item["id"] for item in page(items=remaining, cursor=cursor)["items"]] == ["b", "c"]
+
+
+def test_cursor_breaks_ties_by_id():
+    items = [make_item(case_id, 1) for case_id in ("a", "b", "c")]
+    first = page(items=items)
+    assert [item["id"] for item in first["items"]] == ["c", "b"]
+    assert [item["id"] for item in page(items=items, cursor=first["next_cursor"])["items"]] == ["a"]
+
+
+def test_invalid_cursor_raises():
+    with pytest.raises(InvalidCursorError):
+        page(cursor="missing")
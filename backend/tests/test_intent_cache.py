@@ -0,0 +1,102 @@
+import pytest
+
+from app.services.chat import intent_cache as intent_cache_module
+from app.services.chat.intent_cache import IntentCache, cache_text, intent_markers
+
+MESSAGE = "Necesito revisar el reglamento interno sobre acoso escolar entre estudiantes del colegio"
+RESULT = {"intent": "search", "confidence": 0.9}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(intent_cache_module.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def cache(clock):
+    return IntentCache(max_entries=10, ttl_seconds=60)
+
+
+def test_cache_text_normalizes_and_drops_stopwords():
+    assert cache_text("¿Qué es el Protocolo de acoso?") == "que es protocolo acoso"
+    assert cache_text("Hola, gracias") == ""
+
+
+def test_intent_markers():
+    assert intent_markers(cache_text("¿No sabes cuándo es la reunión?")) == frozenset({"no", "cuando"})
+    assert intent_markers(cache_text(MESSAGE)) == frozenset()
+
+
+def test_exact_hit_after_normalization(cache):
+    cache.put(MESSAGE, False, False, RESULT)
+    assert cache.get(MESSAGE.upper() + "?", False, False) == RESULT
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_returns_copies(cache):
+    cache.put(MESSAGE, False, False, RESULT)
+    cache.get(MESSAGE, False, False)["intent"] = "changed"
+    assert cache.get(MESSAGE, False, False) == RESULT
+
+
+def test_context_is_part_of_the_key(cache):
+    cache.put(MESSAGE, False, False, RESULT)
+    assert cache.get(MESSAGE, True, False) is None
+    assert cache.get(MESSAGE, False, True) is None
+
+
+def test_entries_expire(cache, clock):
+    cache.put(MESSAGE, False, False, RESULT)
+    clock.now += 59
+    assert cache.get(MESSAGE, False, False) == RESULT
+    clock.now += 2
+    assert cache.get(MESSAGE, False, False) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = IntentCache(max_entries=2, ttl_seconds=60)
+    cache.put("primer mensaje", False, False, {"intent": "a"})
+    cache.put("segundo mensaje", False, False, {"intent": "b"})
+    cache.get("primer mensaje", False, False)
+    cache.put("tercer mensaje", False, False, {"intent": "c"})
+    assert cache.get("segundo mensaje", False, False) is None
+    assert cache.get("primer mensaje", False, False) == {"intent": "a"}
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_near_duplicate_hit(cache):
+    cache.put(MESSAGE, False, False, RESULT)
+    assert cache.get(MESSAGE + " hoy", False, False) == RESULT
+    stats = cache.get_stats()
+    assert stats["near_hits"] == 1
+    assert stats["hit_rate"] == 1.0
+
+
+def test_near_duplicate_requires_same_negations(cache):
+    cache.put(MESSAGE, False, False, RESULT)
+    assert cache.get("No " + MESSAGE, False, False) is None
+    assert cache.get("¿Dónde " + MESSAGE + "?", False, False) is None
+
+
+def test_short_messages_only_match_exactly(cache):
+    cache.put("ayuda", False, False, RESULT)
+    assert cache.get("ayudas", False, False) is None
+    assert cache.get("Ayuda", False, False) == RESULT
+
+
+def test_disabled_cache(clock):
+    cache = IntentCache(max_entries=0, ttl_seconds=60)
+    cache.put(MESSAGE, False, False, RESULT)
+    assert cache.get(MESSAGE, False, False) is None
+    assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,64 @@
+from app.services.chat.keyword_matcher import (
+    ANALYSIS_VERB,
+    FILE_REF,
+    KEYWORD_SETS,
+    PROTOCOL_ACTIVATION,
+    PROTOCOL_EXCLUSION,
+    TOOL_PHRASE,
+    KeywordMatcher,
+    keyword_matcher,
+    match_message,
+    normalize,
+)
+
+MESSAGES = [
+    "Necesito enviar correo al apoderado",
+    "¿Qué es un protocolo de convivencia?",
+    "Activa el protocolo para este caso",
+    "Analiza el PDF adjunto, por favor",
+    "Tengo una denuncia por acoso laboral de mi jefe",
+    "Hola, ¿cómo estás?",
+    "Agendar reunión con la dirección",
+    "",
+]
+
+
+def naive_match(text: str) -> frozenset:
+    normalized = normalize(text)
+    return frozenset(
+        category
+        for category, keywords in KEYWORD_SETS.items()
+        if any(normalize(keyword) in normalized for keyword in keywords)
+    )
+
+
+def test_normalize_removes_accents_and_case():
+    assert normalize("Reunión ÁNIMO") == "reunion animo"
+
+
+def test_matches_same_categories_as_substring_checks():
+    for message in MESSAGES:
+        assert keyword_matcher.match(message) == naive_match(message), message
+
+
+def test_expected_categories():
+    assert TOOL_PHRASE in keyword_matcher.match("Agendar reunión con la dirección")
+    assert PROTOCOL_EXCLUSION in keyword_matcher.match("¿Qué es un protocolo?")
+    assert PROTOCOL_ACTIVATION in keyword_matcher.match("Activa el protocolo")
+    assert {ANALYSIS_VERB, FILE_REF} <= keyword_matcher.match("Analiza el PDF adjunto")
+    assert keyword_matcher.match("Hola") == frozenset()
+
+
+def test_overlapping_keywords():
+    matcher = KeywordMatcher({"a": ["she", "hers"], "b": ["he"], "c": ["ushe"]})
+    assert matcher.match("ushers") == frozenset({"a", "b", "c"})
+    assert matcher.match("her") == frozenset({"b"})
+    assert matcher.match("sh") == frozenset()
+
+
+def test_match_message_is_cached():
+    match_message.cache_clear()
+    first = match_message("Analiza el contrato")
+    second = match_message("Analiza el contrato")
+    assert first == second == keyword_matcher.match("Analiza el contrato")
+    assert match_message.cache_info().hits == 1
@@ -0,0 +1,97 @@
+from app.services.chat.message_page_store import MessagePageStore, RECORD_OVERHEAD_BYTES
+
+
+class FakeDocument:
+    def __init__(self, page_id: str):
+        self.id = page_id
+
+
+class FakeCollection:
+    def document(self, page_id: str) -> FakeDocument:
+        return FakeDocument(page_id)
+
+
+class FakeSessionRef:
+    id = "session-1"
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection()
+
+
+def make_store(page_size: int = 4, max_page_bytes: int = 10_000) -> MessagePageStore:
+    return MessagePageStore(db=None, page_size=page_size, max_page_bytes=max_page_bytes)
+
+
+def make_records(count: int, start: int = 0, content: str = "hola") -> list:
+    return [{"order": start + i, "type": "human", "content": content} for i in range(count)]
+
+
+def test_page_starts_defaults_to_fixed_size_pages():
+    store = make_store(page_size=4)
+    assert store.page_starts({"next_order": 10}) == [0, 4, 8]
+    assert store.page_starts({}) == []
+    assert store.page_starts({"page_starts": [0, 3, 7], "next_order": 10}) == [0, 3, 7]
+
+
+def test_page_for_order():
+    starts = [0, 3, 7]
+    assert MessagePageStore.page_for_order(starts, 0) == 0
+    assert MessagePageStore.page_for_order(starts, 2) == 0
+    assert MessagePageStore.page_for_order(starts, 3) == 1
+    assert MessagePageStore.page_for_order(starts, 6) == 1
+    assert MessagePageStore.page_for_order(starts, 100) == 2
+    assert MessagePageStore.page_for_order([], 5) == 0
+
+
+def test_record_size_counts_utf8_bytes():
+    assert MessagePageStore.record_size({"content": "abc"}) == 3 + RECORD_OVERHEAD_BYTES
+    assert MessagePageStore.record_size({"content": "ñ"}) == 2 + RECORD_OVERHEAD_BYTES
+
+
+def test_plan_pages_splits_by_message_count():
+    store = make_store(page_size=4)
+    pages, starts, last_bytes = store.plan_pages(make_records(10), [], 0)
+    assert starts == [0, 4, 8]
+    assert [len(pages[page]) for page in sorted(pages)] == [4, 4, 2]
+    assert last_bytes == 2 * store.record_size({"content": "hola"})
+
+
+def test_plan_pages_splits_by_byte_budget():
+    record_bytes = MessagePageStore.record_size({"content": "x" * 100})
+    store = make_store(page_size=100, max_page_bytes=record_bytes * 2)
+    pages, starts, last_bytes = store.plan_pages(make_records(5, content="x" * 100), [], 0)
+    assert starts == [0, 2, 4]
+    assert [[r["order"] for r in pages[page]] for page in sorted(pages)] == [[0, 1], [2, 3], [4]]
+    assert last_bytes == record_bytes
+
+
+def test_plan_pages_keeps_oversized_record_on_empty_page():
+    store = make_store(page_size=100, max_page_bytes=10)
+    records = make_records(2, content="x" * 50)
+    pages, starts, _ = store.plan_pages(records, [], 0)
+    assert starts == [0, 1]
+    assert pages == {0: [records[0]], 1: [records[1]]}
+
+
+def test_plan_pages_continues_last_page():
+    store = make_store(page_size=4)
+    record_bytes = store.record_size({"content": "hola"})
+    pages, starts, last_bytes = store.plan_pages(make_records(3, start=6), [0, 4], 2 * record_bytes)
+    assert starts == [0, 4, 8]
+    assert [r["order"] for r in pages[1]] == [6, 7]
+    assert [r["order"] for r in pages[2]] == [8]
+    assert last_bytes == record_bytes
+
+
+def test_build_migration_operations_renumbers_and_reports_layout():
+    store = make_store(page_size=2)
+    records = [{"type": "human", "content": "hola"}, {"type": "ai", "content": "chao"},
+               {"type": "human", "content": "otra", "timestamp": "2024-01-01"}]
+    operations, layout = store.build_migration_operations(FakeSessionRef(), records)
+
+    assert [(kind, ref.id) for kind, ref, _ in operations] == [("set", "000000"), ("set", "000001")]
+    first_page = operations[0][2]["messages"]
+    assert [m["order"] for m in first_page] == [0, 1]
+    assert all(m["timestamp"] is not None for m in first_page)
+    assert operations[1][2]["messages"][0]["timestamp"] == "2024-01-01"
+    assert layout == {"page_starts": [0, 2], "last_page_bytes": store.record_size({"content": "otra"})}
@@ -0,0 +1,68 @@
+import pytest
+
+from app.services.chat.response_sanitizer import ResponseSanitizer
+
+CASE_ID = "Xk29fLq8ZpR3mN7vT1bY"
+SESSION_ID = "sess_4f9a2c1e7b"
+
+TEXTS = [
+    f"Revisé los antecedentes del expediente {CASE_ID} y la sesión {SESSION_ID}.",
+    f"**Resumen** (ID: {CASE_ID})\n\n- id del caso: abc-123\n- Documento: informe_final.pdf",
+    "El registro A1b2C3d4E5f6G7h8I9j0K1 quedó actualizado; lo anterior fue desproporcionadamente largo.",
+    f"Para el caso {CASE_ID} se sugiere activar el protocolo.\n\n1. Citar a las partes\n2. Registrar",
+    "Texto sin identificadores, solo markdown:\n\n| a | b |\n|---|---|\n| 1 | 2 |",
+]
+
+
+@pytest.fixture
+def sanitizer():
+    return ResponseSanitizer()
+
+
+def stream_in_chunks(sanitizer, text: str, size: int):
+    id_filter = sanitizer.stream(case_id=CASE_ID, session_id=SESSION_ID)
+    output = "".join(id_filter.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return output + id_filter.flush(), id_filter.extracted_ids
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_chunked_output_matches_single_pass(sanitizer, text):
+    expected, expected_ids = stream_in_chunks(sanitizer, text, len(text))
+    for size in (1, 2, 3, 5, 7, 13, 32, 64):
+        assert stream_in_chunks(sanitizer, text, size) == (expected, expected_ids), size
+
+
+def test_known_ids_are_replaced(sanitizer):
+    output, _ = stream_in_chunks(sanitizer, TEXTS[0], 4)
+    assert CASE_ID not in output
+    assert SESSION_ID not in output
+    assert "[CASO]" in output
+    assert "[SESIÓN]" in output
+
+
+def test_case_phrase_and_parenthesized_ids(sanitizer):
+    output, _ = stream_in_chunks(sanitizer, TEXTS[3], 5)
+    assert output.startswith("de este caso se sugiere")
+    output, extracted = stream_in_chunks(sanitizer, TEXTS[1], 3)
+    assert "(ID:" not in output
+    assert "abc-123" not in output
+    assert "abc-123" in extracted
+    assert "informe_final.pdf" in output
+
+
+def test_firestore_ids_and_long_words(sanitizer):
+    output, extracted = stream_in_chunks(sanitizer, TEXTS[2], 6)
+    assert "[ID]" in output
+    assert "A1b2C3d4E5f6G7h8I9j0K1" in extracted
+    assert "desproporcionadamente" in output
+
+
+def test_stream_keeps_whitespace(sanitizer):
+    output, _ = stream_in_chunks(sanitizer, TEXTS[4], 3)
+    assert output == TEXTS[4]
+
+
+def test_sanitize_uses_stream(sanitizer):
+    sanitized, metadata = sanitizer.sanitize(f"Caso  {CASE_ID}", case_id=CASE_ID)
+    assert sanitized == "Caso [CASO]"
+    assert metadata["case_id"] == CASE_ID
@@ -7,7 +7,7 @@ import { createLogger } from '../../utils/logger';
 
 const logger = createLogger('Sidebar');
 
-function Sidebar({ isOpen, onToggle, conversations, isHidden, schoolSlug }) {
+function Sidebar({ isOpen, onToggle, conversations, hasMoreConversations = false, onLoadMoreConversations, isHidden, schoolSlug }) {
   const { current, isDark, toggleTheme } = useTheme();
   const navigate = useNavigate();
   const location = useLocation();
@@ -274,6 +274,14 @@ function Sidebar({ isOpen, onToggle, conversations, isHidden, schoolSlug }) {
                 <span className="truncate">{conv.title}</span>
               </button>
             ))}
+            {hasMoreConversations && onLoadMoreConversations && (
+              <button
+                onClick={onLoadMoreConversations}
+                className="w-full text-left px-2 py-1.5 rounded-lg text-[12px] text-gray-500 hover:bg-gray-50 hover:text-gray-900 transition-colors"
+              >
+                Ver más
+              </button>
+            )}
           </div>
         </div>
       </nav>
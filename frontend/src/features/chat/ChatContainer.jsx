@@ -7,6 +7,9 @@ import { ChatHeader, ChatMessages } from './components';
 function ChatContainer({
   chatTitle,
   messages,
+  hasMoreHistory = false,
+  isLoadingOlder = false,
+  onLoadOlder,
   isThinking,
   thinkingText,
   relatedCase,
@@ -69,6 +72,9 @@ function ChatContainer({
         <div className="max-w-3xl mx-auto w-full">
           <ChatMessages
             messages={messages}
+            hasMoreHistory={hasMoreHistory}
+            isLoadingOlder={isLoadingOlder}
+            onLoadOlder={onLoadOlder}
             isThinking={isThinking}
             thinkingText={thinkingText}
             endRef={endRef}
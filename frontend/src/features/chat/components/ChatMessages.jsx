@@ -45,6 +45,9 @@ const DateSeparator = ({ date }) => (
 
 function ChatMessages({
   messages,
+  hasMoreHistory = false,
+  isLoadingOlder = false,
+  onLoadOlder,
   isThinking,
   thinkingText,
   endRef,
@@ -66,6 +69,18 @@ function ChatMessages({
 
   return (
     <div className="space-y-4 pb-2">
+      {hasMoreHistory && onLoadOlder && (
+        <div className="flex justify-center">
+          <button
+            type="button"
+            onClick={onLoadOlder}
+            disabled={isLoadingOlder}
+            className="text-xs font-medium text-gray-600 bg-gray-100 hover:bg-gray-200 border border-gray-200 px-4 py-1.5 rounded-full shadow-sm disabled:opacity-60"
+          >
+            {isLoadingOlder ? 'Cargando mensajes anteriores...' : 'Ver mensajes anteriores'}
+          </button>
+        </div>
+      )}
       {messages.map((message, index) => {
         const prevMessage = index > 0 ? messages[index - 1] : null;
         const showDateSeparator = isDifferentDay(prevMessage?.timestamp, message.timestamp);
@@ -4,6 +4,16 @@ import { createLogger } from '../../../utils/logger';
 
 const logger = createLogger('useChatMessages');
 
+// Mensajes por página al abrir una conversación (las anteriores se piden bajo demanda)
+const HISTORY_PAGE_SIZE = 50;
+
+const formatHistoryMessages = (sessionId, history) => history.map((msg, index) => ({
+  id: `${sessionId}-msg-${msg.order ?? index}-${Date.now()}`,
+  text: msg.content,
+  sender: msg.role, // 'user' o 'bot'
+  timestamp: msg.timestamp ? new Date(msg.timestamp) : new Date(),
+}));
+
 export default function useChatMessages(initialSessionId = null) {
   const [messages, setMessages] = useState([]);
   const [isThinking, setIsThinking] = useState(false);
@@ -12,6 +22,9 @@ export default function useChatMessages(initialSessionId = null) {
   const [sessionTitle, setSessionTitle] = useState(null);
   const [thinkingText, setThinkingText] = useState(null);
   const [isLoadingHistory, setIsLoadingHistory] = useState(false);
+  const [hasMoreHistory, setHasMoreHistory] = useState(false);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  const nextBeforeRef = useRef(null);
   const sessionIdRef = useRef(initialSessionId);
   const abortControllerRef = useRef(null);
 
@@ -25,6 +38,8 @@ export default function useChatMessages(initialSessionId = null) {
     setIsThinking(false);
     setThinkingText(null);
     setSessionTitle(null);
+    setHasMoreHistory(false);
+    nextBeforeRef.current = null;
 
     // Si hay un ID de sesión, iniciamos carga explícita
     if (initialSessionId) {
@@ -46,8 +61,8 @@ export default function useChatMessages(initialSessionId = null) {
           logger.info('👤 Full User Object:', usuario);
           logger.info('👤 Extracted User ID:', userId);
 
-          const [history, metadata] = await Promise.all([
-            chatService.getHistory(initialSessionId, userId),
+          const [historyPage, metadata] = await Promise.all([
+            chatService.getHistory(initialSessionId, userId, { limit: HISTORY_PAGE_SIZE }),
             chatService.getSessionMetadata(initialSessionId)
           ]);
 
@@ -57,15 +72,13 @@ export default function useChatMessages(initialSessionId = null) {
             logger.info('📝 Título de sesión cargado:', metadata.title);
           }
 
+          const history = Array.isArray(historyPage) ? historyPage : historyPage?.messages;
           if (Array.isArray(history)) {
-            // Generar IDs únicos basados en la sesión y el índice para garantizar unicidad
-            const formattedMessages = history.map((msg, index) => ({
-              id: `${initialSessionId}-msg-${index}-${Date.now()}`,
-              text: msg.content,
-              sender: msg.role, // 'user' o 'bot'
-              timestamp: msg.timestamp ? new Date(msg.timestamp) : new Date(),
-            }));
+            // Generar IDs únicos basados en la sesión y el order para garantizar unicidad
+            const formattedMessages = formatHistoryMessages(initialSessionId, history);
             setMessages(formattedMessages);
+            nextBeforeRef.current = historyPage?.next_before ?? null;
+            setHasMoreHistory(Boolean(historyPage?.has_more));
             logger.info(`✅ ${formattedMessages.length} mensajes cargados correctamente`);
           } else {
             logger.error("History is not an array:", history);
@@ -92,6 +105,53 @@ export default function useChatMessages(initialSessionId = null) {
     initSession();
   }, [initialSessionId]);
 
+  const loadOlderMessages = async () => {
+    const sessionAtRequest = sessionIdRef.current;
+    if (!sessionAtRequest || isLoadingOlder || nextBeforeRef.current === null) return;
+
+    setIsLoadingOlder(true);
+    try {
+      const usuario = JSON.parse(localStorage.getItem('usuario'));
+      const page = await chatService.getHistory(sessionAtRequest, usuario?.id, {
+        limit: HISTORY_PAGE_SIZE,
+        before: nextBeforeRef.current
+      });
+      // Ignorar la respuesta si el usuario cambió de sesión mientras cargaba
+      if (sessionIdRef.current !== sessionAtRequest) return;
+
+      const olderMessages = formatHistoryMessages(sessionAtRequest, page?.messages || []);
+      setMessages(prev => [...olderMessages, ...prev]);
+      nextBeforeRef.current = page?.next_before ?? null;
+      setHasMoreHistory(Boolean(page?.has_more));
+      logger.info(`✅ ${olderMessages.length} mensajes anteriores cargados`);
+    } catch (error) {
+      logger.error("Error loading older messages:", error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
+  // Historial completo para exportar: pide las páginas anteriores que aún no se cargaron
+  const getAllMessages = async () => {
+    const sessionAtRequest = sessionIdRef.current;
+    let before = nextBeforeRef.current;
+    if (!sessionAtRequest || before === null) return messages;
+
+    const usuario = JSON.parse(localStorage.getItem('usuario'));
+    let olderMessages = [];
+    let hasMore = true;
+    while (hasMore && before !== null) {
+      const page = await chatService.getHistory(sessionAtRequest, usuario?.id, {
+        limit: HISTORY_PAGE_SIZE,
+        before
+      });
+      olderMessages = [...formatHistoryMessages(sessionAtRequest, page?.messages || []), ...olderMessages];
+      before = page?.next_before ?? null;
+      hasMore = Boolean(page?.has_more);
+    }
+    return [...olderMessages, ...messages];
+  };
+
   const sendMessage = async (messageText, files = [], caseId = null) => {
     if (!messageText.trim() && files.length === 0) return null;
     if (!sessionIdRef.current) {
@@ -344,6 +404,10 @@ export default function useChatMessages(initialSessionId = null) {
     sessionTitle, // Expose session title
     thinkingText, // Expose thinking text
     isLoadingHistory, // Expose loading state
+    hasMoreHistory, // Hay mensajes anteriores sin cargar
+    isLoadingOlder,
+    loadOlderMessages,
+    getAllMessages, // Historial completo (para exportar)
     sessionId // Expose session Id
   };
 }
\ No newline at end of file
@@ -144,8 +144,8 @@ export const useDashboardData = () => {
 
         const [cases, sessions, interviews] = await Promise.all([
           isDirectivo
-            ? casesService.getAllCasesBySchool(colegio.id)
-            : casesService.getCases(usuario.id, colegio.id),
+            ? casesService.listAllSchoolCases(colegio.id, { limit: 200 })
+            : casesService.listAllCases(usuario.id, colegio.id, { limit: 200 }),
           chatService.getSessions(usuario.id).catch(err => {
             logger.error("Error fetching sessions:", err);
             return [];
@@ -170,39 +170,37 @@ export const useDashboardData = () => {
           let deadlineText = null;
           let nextDeadlineDate = null;
 
-          const steps = c.pasosProtocolo || c.protocolSteps || [];
-          if (steps && steps.length > 0) {
-            const nextStepIndex = steps.findIndex(s => s.status !== 'completed' && s.status !== 'completado' && s.status !== 'skipped');
-            const nextStep = nextStepIndex !== -1 ? steps[nextStepIndex] : null;
-
-            if (nextStep && (nextStep.deadline || nextStep.estimated_time)) {
-              if (nextStep.deadline) {
-                nextDeadlineDate = new Date(nextStep.deadline);
-              } else if (nextStep.estimated_time) {
-                // Fix: Pass case creation date as base date to prevent daily shifting
-                const baseDate = c.created_at ? new Date(c.created_at) : new Date();
-                nextDeadlineDate = calculateDeadlineDate(nextStep.estimated_time, baseDate);
-              }
+          // Primer paso pendiente con plazo (calculado en el listado: {index, deadline, estimated_time})
+          const nextStep = c.next_step;
+          if (nextStep) {
+            const nextStepIndex = nextStep.index;
+
+            if (nextStep.deadline) {
+              nextDeadlineDate = new Date(nextStep.deadline);
+            } else if (nextStep.estimated_time) {
+              // Fix: Pass case creation date as base date to prevent daily shifting
+              const baseDate = c.created_at ? new Date(c.created_at) : new Date();
+              nextDeadlineDate = calculateDeadlineDate(nextStep.estimated_time, baseDate);
+            }
+
+            if (nextDeadlineDate) {
+              deadlineStatus = getDeadlineStatus(nextDeadlineDate);
+
+              const now = new Date();
+              const nowDay = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+              const deadlineDay = new Date(nextDeadlineDate.getFullYear(), nextDeadlineDate.getMonth(), nextDeadlineDate.getDate());
+              const diffDays = Math.ceil((deadlineDay - nowDay) / (1000 * 60 * 60 * 24));
+
+              const stepNum = nextStepIndex + 1;
 
-              if (nextDeadlineDate) {
-                deadlineStatus = getDeadlineStatus(nextDeadlineDate);
-
-                const now = new Date();
-                const nowDay = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-                const deadlineDay = new Date(nextDeadlineDate.getFullYear(), nextDeadlineDate.getMonth(), nextDeadlineDate.getDate());
-                const diffDays = Math.ceil((deadlineDay - nowDay) / (1000 * 60 * 60 * 24));
-
-                const stepNum = nextStepIndex + 1;
-
-                if (diffDays < 0) {
-                  deadlineText = `Paso ${stepNum}: Venció hace ${Math.abs(diffDays)} días`;
-                } else if (diffDays === 0) {
-                  deadlineText = `Paso ${stepNum}: Vence hoy`;
-                } else if (diffDays === 1) {
-                  deadlineText = `Paso ${stepNum}: Vence mañana`;
-                } else {
-                  deadlineText = `Paso ${stepNum}: Vence en ${diffDays} días`;
-                }
+              if (diffDays < 0) {
+                deadlineText = `Paso ${stepNum}: Venció hace ${Math.abs(diffDays)} días`;
+              } else if (diffDays === 0) {
+                deadlineText = `Paso ${stepNum}: Vence hoy`;
+              } else if (diffDays === 1) {
+                deadlineText = `Paso ${stepNum}: Vence mañana`;
+              } else {
+                deadlineText = `Paso ${stepNum}: Vence en ${diffDays} días`;
               }
             }
           }
@@ -221,11 +219,10 @@ export const useDashboardData = () => {
             isShared: isShared,
             isSharedByMe: isOwner && isShared,
             isSharedWithMe: !isOwner && isShared,
-            involved: (c.involved || []).map(person => ({
-              id: person.name,
-              name: person.name
+            involved: (c.involved_names || []).map(name => ({
+              id: name, // Usar nombre como ID temporal
+              name
             })),
-            description: c.description,
             createdAt: c.created_at,
             ownerId: c.owner_id,
             ownerName: c.owner_name,
@@ -67,7 +67,7 @@ function AssociateCaseModal({ isOpen, onClose, onAssociate, interview, isAssocia
         setError(null);
 
         try {
-            const data = await casesService.getCases(userId, colegioId);
+            const data = await casesService.listAllCases(userId, colegioId, { limit: 200 });
             setCases(data);
         } catch (err) {
             console.error('Error fetching cases:', err);
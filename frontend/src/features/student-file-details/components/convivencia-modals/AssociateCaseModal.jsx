@@ -37,7 +37,7 @@ function AssociateCaseModal({ isOpen, onClose, onAssociate, student, associatedC
 
                 if (userId && colegioId) {
                     const idToUse = typeof colegioId === 'object' ? colegioId.id : colegioId;
-                    const fetchedCases = await casesService.getCases(userId, idToUse);
+                    const fetchedCases = await casesService.listAllCases(userId, idToUse, { limit: 200 });
                     // Map backend format if necessary, though casesService likely returns expected format
                     // Ensure date formatting consistency
                     setCases(fetchedCases.map(c => ({
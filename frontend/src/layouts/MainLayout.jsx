@@ -9,6 +9,9 @@ import { createLogger } from '../utils/logger';
 
 const logger = createLogger('MainLayout');
 
+// Conversaciones por página en la sección "Recientes"
+const SESSIONS_PAGE_SIZE = 30;
+
 function MainLayout() {
   const { current } = useTheme();
   const { isInitialLoading } = useLayout();
@@ -19,29 +22,53 @@ function MainLayout() {
     return saved !== null ? JSON.parse(saved) : true;
   });
   const [conversations, setConversations] = useState([]);
+  const [sessionsCursor, setSessionsCursor] = useState(null);
   const [isSidebarHidden, setIsSidebarHidden] = useState(false); // Forzar ocultar sidebar
 
   useEffect(() => {
     localStorage.setItem('sidebarOpen', JSON.stringify(isSidebarOpen));
   }, [isSidebarOpen]);
 
+  const fetchSessionsPage = async (cursor = null) => {
+    const usuario = JSON.parse(localStorage.getItem('usuario'));
+    const userId = usuario?.id;
+    const page = await chatService.getSessions(userId, { limit: SESSIONS_PAGE_SIZE, cursor });
+    if (Array.isArray(page)) {
+      return { sessions: page, next_cursor: null };
+    }
+    if (!Array.isArray(page?.sessions)) {
+      logger.error("Sessions response is not a page:", page);
+      return { sessions: [], next_cursor: null };
+    }
+    return page;
+  };
+
   const loadSessions = useCallback(async () => {
     try {
-      const usuario = JSON.parse(localStorage.getItem('usuario'));
-      const userId = usuario?.id;
-      const sessions = await chatService.getSessions(userId);
-      if (Array.isArray(sessions)) {
-        setConversations(sessions);
-      } else {
-        logger.error("Sessions response is not an array:", sessions);
-        setConversations([]);
-      }
+      const page = await fetchSessionsPage();
+      setConversations(page.sessions);
+      setSessionsCursor(page.next_cursor);
     } catch (error) {
       logger.error("Error loading sessions:", error);
       setConversations([]);
+      setSessionsCursor(null);
     }
   }, []);
 
+  const loadMoreSessions = useCallback(async () => {
+    if (!sessionsCursor) return;
+    try {
+      const page = await fetchSessionsPage(sessionsCursor);
+      setConversations(prev => {
+        const known = new Set(prev.map(conv => conv.id));
+        return [...prev, ...page.sessions.filter(conv => !known.has(conv.id))];
+      });
+      setSessionsCursor(page.next_cursor);
+    } catch (error) {
+      logger.error("Error loading more sessions:", error);
+    }
+  }, [sessionsCursor]);
+
   useEffect(() => {
     loadSessions();
   }, [loadSessions]);
@@ -90,6 +117,8 @@ function MainLayout() {
           isHidden={isSidebarHidden}
           onToggle={toggleSidebar}
           conversations={conversations}
+          hasMoreConversations={Boolean(sessionsCursor)}
+          onLoadMoreConversations={loadMoreSessions}
           schoolSlug={schoolSlug}
         />
       )}
@@ -26,7 +26,7 @@ function ChatGeneralPage() {
   const { isSidebarOpen, toggleSidebar, refreshConversations } = useOutletContext();
 
   // Custom hooks
-  const { messages, isThinking, isStreaming, thinkingText, sendMessage, handleLike, handleDislike, downloadMessage, stopGenerating, sessionId, sessionTitle, isLoadingHistory } = useChatMessages(location.state?.sessionId);
+  const { messages, isThinking, isStreaming, thinkingText, sendMessage, handleLike, handleDislike, downloadMessage, stopGenerating, sessionId, sessionTitle, isLoadingHistory, hasMoreHistory, isLoadingOlder, loadOlderMessages, getAllMessages } = useChatMessages(location.state?.sessionId);
   const {
     chatFiles,
     selectedFile,
@@ -292,14 +292,30 @@ function ChatGeneralPage() {
 
   // Export handlers using custom hooks
   const handleExportToPDF = async () => {
-    const result = await exportToPDF(sessionTitle || chatTitle, messages, relatedCase);
+    let allMessages;
+    try {
+      allMessages = await getAllMessages();
+    } catch (error) {
+      logger.error("Error loading full history for export:", error);
+      alert('No se pudo cargar el historial completo para exportar');
+      return;
+    }
+    const result = await exportToPDF(sessionTitle || chatTitle, allMessages, relatedCase);
     if (result.success) {
       setShowOptionsMenu(false);
     }
   };
 
   const handleExportToWord = async () => {
-    const result = await exportToWord(sessionTitle || chatTitle, messages, relatedCase);
+    let allMessages;
+    try {
+      allMessages = await getAllMessages();
+    } catch (error) {
+      logger.error("Error loading full history for export:", error);
+      alert('No se pudo cargar el historial completo para exportar');
+      return;
+    }
+    const result = await exportToWord(sessionTitle || chatTitle, allMessages, relatedCase);
     if (result.success) {
       setShowOptionsMenu(false);
     }
@@ -460,6 +476,9 @@ function ChatGeneralPage() {
           <ChatContainer
             chatTitle={sessionTitle || chatTitle}
             messages={messages}
+            hasMoreHistory={hasMoreHistory}
+            isLoadingOlder={isLoadingOlder}
+            onLoadOlder={loadOlderMessages}
             isThinking={isThinking}
             thinkingText={thinkingText}
             relatedCase={relatedCase}
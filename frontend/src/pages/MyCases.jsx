@@ -62,7 +62,7 @@ function MyCases() {
     const fetchCases = async () => {
       setIsLoading(true);
       try {
-        const data = await casesService.getCases(usuario.id, colegio.id);
+        const data = await casesService.listAllCases(usuario.id, colegio.id, { limit: 200 });
 
         // Transformar datos del backend al formato del frontend
         const formattedCases = data.map((c) => {
@@ -74,41 +74,38 @@ function MyCases() {
           let deadlineText = null;
           let nextDeadlineDate = null;
 
-          const steps = c.pasosProtocolo || c.protocolSteps || [];
-          if (steps && steps.length > 0) {
-            // Encontrar el primer paso pendiente (índice original para mostrar usuario)
-            const nextStepIndex = steps.findIndex(s => s.status !== 'completed' && s.status !== 'completado' && s.status !== 'skipped');
-            const nextStep = nextStepIndex !== -1 ? steps[nextStepIndex] : null;
-
-            if (nextStep && (nextStep.deadline || nextStep.estimated_time)) {
-              if (nextStep.deadline) {
-                nextDeadlineDate = new Date(nextStep.deadline);
-              } else if (nextStep.estimated_time) {
-                // Fix: Pass case creation date as base date to prevent daily shifting
-                const baseDate = c.created_at ? new Date(c.created_at) : new Date();
-                nextDeadlineDate = calculateDeadlineDate(nextStep.estimated_time, baseDate);
-              }
+          // Primer paso pendiente con plazo (calculado en el listado: {index, deadline, estimated_time})
+          const nextStep = c.next_step;
+          if (nextStep) {
+            const nextStepIndex = nextStep.index;
+
+            if (nextStep.deadline) {
+              nextDeadlineDate = new Date(nextStep.deadline);
+            } else if (nextStep.estimated_time) {
+              // Fix: Pass case creation date as base date to prevent daily shifting
+              const baseDate = c.created_at ? new Date(c.created_at) : new Date();
+              nextDeadlineDate = calculateDeadlineDate(nextStep.estimated_time, baseDate);
+            }
 
-              if (nextDeadlineDate) {
-                deadlineStatus = getDeadlineStatus(nextDeadlineDate);
-
-                // Calcular diferencia de días para el texto
-                const now = new Date();
-                const nowDay = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-                const deadlineDay = new Date(nextDeadlineDate.getFullYear(), nextDeadlineDate.getMonth(), nextDeadlineDate.getDate());
-                const diffDays = Math.ceil((deadlineDay - nowDay) / (1000 * 60 * 60 * 24));
-
-                const stepNum = nextStepIndex + 1;
-
-                if (diffDays < 0) {
-                  deadlineText = `Paso ${stepNum}: Venció hace ${Math.abs(diffDays)} días`;
-                } else if (diffDays === 0) {
-                  deadlineText = `Paso ${stepNum}: Vence hoy`;
-                } else if (diffDays === 1) {
-                  deadlineText = `Paso ${stepNum}: Vence mañana`;
-                } else {
-                  deadlineText = `Paso ${stepNum}: Vence en ${diffDays} días`;
-                }
+            if (nextDeadlineDate) {
+              deadlineStatus = getDeadlineStatus(nextDeadlineDate);
+
+              // Calcular diferencia de días para el texto
+              const now = new Date();
+              const nowDay = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+              const deadlineDay = new Date(nextDeadlineDate.getFullYear(), nextDeadlineDate.getMonth(), nextDeadlineDate.getDate());
+              const diffDays = Math.ceil((deadlineDay - nowDay) / (1000 * 60 * 60 * 24));
+
+              const stepNum = nextStepIndex + 1;
+
+              if (diffDays < 0) {
+                deadlineText = `Paso ${stepNum}: Venció hace ${Math.abs(diffDays)} días`;
+              } else if (diffDays === 0) {
+                deadlineText = `Paso ${stepNum}: Vence hoy`;
+              } else if (diffDays === 1) {
+                deadlineText = `Paso ${stepNum}: Vence mañana`;
+              } else {
+                deadlineText = `Paso ${stepNum}: Vence en ${diffDays} días`;
               }
             }
           }
@@ -125,11 +122,10 @@ function MyCases() {
             isSharedByMe: isOwner && isShared, // TÚ lo compartiste
             isSharedWithMe: !isOwner && isShared, // TE lo compartieron
             sharedWith: [], // Se puede cargar con getCasePermissions si es necesario
-            involved: (c.involved || []).map(person => ({
-              id: person.name, // Usar nombre como ID temporal
-              name: person.name
+            involved: (c.involved_names || []).map(name => ({
+              id: name, // Usar nombre como ID temporal
+              name
             })),
-            description: c.description,
             createdAt: c.created_at,
             ownerId: c.owner_id,
             ownerName: c.owner_name,
@@ -342,7 +338,7 @@ function MyCases() {
   const handleShareSuccess = async (result) => {
     // Recargar casos para actualizar el estado is_shared
     try {
-      const data = await casesService.getCases(usuario.id, colegio.id);
+      const data = await casesService.listAllCases(usuario.id, colegio.id, { limit: 200 });
       const formattedCases = data.map((c) => {
         const isOwner = c.owner_id === usuario.id;
         const isShared = c.is_shared || false;
@@ -359,11 +355,10 @@ function MyCases() {
           isSharedByMe: isOwner && isShared,
           isSharedWithMe: !isOwner && isShared,
           sharedWith: [],
-          involved: (c.involved || []).map(person => ({
-            id: person.name,
-            name: person.name
+          involved: (c.involved_names || []).map(name => ({
+            id: name, // Usar nombre como ID temporal
+            name
           })),
-          description: c.description,
           createdAt: c.created_at,
           ownerId: c.owner_id,
           ownerName: c.owner_name,
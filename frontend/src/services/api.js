@@ -53,18 +53,26 @@ export const chatService = {
     return response.data.session_id;
   },
 
-  getSessions: async (userId = null) => {
-    const url = userId ? `${API_URL}/chat/sessions?user_id=${userId}` : `${API_URL}/chat/sessions`;
-    const response = await axios.get(url);
+  // Sin options devuelve todas las sesiones (array).
+  // Con { limit, cursor } devuelve una página: { sessions, next_cursor }
+  getSessions: async (userId = null, { limit, cursor } = {}) => {
+    const params = {};
+    if (userId) params.user_id = userId;
+    if (limit) params.limit = limit;
+    if (cursor) params.cursor = cursor;
+    const response = await axios.get(`${API_URL}/chat/sessions`, { params });
     return response.data;
   },
 
-  getHistory: async (sessionId, userId) => {
-    logger.debug(`[API] getHistory called with sessionId=${sessionId}, userId=${userId}`);
-    const url = userId
-      ? `${API_URL}/chat/history/${sessionId}?user_id=${userId}`
-      : `${API_URL}/chat/history/${sessionId}`;
-    const response = await axios.get(url);
+  // Sin options devuelve el historial completo (array).
+  // Con { limit, before } devuelve una página: { messages, next_before, has_more }
+  getHistory: async (sessionId, userId, { limit, before } = {}) => {
+    logger.debug(`[API] getHistory called with sessionId=${sessionId}, userId=${userId}, limit=${limit}, before=${before}`);
+    const params = {};
+    if (userId) params.user_id = userId;
+    if (limit) params.limit = limit;
+    if (before !== undefined && before !== null) params.before = before;
+    const response = await axios.get(`${API_URL}/chat/history/${sessionId}`, { params });
     return response.data;
   },
 
@@ -425,6 +433,18 @@ export const chatService = {
   }
 };
 
+// Recorre un listado paginado siguiendo next_cursor hasta la última página
+const collectAllPages = async (fetchPage) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await fetchPage(cursor);
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+};
+
 export const casesService = {
   // Obtener todos los casos del usuario
   getCases: async (userId, colegioId) => {
@@ -453,6 +473,45 @@ export const casesService = {
     }
   },
 
+  // Listado paginado de casos del usuario (solo campos de tarjeta)
+  // params: limit, cursor, status, case_type, date_from, date_to, sort_by, order
+  listCases: async (userId, colegioId, params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/cases/list`, {
+        params: {
+          user_id: userId,
+          colegio_id: colegioId,
+          ...params
+        }
+      });
+      return response.data;
+    } catch (error) {
+      logger.error('Error listing cases:', error);
+      throw error;
+    }
+  },
+
+  // Todos los casos del usuario recorriendo el listado paginado (sigue next_cursor)
+  listAllCases: async (userId, colegioId, params = {}) => {
+    return collectAllPages((cursor) => casesService.listCases(userId, colegioId, cursor ? { ...params, cursor } : params));
+  },
+
+  // Listado paginado de casos de un colegio (para Directivos)
+  listSchoolCases: async (colegioId, params = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/cases/school/${colegioId}/list`, { params });
+      return response.data;
+    } catch (error) {
+      logger.error('Error listing school cases:', error);
+      throw error;
+    }
+  },
+
+  // Todos los casos de un colegio recorriendo el listado paginado (para Directivos)
+  listAllSchoolCases: async (colegioId, params = {}) => {
+    return collectAllPages((cursor) => casesService.listSchoolCases(colegioId, cursor ? { ...params, cursor } : params));
+  },
+
   // Obtener caso por ID
   getCaseById: async (caseId, userId) => {
     try {